@@ -17,6 +17,14 @@ BluetoothSerial ESP_BT;
 
 DHT dht(DHTPIN, DHTTYPE);
 
+// Датчик влажности опрашивается отдельной задачей на ядре 0: чтение DHT занимает
+// около 25 мс (из них несколько мс с запрещёнными прерываниями) и на ядре 1
+// сдвигало бы отсчёты ЭКГ, которые loop() снимает каждые 10 мс
+#define HUMIDITY_PERIOD_MS 1000
+volatile float latestHumidity = NAN;  // Последнее удачное чтение
+volatile bool humidityOk = false;  // Удалось ли последнее чтение
+volatile uint32_t humidityReadings = 0;  // Растёт с каждым удачным чтением
+
 float lastHumidity = 0;
 int threshold = 2700;
 int beatCount = 0;
@@ -24,8 +32,181 @@ int averageBPM = 0;
 unsigned long lastPeakTime = 0;
 bool wasAboveThreshold = false;
 
+// Двоичный режим передачи по USB (включается командой "mode bin" от компьютера).
+// Кадр: A5 5A | seq u16 | nSamples u8 | nRecords u8 | int16 x nSamples |
+//       (tag u8, value int16) x nRecords | CRC-16/CCITT u16 (от seq до записей)
+// Bluetooth всегда остаётся текстовым.
+#define FRAME_SAMPLES 10
+#define FRAME_MAX_RECORDS 4
+#define TAG_BPM 1
+#define TAG_BREATH 2
+#define TAG_ERROR 3
+#define TAG_HUMIDITY 4  // Влажность в десятых долях %, раз в секунду
+
+bool binaryMode = false;
+uint16_t frameSeq = 0;
+int16_t frameSamples[FRAME_SAMPLES];
+uint8_t frameSampleCount = 0;
+uint8_t frameRecordTags[FRAME_MAX_RECORDS];
+int16_t frameRecordValues[FRAME_MAX_RECORDS];
+uint8_t frameRecordCount = 0;
+char commandBuffer[32];
+uint8_t commandLength = 0;
+
+// Согласование скорости порта: компьютер присылает "baud N", получает "ok baud N",
+// обе стороны переходят на N, и компьютер должен прислать "ping" в течение
+// BAUD_CONFIRM_MS. Без подтверждения возвращаемся на прежнюю скорость.
+#define DEFAULT_BAUD 9600
+#define BAUD_CONFIRM_MS 1000
+unsigned long currentBaud = DEFAULT_BAUD;
+unsigned long previousBaud = DEFAULT_BAUD;
+bool baudUnconfirmed = false;
+unsigned long baudChangedAt = 0;
+
+uint16_t crc16(const uint8_t *data, size_t length, uint16_t crc) {
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendFrame() {
+  if (frameSampleCount == 0 && frameRecordCount == 0) {
+    return;
+  }
+  uint8_t frame[6 + 2 * FRAME_SAMPLES + 3 * FRAME_MAX_RECORDS + 2];
+  size_t n = 0;
+  frame[n++] = 0xA5;
+  frame[n++] = 0x5A;
+  frame[n++] = frameSeq & 0xFF;
+  frame[n++] = frameSeq >> 8;
+  frame[n++] = frameSampleCount;
+  frame[n++] = frameRecordCount;
+  for (uint8_t i = 0; i < frameSampleCount; i++) {
+    frame[n++] = frameSamples[i] & 0xFF;
+    frame[n++] = (uint16_t)frameSamples[i] >> 8;
+  }
+  for (uint8_t i = 0; i < frameRecordCount; i++) {
+    frame[n++] = frameRecordTags[i];
+    frame[n++] = frameRecordValues[i] & 0xFF;
+    frame[n++] = (uint16_t)frameRecordValues[i] >> 8;
+  }
+  uint16_t crc = crc16(frame + 2, n - 2, 0xFFFF);
+  frame[n++] = crc & 0xFF;
+  frame[n++] = crc >> 8;
+  Serial.write(frame, n);
+  frameSeq++;
+  frameSampleCount = 0;
+  frameRecordCount = 0;
+}
+
+// Отправка отсчёта ЭКГ: текстом в Bluetooth и текстом или кадрами в USB
+void sendSample(int value) {
+  ESP_BT.println(value);
+  if (!binaryMode) {
+    Serial.println(value);
+    return;
+  }
+  frameSamples[frameSampleCount++] = value;
+  if (frameSampleCount == FRAME_SAMPLES) {
+    sendFrame();
+  }
+}
+
+// Отправка служебной записи (пульс, дыхание, ошибка)
+void sendRecord(uint8_t tag, int value, const char *text, bool bluetooth = true) {
+  if (bluetooth) {
+    ESP_BT.println(text);
+  }
+  if (!binaryMode) {
+    Serial.println(text);
+    return;
+  }
+  if (frameRecordCount == FRAME_MAX_RECORDS) {
+    sendFrame();
+  }
+  frameRecordTags[frameRecordCount] = tag;
+  frameRecordValues[frameRecordCount] = value;
+  frameRecordCount++;
+  sendFrame();
+}
+
+void handleCommand(const char *command) {
+  if (strcmp(command, "mode bin") == 0) {
+    Serial.println("ok mode bin");
+    binaryMode = true;
+    frameSampleCount = 0;
+    frameRecordCount = 0;
+  } else if (strcmp(command, "mode ascii") == 0) {
+    sendFrame();
+    binaryMode = false;
+    Serial.println("ok mode ascii");
+  } else if (strncmp(command, "baud ", 5) == 0) {
+    unsigned long baud = strtoul(command + 5, NULL, 10);
+    if (baud < 9600 || baud > 4000000) {
+      Serial.println("err baud");
+      return;
+    }
+    Serial.print("ok baud ");
+    Serial.println(baud);
+    Serial.flush();
+    previousBaud = currentBaud;
+    currentBaud = baud;
+    Serial.updateBaudRate(baud);
+    baudUnconfirmed = true;
+    baudChangedAt = millis();
+  } else if (strcmp(command, "ping") == 0) {
+    baudUnconfirmed = false;
+    Serial.println("pong");
+  }
+}
+
+// Неблокирующее чтение команд от компьютера по USB
+void pollCommands() {
+  if (baudUnconfirmed && millis() - baudChangedAt > BAUD_CONFIRM_MS) {
+    // Компьютер не услышал нас на новой скорости
+    baudUnconfirmed = false;
+    currentBaud = previousBaud;
+    Serial.updateBaudRate(currentBaud);
+    commandLength = 0;
+  }
+  while (Serial.available() > 0) {
+    char c = Serial.read();
+    if (c == '\r') {
+      continue;
+    }
+    if (c == '\n') {
+      commandBuffer[commandLength] = '\0';
+      handleCommand(commandBuffer);
+      commandLength = 0;
+    } else if (commandLength < sizeof(commandBuffer) - 1) {
+      commandBuffer[commandLength++] = c;
+    }
+  }
+}
+
+void storeHumidity(float reading) {
+  humidityOk = !isnan(reading);
+  if (humidityOk) {
+    latestHumidity = reading;
+    humidityReadings++;
+  }
+}
+
+void humidityTask(void *) {
+  TickType_t wakeTime = xTaskGetTickCount();
+  for (;;) {
+    vTaskDelayUntil(&wakeTime, pdMS_TO_TICKS(HUMIDITY_PERIOD_MS));
+    // Принудительное чтение: без него библиотека отдаёт значение не чаще раза в 2 с
+    storeHumidity(dht.readHumidity(true));
+  }
+}
+
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(DEFAULT_BAUD);
   ESP_BT.begin("Cardioreg");
 
   lcd.init();                
@@ -37,20 +218,25 @@ void setup() {
   unsigned long startTime = millis();
   int mxValue = 0;
   while (millis() - startTime < 15000) {
+    pollCommands();
     int egcValue = analogRead(OUT_PIN);
     mxValue = max(egcValue, mxValue);
     delay(10);
   }
   threshold = mxValue*0.8;
   dht.begin();
+  storeHumidity(dht.readHumidity());
+  xTaskCreatePinnedToCore(humidityTask, "humidity", 4096, NULL, 1, NULL, 0);
 }
 
 void loop() {
-  float startH = dht.readHumidity();
+  float startH = latestHumidity;
   float h = startH;
+  uint32_t humiditySent = humidityReadings;
   
-  if (isnan(startH)) {
-    Serial.println("Ошибка чтения с DHT");
+  if (!humidityOk) {
+    pollCommands();
+    sendRecord(TAG_ERROR, 0, "Ошибка чтения с DHT", false);
     return;
   }
   unsigned long startTime = millis();
@@ -62,16 +248,24 @@ void loop() {
     i++;
     if (i == 100) {
       i = 0;
-      h = dht.readHumidity();
+      // Только свежее значение от задачи опроса, без ожидания датчика
+      if (humidityReadings != humiditySent) {
+        humiditySent = humidityReadings;
+        h = latestHumidity;
+        int tenths = (int)round(h * 10);
+        char text[16];
+        sprintf(text, "hum%d", tenths);
+        // Только в USB: частоту дыхания по влажности считает компьютер
+        sendRecord(TAG_HUMIDITY, tenths, text, false);
+      }
       if (h <= 85) {
         allWet = false;
       } 
     }
+    pollCommands();
     int egcValue = analogRead(OUT_PIN);
     mxValue = max(egcValue, mxValue);
-    char buffer[20];
-    ESP_BT.println(egcValue);
-    Serial.println(egcValue);
+    sendSample(egcValue);
     
     if (!wasAboveThreshold && egcValue > threshold) {
       beatCount++;
@@ -84,12 +278,10 @@ void loop() {
   }
 
   if (allWet || h - startH > 1.0) {
-    ESP_BT.println("breath");
-    Serial.println("breath");
+    sendRecord(TAG_BREATH, 1, "breath");
   }
   else {
-    ESP_BT.println("noBreath");
-    Serial.println("noBreath");
+    sendRecord(TAG_BREATH, 0, "noBreath");
   }
 
   threshold = mxValue*0.7;
@@ -102,7 +294,6 @@ void loop() {
   lcd.print(beatCount*6);
   char buffer[20];
   sprintf(buffer,"bpm%d",beatCount*6);
-  ESP_BT.println(buffer);
-  Serial.println(buffer);
+  sendRecord(TAG_BPM, beatCount*6, buffer);
   beatCount=0;
 } 
\ No newline at end of file
@@ -0,0 +1,128 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+from hrv import analyzeSamples
+
+SAMPLE_DTYPE = np.dtype(np.float32)  # ADC counts are exact in float32
+
+
+class SharedRing:
+    """Mirrored sample ring in shared memory
+
+    Written by the reader thread like RingBuffer; analysis workers attach by
+    name and read the window they are given without copying. Workers read
+    while the writer goes on, so capacity must exceed the longest window by
+    more than the samples that arrive during one analysis.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._memory = shared_memory.SharedMemory(create=True, size=2 * capacity * SAMPLE_DTYPE.itemsize)
+        self._data = np.ndarray(2 * capacity, dtype=SAMPLE_DTYPE, buffer=self._memory.buf)
+        self._head = 0
+        self.total_written = 0
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def extend(self, values):
+        """Append a batch, written twice so every window is one contiguous slice"""
+        values = np.asarray(values, dtype=SAMPLE_DTYPE)
+        total = self.total_written + len(values)
+        values = values[-self.capacity:]
+        n = len(values)
+        capacity = self.capacity
+        head = self._head
+        first = min(n, capacity - head)
+        self._data[head:head + first] = values[:first]
+        self._data[head + capacity:head + capacity + first] = values[:first]
+        rest = n - first
+        if rest:
+            self._data[:rest] = values[first:]
+            self._data[capacity:capacity + rest] = values[first:]
+        self._head = (head + n) % capacity
+        # Published last: the GUI thread hands it to a worker as the end of an already written window
+        self.total_written = total
+
+    def close(self):
+        """Release and remove the shared memory"""
+        self._data = None
+        self._memory.close()
+        self._memory.unlink()
+
+
+def windowOf(data, capacity, total, count):
+    """The count samples before sample number total in a mirrored ring"""
+    end = total % capacity + capacity
+    return data[end - count:end]
+
+
+def analyzeShared(name, capacity, total, count, sample_rate):
+    """Worker entry: attach to a SharedRing and analyse its newest count samples"""
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        data = np.ndarray(2 * capacity, dtype=SAMPLE_DTYPE, buffer=memory.buf)
+        metrics = analyzeSamples(windowOf(data, capacity, total, count), sample_rate)
+        del data  # The buffer cannot be closed while a view exists
+    finally:
+        memory.close()
+    metrics['total'] = total
+    return metrics
+
+
+class AnalysisPool(QObject):
+    """Run windowed HRV and breathing analysis in worker processes
+
+    Only the ring name and window bounds cross the process boundary. A key
+    (one per device) has at most one analysis in flight, so a slow pool
+    skips windows instead of queueing them.
+    """
+    resultReady = pyqtSignal(object, dict)  # (key, metrics), delivered in the owner's thread
+    failed = pyqtSignal(object, str)  # (key, error message), delivered in the owner's thread
+
+    def __init__(self, parent=None, workers=1):
+        super().__init__(parent)
+        self.workers = workers
+        self.executor = None
+        self.busy = set()
+        self.skipped = 0
+        self.failures = 0
+        self.broken = False  # A worker died; the executor has to be replaced
+
+    def submit(self, key, ring, sample_rate, count):
+        """Analyse the newest count samples of ring unless key is still busy"""
+        if key in self.busy:
+            self.skipped += 1
+            return False
+        if self.executor is None or self.broken:
+            self.shutdown()
+            self.broken = False
+            # Forking a process that runs Qt threads is unsafe; workers start fresh
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.busy.add(key)
+        future = self.executor.submit(analyzeShared, ring.name, ring.capacity, ring.total_written,
+                                      count, sample_rate)
+        future.add_done_callback(lambda future: self.onDone(key, future))
+        return True
+
+    def onDone(self, key, future):
+        """Executor thread: hand the result to the GUI thread"""
+        self.busy.discard(key)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.broken = isinstance(error, BrokenProcessPool)
+            self.failures += 1
+            self.failed.emit(key, str(error) or type(error).__name__)
+            return
+        self.resultReady.emit(key, future.result())
+
+    def shutdown(self):
+        """Stop the workers without waiting for running analyses"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,168 @@
+import math
+import time
+from collections import deque
+import numpy as np
+
+# AD8232 front end (gain 1100) into the ESP32's 12-bit ADC over 3.3 V
+COUNTS_PER_MV = 1100 * 4095 / 3300.0
+
+
+class WindowedExtremes:
+    """Running min/max over roughly the last `window` samples
+
+    Samples are folded into blocks of `block` values; a monotonic deque of
+    block extremes then gives the window's min and max in O(1) per block,
+    however long the window is. The window edge moves a block at a time, so
+    up to block - 1 extra old samples may still count.
+    """
+    def __init__(self, window, block=10):
+        self.window = window
+        self.block = block
+        self._blocks_per_window = max(math.ceil(window / block), 1)
+        self._mins = deque()  # (block number, min), values increasing
+        self._maxs = deque()  # (block number, max), values decreasing
+        self._block_number = 0
+        self._partial_min = None  # Extremes of the block being filled
+        self._partial_max = None
+        self._partial_count = 0
+
+    def extend(self, values):
+        """Fold a batch of samples into the running extremes"""
+        values = np.asarray(values)
+        position = 0
+        while position < len(values):
+            take = min(self.block - self._partial_count, len(values) - position)
+            chunk = values[position:position + take]
+            lo, hi = float(chunk.min()), float(chunk.max())
+            if self._partial_count == 0:
+                self._partial_min, self._partial_max = lo, hi
+            else:
+                self._partial_min = min(self._partial_min, lo)
+                self._partial_max = max(self._partial_max, hi)
+            self._partial_count += take
+            position += take
+            if self._partial_count == self.block:
+                self.pushBlock(self._partial_min, self._partial_max)
+
+    def pushBlock(self, lo, hi):
+        """Close the current block and expire blocks that left the window"""
+        number = self._block_number
+        while self._mins and self._mins[-1][1] >= lo:
+            self._mins.pop()
+        self._mins.append((number, lo))
+        while self._maxs and self._maxs[-1][1] <= hi:
+            self._maxs.pop()
+        self._maxs.append((number, hi))
+        self._block_number += 1
+        self._partial_count = 0
+        oldest = self._block_number - self._blocks_per_window
+        while self._mins[0][0] < oldest:
+            self._mins.popleft()
+        while self._maxs[0][0] < oldest:
+            self._maxs.popleft()
+
+    def __bool__(self):
+        return bool(self._mins) or self._partial_count > 0
+
+    def min(self):
+        values = [self._mins[0][1]] if self._mins else []
+        if self._partial_count:
+            values.append(self._partial_min)
+        return min(values) if values else None
+
+    def max(self):
+        values = [self._maxs[0][1]] if self._maxs else []
+        if self._partial_count:
+            values.append(self._partial_max)
+        return max(values) if values else None
+
+    def clear(self):
+        self.__init__(self.window, self.block)
+
+
+class AutoScaler:
+    """Y range of the trace, steady against single spikes
+
+    In 'auto' mode the range follows the windowed extremes plus a margin; it
+    only retargets when the data leaves the range or shrinks to less than
+    (1 - hysteresis) of it, and the shown range eases towards the target
+    with time constant `smoothing` seconds. In 'fixed' mode the span is
+    fixed_mv millivolts, centred on the signal so baseline offsets still fit.
+    """
+    def __init__(self, window, block=10, mode='auto', fixed_mv=3.0, counts_per_mv=COUNTS_PER_MV,
+                 margin=0.1, hysteresis=0.3, smoothing=0.15):
+        self.extremes = WindowedExtremes(window, block)
+        self.mode = mode
+        self.fixed_mv = fixed_mv  # Full span of the plot in fixed mode
+        self.counts_per_mv = counts_per_mv
+        self.margin = margin  # Fraction of the data span added above and below
+        self.hysteresis = hysteresis
+        self.smoothing = smoothing
+        self.target = None  # (low, high) the range is easing towards
+        self.low = None  # Currently shown range
+        self.high = None
+        self._last_update = None
+
+    def extend(self, values):
+        self.extremes.extend(values)
+
+    def setMode(self, mode, fixed_mv=None):
+        """Switch between 'auto' and 'fixed'; the range eases to the new target"""
+        self.mode = mode
+        if fixed_mv is not None:
+            self.fixed_mv = fixed_mv
+        self.target = None
+
+    def retarget(self, lo, hi):
+        """Return a new target range, or None to keep the current one"""
+        if self.mode == 'fixed':
+            half = self.fixed_mv * self.counts_per_mv / 2
+            centre = (lo + hi) / 2
+            if self.target is not None:
+                # Recentre only when the signal drifts out of the middle half
+                current = (self.target[0] + self.target[1]) / 2
+                if abs(centre - current) < half / 2 and lo >= self.target[0] and hi <= self.target[1]:
+                    return None
+            return centre - half, centre + half
+        span = max(hi - lo, 1e-9)
+        if self.target is not None:
+            target_span = self.target[1] - self.target[0]
+            inside = lo >= self.target[0] and hi <= self.target[1]
+            if inside and span * (1 + 2 * self.margin) >= (1 - self.hysteresis) * target_span:
+                return None
+        return lo - self.margin * span, hi + self.margin * span
+
+    def update(self, now=None):
+        """Advance the shown range for a new frame; returns (low, high) or None without data
+
+        Cost is independent of the window length.
+        """
+        if not self.extremes:
+            return None
+        now = time.monotonic() if now is None else now
+        target = self.retarget(self.extremes.min(), self.extremes.max())
+        if target is not None:
+            self.target = target
+        if self.low is None:
+            self.low, self.high = self.target
+        else:
+            elapsed = now - self._last_update
+            alpha = 1.0 - math.exp(-elapsed / self.smoothing) if self.smoothing > 0 else 1.0
+            self.low += alpha * (self.target[0] - self.low)
+            self.high += alpha * (self.target[1] - self.high)
+        self._last_update = now
+        return self.low, self.high
+
+    def settled(self):
+        """True once the shown range has reached its target"""
+        if self.target is None or self.low is None:
+            return True
+        tolerance = 1e-3 * max(self.target[1] - self.target[0], 1e-9)
+        return abs(self.low - self.target[0]) < tolerance and abs(self.high - self.target[1]) < tolerance
+
+    def reset(self):
+        """Forget data and range, e.g. after the window length changed"""
+        self.extremes.clear()
+        self.target = None
+        self.low = self.high = None
+        self._last_update = None
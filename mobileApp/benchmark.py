@@ -0,0 +1,371 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import sys
+import time
+import numpy as np
+from protocol import encodeFrame
+from replay import FRAME_SAMPLES, SyntheticECG
+
+# Suites write flat {metric: value} results. Metrics ending in one of
+# HIGHER_IS_BETTER are throughputs; everything else is a cost.
+HIGHER_IS_BETTER = ('_per_s', '_fps', '_speedup')
+# Slowdown factor - 1 each gated metric may show against the baseline; the first
+# matching pattern wins. Tails (p95, max) and CPU shares move more between two runs
+# on the same machine than any tolerance that would still catch a regression, so
+# they are reported but neither stored in the baseline nor gated.
+TOLERANCES = (
+    ('*_p95_ms', None),
+    ('*_max_ms', None),
+    ('*_cpu_percent', None),
+    ('parse_legacy_*', None),  # Old reference parser; baselines written before it was dropped may list it
+    ('parse_lines_speedup', 0.3),  # Ratio of two timings taken in turn
+    ('parse_lines_ns_per_line', 0.75),  # Swings about 1.5x between runs on a shared core
+    ('parse_*', 1.0),  # Best of several repeats
+    ('add_data_samples_per_s', 1.0),
+    ('render_sweep_*_ms', 2.0),  # Medians well under a millisecond; a full redraw would be 10x
+    ('render_*_ms', 1.0),  # Median frame
+    ('latency_mean_ms', 1.0),
+    ('startup_first_paint_ms', 1.0),  # Best of several cold starts
+    ('startup_modules', 0.25),  # Modules imported before the first paint
+)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+LINE_RATES = (1000, 10000, 100000)  # ASCII lines per second the parser is exercised at
+READS_PER_SECOND = 100  # A bulk read every ~10 ms, as the reader sees on a busy link
+WINDOW_SECONDS = (5, 60, 600)
+WIDGET_SIZES = ((640, 360), (1280, 720), (1920, 1080))
+
+
+def synthetic(count):
+    """count int16 ECG samples"""
+    samples, _ = SyntheticECG(seed=0).read(count)
+    return samples
+
+
+def bestOf(repeats, function):
+    """Smallest wall time of repeats calls, the least noisy estimate on a shared machine"""
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bestOfInterleaved(repeats, *functions):
+    """Smallest wall time of each function, calling them in turn so a ratio sees the same machine state"""
+    best = [None] * len(functions)
+    for _ in range(repeats):
+        for index, function in enumerate(functions):
+            started = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - started
+            best[index] = elapsed if best[index] is None else min(best[index], elapsed)
+    return best
+
+
+def legacyParse(lines):
+    """The original per-line readData checks, kept to measure the parser against"""
+    samples = []
+    for raw in lines:
+        data = raw.decode('utf-8').strip()
+        if data:
+            if data.split('bpm')[0] == '' and data != '':
+                try:
+                    int(data.split('bpm')[1])
+                except ValueError:
+                    pass
+            elif data.split('Ошибка')[0] == '' and data != '':
+                pass
+            elif data == 'breath' or data == 'noBreath':
+                pass
+            else:
+                try:
+                    samples.append(float(data))
+                except ValueError:
+                    pass
+    return samples
+
+
+def benchmarkLineParser(quick=False):
+    """LineParser against the original readData checks on the same lines"""
+    from lineparser import LineParser
+    repeats = 5 if quick else 20
+    samples = synthetic(10000)
+    lines = [b'%d\r' % value for value in samples.tolist()]
+    chunks = [lines[start:start + 100] for start in range(0, len(lines), 100)]
+    # Every 15 s at 100 samples/s a bpm and a breath line interrupt the samples
+    with_records = [list(chunk) for chunk in chunks]
+    for chunk in with_records[::15]:
+        chunk[50:50] = [b'bpm72\r', b'breath\r']
+    parser = LineParser()
+
+    def parseAll(parse, data):
+        return lambda: [parse(chunk) for chunk in data]
+
+    legacy, current = bestOfInterleaved(repeats, parseAll(legacyParse, with_records),
+                                        parseAll(parser.parse, with_records))
+    # The legacy timing is not product code; it only serves as the speedup's reference
+    return {
+        'parse_lines_ns_per_line': 1e9 * current / len(lines),
+        'parse_lines_speedup': legacy / current,
+    }
+
+
+def benchmarkParsing(quick=False):
+    """ASCII line parsing and binary frame decoding at several line rates
+
+    One second of input is split into the chunks the reader would get and
+    pushed through handleLines/handleFrames with a consumer that accepts
+    every batch; cpu_percent is the share of one core that second costs.
+    """
+    from reader import SerialReader
+    results = benchmarkLineParser(quick)
+    repeats = 3 if quick else 5
+    for rate in LINE_RATES:
+        samples = synthetic(rate)
+        chunk = max(rate // READS_PER_SECOND, 1)
+        lines = [b'%d\r' % value for value in samples.tolist()]
+        ascii_chunks = [lines[start:start + chunk] for start in range(0, rate, chunk)]
+        frames = b''.join(encodeFrame(seq, samples[start:start + FRAME_SAMPLES])
+                          for seq, start in enumerate(range(0, rate, FRAME_SAMPLES)))
+        frame_bytes = len(frames) * chunk // rate
+        binary_chunks = [frames[start:start + frame_bytes] for start in range(0, len(frames), frame_bytes)]
+
+        reader = SerialReader('/dev/null')
+        reader.samplesReady.connect(reader.batchDelivered)
+
+        def parseAscii():
+            for chunk_lines in ascii_chunks:
+                reader.handleLines(chunk_lines, 0.0)
+
+        def parseBinary():
+            for data in binary_chunks:
+                reader.handleFrames(data, 0.0)
+
+        seconds = bestOf(repeats, parseAscii)
+        results[f'parse_ascii_{rate}_cpu_percent'] = 100 * seconds
+        results[f'parse_ascii_{rate}_lines_per_s'] = rate / seconds
+        seconds = bestOf(repeats, parseBinary)
+        results[f'parse_binary_{rate}_cpu_percent'] = 100 * seconds
+        results[f'parse_binary_{rate}_samples_per_s'] = rate / seconds
+    return results
+
+
+def benchmarkRendering(quick=False):
+    """GraphWidget.addData/addSamples and paintEvent rendered offscreen into a QImage
+
+    Sweep mode frames render only the region its sweep reports as changed,
+    as update(region) does on screen.
+    """
+    from PyQt5.QtCore import QPoint
+    from PyQt5.QtGui import QImage
+    from usb import GraphWidget
+    results = {}
+    sample_rate = 100
+    frames = 10 if quick else 30
+    samples = synthetic(max(WINDOW_SECONDS) * sample_rate + frames * sample_rate)
+    per_frame = sample_rate // 60 + 1  # New samples per frame at 60 fps
+
+    widget = GraphWidget(sample_rate=sample_rate)
+    started = time.perf_counter()
+    for value in samples[:10000].tolist():
+        widget.addData(value)
+    results['add_data_samples_per_s'] = 10000 / (time.perf_counter() - started)
+
+    for mode, prefix in (('scroll', 'render'), ('sweep', 'render_sweep')):
+        for seconds in WINDOW_SECONDS:
+            sizes = WIDGET_SIZES[1:2] if quick else WIDGET_SIZES
+            for width, height in sizes:
+                widget = GraphWidget(sample_rate=sample_rate, window_seconds=seconds)
+                widget.setDisplayMode(mode)
+                widget.resize(width, height)
+                widget.addSamples(samples[:seconds * sample_rate])
+                image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+                widget.render(image)  # Builds the cached background
+                position = seconds * sample_rate
+                times = []
+                for _ in range(frames):
+                    started = time.perf_counter()
+                    widget.addSamples(samples[position:position + per_frame])
+                    if widget.sweep is None:
+                        widget.render(image)
+                    else:
+                        region = widget.sweep.advance(widget)
+                        widget.render(image, QPoint(), region)
+                    times.append(time.perf_counter() - started)
+                    position += per_frame
+                name = f'{prefix}_{seconds}s_{width}x{height}'
+                results[f'{name}_ms'] = 1000 * float(np.median(times))
+                results[f'{name}_p95_ms'] = 1000 * float(np.percentile(times, 95))
+    return results
+
+
+def benchmarkLatency(quick=False):
+    """Delay from a sample being due on a pty-fed fake ESP32 to the frame that shows it"""
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    from replay import PtyBridge, ReplayStream
+    from sources import SerialSource
+    from usb import USBConnectionWindow
+    seconds = 3.0 if quick else 8.0
+    warmup = 1.0
+    stream = ReplayStream(SyntheticECG(seed=0), speed=1.0, timeout=0.01)
+    bridge = PtyBridge(stream)
+    window = USBConnectionWindow(selected_signals={'ЭКГ'}, data_source=SerialSource(bridge.port))
+    panel = window.panels[0]
+    panel.session.record_sessions = False
+    panel.session.baud_candidates = ()  # A pty has no line rate to negotiate
+    window.resize(1280, 720)
+    window.show()
+    graph = panel.graph_widget
+    scheduler = graph.frame_scheduler
+    latencies = []
+    painted = scheduler.framePainted
+
+    def framePainted(paint_seconds):
+        # The newest painted sample was due at stream start + its index / rate
+        now = time.monotonic()
+        newest = graph.data.total_written
+        if newest and now - stream._start > warmup:
+            latencies.append(now - (stream._start + newest / stream.sample_rate))
+        painted(paint_seconds)
+
+    scheduler.framePainted = framePainted
+    app = QApplication.instance()
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec_()
+    stats = scheduler.stats()
+    reader_stats = window.readerStats()
+    window.close()
+    bridge.close()
+    latencies = np.array(latencies) * 1000
+    if not len(latencies):
+        return {'latency_frames': 0}
+    return {
+        'latency_mean_ms': float(latencies.mean()),
+        'latency_p95_ms': float(np.percentile(latencies, 95)),
+        'latency_max_ms': float(latencies.max()),
+        'latency_fps': stats['fps'],
+        'latency_dropped_samples': reader_stats.get('dropped_samples', 0),
+    }
+
+
+def benchmarkStartup(quick=False):
+    """Cold start of main.py to its first paint, each run in a fresh interpreter"""
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    best = {}
+    with tempfile.TemporaryDirectory() as directory:
+        report_path = os.path.join(directory, 'startup.json')
+        for _ in range(3 if quick else 7):
+            subprocess.run([sys.executable, main_path, '--startup-report', report_path, '--quit-after-startup'],
+                           cwd=os.path.dirname(main_path), check=True, timeout=60,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            with open(report_path) as f:
+                for metric, value in json.load(f).items():
+                    best[metric] = min(best.get(metric, value), value)
+    return best
+
+
+SUITES = {
+    'parse': benchmarkParsing,
+    'render': benchmarkRendering,
+    'latency': benchmarkLatency,
+    'startup': benchmarkStartup,
+}
+
+
+def tolerance(metric):
+    """Allowed slowdown of metric as a fraction, None if it is not gated"""
+    for pattern, allowed in TOLERANCES:
+        if fnmatch.fnmatchcase(metric, pattern):
+            return allowed
+    return None
+
+
+def compare(results, baseline, scale=1.0):
+    """Return (metric, baseline, value) for every gated metric slower than its tolerance allows
+
+    scale widens or narrows every tolerance, e.g. for a noisy CI machine.
+    """
+    regressions = []
+    for metric, expected in baseline.items():
+        value = results.get(metric)
+        allowed = tolerance(metric)
+        if value is None or not expected or allowed is None:
+            continue
+        factor = 1 + allowed * scale
+        if metric.endswith(HIGHER_IS_BETTER):
+            worse = value < expected / factor
+        else:
+            worse = value > expected * factor
+        if worse:
+            regressions.append((metric, expected, value))
+    return regressions
+
+
+def main():
+    """Run the suites headless, write JSON results and check them against the baseline"""
+    parser = argparse.ArgumentParser(description='Benchmark parsing, rendering, end-to-end latency and start-up')
+    parser.add_argument('suites', nargs='*', help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument('--quick', action='store_true', help='fewer repeats and sizes')
+    parser.add_argument('--output', help='write results as JSON to this file (default: stdout)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance-scale', type=float, default=1.0, metavar='FACTOR',
+                        help='multiply every per-metric tolerance (see TOLERANCES) by FACTOR')
+    parser.add_argument('--update-baseline', action='store_true', help='store these results in the baseline')
+    args = parser.parse_args()
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite: {', '.join(sorted(unknown))}")
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    results = {}
+    for name in args.suites or list(SUITES):
+        results.update(SUITES[name](args.quick))
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'quick': args.quick,
+        'results': results,
+    }
+
+    if args.update_baseline:
+        # Suites that did not run keep their previous baseline values
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update((metric, value) for metric, value in results.items() if tolerance(metric) is not None)
+        baseline = {metric: value for metric, value in baseline.items() if tolerance(metric) is not None}
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['regressions'] = [{'metric': metric, 'baseline': expected, 'value': value}
+                                 for metric, expected, value in compare(results, baseline, args.tolerance_scale)]
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    if report.get('regressions'):
+        for regression in report['regressions']:
+            print(f"regression: {regression['metric']} {regression['value']:.3g} "
+                  f"(baseline {regression['baseline']:.3g})", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import math
+from collections import deque
+
+
+class BreathDetector:
+    """Streaming breathing-rate estimator for the breath sensor's humidity
+
+    Exhaled air is humid, so every breath is a bump in relative humidity.
+    The series is smoothed with a short moving average, its slow baseline
+    (room humidity, sensor drift) is tracked with an exponential average and
+    removed, and a breath is an upward crossing of the remainder through a
+    hysteresis band scaled to the recent breath amplitude. State is a few
+    numbers plus the breath times of the last window_seconds.
+    """
+    def __init__(self, sample_rate=1.0, smoothing_seconds=2.0, baseline_seconds=10.0, window_seconds=60.0,
+                 apnea_seconds=10.0, min_amplitude=1.0):
+        self.sample_rate = sample_rate
+        self.window_seconds = window_seconds  # Breaths the rolling rate is computed from
+        self.apnea_seconds = apnea_seconds  # No breath for this long counts as apnea
+        self.min_amplitude = min_amplitude  # %RH; smaller wiggles are noise (a DHT11 steps by whole percent)
+        self._smoothing = max(int(round(smoothing_seconds * sample_rate)), 1)
+        self._baseline_alpha = 1 - math.exp(-1 / (baseline_seconds * sample_rate))
+        # The amplitude estimate forgets a breath over about two breaths at rest
+        self._envelope_decay = math.exp(-1 / (8.0 * sample_rate))
+        self.reset()
+
+    def reset(self):
+        """Forget everything, e.g. for a new subject"""
+        self._recent = deque(maxlen=self._smoothing)
+        self._baseline = None
+        self._envelope = 0.0
+        self._above = True  # A breath needs a dip first, so an offset at start-up is not one
+        self._breaths = deque()  # Times in seconds of breaths within window_seconds
+        self.samples = 0
+        self.rate = None  # Breaths per minute, None until two breaths are seen
+
+    @property
+    def time(self):
+        """Seconds of humidity processed so far"""
+        return self.samples / self.sample_rate
+
+    def process(self, values):
+        """Feed humidity values in %RH and return the times of breaths found in them"""
+        found = []
+        for value in values:
+            self._recent.append(float(value))
+            smooth = sum(self._recent) / len(self._recent)
+            if self._baseline is None:
+                self._baseline = smooth
+            self._baseline += self._baseline_alpha * (smooth - self._baseline)
+            deviation = smooth - self._baseline
+            self._envelope = max(abs(deviation), self._envelope * self._envelope_decay)
+            band = max(0.3 * self._envelope, self.min_amplitude / 2)
+            self.samples += 1
+            if not self._above and deviation > band:
+                self._above = True
+                found.append(self.time)
+                self._breaths.append(self.time)
+            elif self._above and deviation < -band:
+                self._above = False
+        while self._breaths and self._breaths[0] < self.time - self.window_seconds:
+            self._breaths.popleft()
+        if self.status() == 0:
+            self.rate = None
+        elif len(self._breaths) >= 2:
+            self.rate = 60.0 * (len(self._breaths) - 1) / (self._breaths[-1] - self._breaths[0])
+        return found
+
+    def status(self):
+        """1 breathing, 0 no breath for apnea_seconds, None while there is too little data"""
+        last = self._breaths[-1] if self._breaths else 0.0
+        if self.time - last <= self.apnea_seconds:
+            return 1 if self._breaths else None
+        return 0
@@ -0,0 +1,100 @@
+from protocol import CHANNEL_BREATH, CHANNEL_ECG, CHANNEL_EMG, CHANNEL_HUMIDITY, CHANNEL_PPG
+from ringbuffer import RingBuffer
+
+WAVEFORM = 'waveform'  # Continuous samples, drawn as a trace
+STATUS = 'status'  # Occasional values such as breath / no breath
+
+
+class Channel:
+    """One signal stream: identity, rate, history, decoder and consumers
+
+    decoder (anything with process(samples)) runs in the reader thread;
+    buffer and consumers belong to the GUI thread.
+    """
+    def __init__(self, channel_id, label, sample_rate, kind=WAVEFORM, color='#0096c8', history_seconds=600,
+                 unit='', signal=None, display_seconds=None):
+        self.id = channel_id  # Number used on the wire
+        self.label = label  # Name shown in the UI
+        self.signal = signal or label  # Entry of selected_signals that enables this channel
+        self.sample_rate = sample_rate
+        self.display_seconds = display_seconds  # Fixed length of the trace; None follows the graph
+        self.kind = kind
+        self.color = color
+        self.unit = unit
+        self.buffer = RingBuffer(max(int(history_seconds * sample_rate), 1))
+        self.decoder = None
+        self.consumers = []  # Callables taking (channel, values)
+        self.enabled = False  # Only enabled channels store and forward data
+
+    def subscribe(self, consumer):
+        self.consumers.append(consumer)
+
+    def push(self, values):
+        """Store a batch and pass it on to every consumer"""
+        self.buffer.extend(values)
+        for consumer in self.consumers:
+            consumer(self, values)
+
+    def __repr__(self):
+        return f"Channel({self.id}, {self.label!r}, {self.sample_rate} Hz)"
+
+
+class ChannelRegistry:
+    """Channels by wire number, so parsed batches are dispatched with one dict lookup"""
+    def __init__(self, channels=()):
+        self._channels = {}
+        for channel in channels:
+            self.register(channel)
+
+    def register(self, channel):
+        if channel.id in self._channels:
+            raise ValueError(f'channel {channel.id} is already registered')
+        self._channels[channel.id] = channel
+        return channel
+
+    def get(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def byLabel(self, label):
+        for channel in self._channels.values():
+            if channel.label == label:
+                return channel
+        return None
+
+    def __iter__(self):
+        return iter(self._channels.values())
+
+    def __len__(self):
+        return len(self._channels)
+
+    def enable(self, signals):
+        """Enable exactly the channels whose signal is in signals"""
+        for channel in self._channels.values():
+            channel.enabled = channel.signal in signals
+
+    def enabledChannels(self, kind=None):
+        """Enabled channels in registration order, optionally of one kind"""
+        return [channel for channel in self._channels.values()
+                if channel.enabled and (kind is None or channel.kind == kind)]
+
+    def dispatch(self, channel_id, values):
+        """Push values to an enabled channel; returns False if nobody wants them"""
+        channel = self._channels.get(channel_id)
+        if channel is None or not channel.enabled:
+            return False
+        channel.push(values)
+        return True
+
+
+def defaultChannels(sample_rate=100, history_seconds=600):
+    """Channels the app knows about; only ЭКГ and Дыхание have firmware support so far"""
+    return ChannelRegistry([
+        Channel(CHANNEL_ECG, 'ЭКГ', sample_rate, color='#0096c8', history_seconds=history_seconds),
+        # Breath is a status reported once per 15 s window: 1 breathing, 0 not
+        Channel(CHANNEL_BREATH, 'Дыхание', 1 / 15, kind=STATUS, history_seconds=history_seconds),
+        Channel(CHANNEL_EMG, 'ЭМГ', 1000, color='#c85a00', history_seconds=history_seconds),
+        Channel(CHANNEL_PPG, 'ФПГ', sample_rate, color='#b4003c', history_seconds=history_seconds),
+        # Raw breath sensor humidity, once per second; drawn over a minute so breaths are visible
+        Channel(CHANNEL_HUMIDITY, 'Влажность', 1, color='#2a9d8f', history_seconds=history_seconds, unit='%',
+                signal='Дыхание', display_seconds=60),
+    ])
@@ -0,0 +1,35 @@
+import numpy as np
+
+
+def minMaxEnvelope(values, bins, first_index=0):
+    """Reduce values to a min/max pair per bin, keeping each pair in time order
+
+    Returns (positions, samples) where positions are indices into values.
+    Bins are aligned to absolute sample numbers (first_index is the absolute
+    number of values[0]) so the envelope does not shimmer while scrolling.
+    """
+    values = np.asarray(values)
+    count = len(values)
+    if bins <= 0 or count <= 2 * bins:
+        return np.arange(count, dtype=np.float64), values
+    size = -(-count // bins)  # Samples per bin, rounded up
+    pad = first_index % size
+    total = pad + count
+    total += -total % size
+    # Pad the front and back with edge values so the data reshapes into whole bins
+    padded = np.pad(values, (pad, total - pad - count), mode='edge').reshape(-1, size)
+
+    low = padded.argmin(axis=1)
+    high = padded.argmax(axis=1)
+    first = np.minimum(low, high)
+    second = np.maximum(low, high)
+    offsets = np.arange(padded.shape[0]) * size - pad
+    positions = np.empty(2 * padded.shape[0], dtype=np.float64)
+    positions[0::2] = offsets + first
+    positions[1::2] = offsets + second
+    np.clip(positions, 0, count - 1, out=positions)
+    rows = np.arange(padded.shape[0])
+    samples = np.empty(2 * padded.shape[0], dtype=values.dtype)
+    samples[0::2] = padded[rows, first]
+    samples[1::2] = padded[rows, second]
+    return positions, samples
@@ -0,0 +1,93 @@
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+import serial.tools.list_ports
+
+try:
+    import pyudev  # Optional: lets us react to hotplug events on Linux instead of polling
+except ImportError:
+    pyudev = None
+
+# Keywords in the port description of USB-UART bridges used on ESP32 boards
+ESP32_KEYWORDS = ['ESP32', 'CP210', 'CH340', 'FTDI']
+# Some ESP32 boards might not have descriptive names, so check VID too
+ESP32_VIDS = [
+    'VID:10C4',  # CP210x USB to UART Bridge
+    'VID:1A86',  # CH340 USB to Serial
+    'VID:0403',  # FTDI
+]
+
+
+def isESP32Port(port):
+    """Check if a list_ports entry looks like an ESP32 board"""
+    description = (port.description or '').upper()
+    if any(keyword in description for keyword in ESP32_KEYWORDS):
+        return True
+    hwid = port.hwid or ''
+    return any(esp32_id in hwid for esp32_id in ESP32_VIDS)
+
+
+class DeviceDiscovery(QThread):
+    """Watch for ESP32 serial ports in the background"""
+    portsChanged = pyqtSignal(list)  # Sorted device paths of every matching port
+
+    def __init__(self, parent=None, poll_interval=2.0):
+        super().__init__(parent)
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._match_cache = {}  # (device, description, hwid) -> bool
+        self._ports = None
+        self.scans = 0
+
+    def run(self):
+        """Scan once, then rescan on hotplug events or every poll_interval"""
+        self.scan()
+        monitor = self.createMonitor()
+        while not self._stop_event.is_set():
+            if monitor is not None:
+                # Blocks until a tty appears/disappears or the timeout expires,
+                # so stop() is still honoured within poll_interval
+                device = monitor.poll(timeout=self.poll_interval)
+                if device is None:
+                    continue
+            elif self._stop_event.wait(self.poll_interval):
+                break
+            self.scan()
+
+    def createMonitor(self):
+        """Return a udev monitor for tty devices, or None to fall back to polling"""
+        if pyudev is None:
+            return None
+        try:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            monitor.filter_by(subsystem='tty')
+            monitor.start()
+            return monitor
+        except Exception as e:
+            print(f"udev monitoring unavailable, polling instead: {e}")
+            return None
+
+    def scan(self):
+        """Enumerate ports and emit portsChanged when the set of ESP32 ports differs"""
+        self.scans += 1
+        try:
+            ports = serial.tools.list_ports.comports()
+        except Exception as e:
+            print(f"Error detecting ESP32: {e}")
+            return
+        found = []
+        for port in ports:
+            key = (port.device, port.description, port.hwid)
+            match = self._match_cache.get(key)
+            if match is None:
+                match = self._match_cache[key] = isESP32Port(port)
+            if match:
+                found.append(port.device)
+        found.sort()
+        if found != self._ports:
+            self._ports = found
+            self.portsChanged.emit(found)
+
+    def stop(self):
+        """Stop watching and wait for the thread to finish"""
+        self._stop_event.set()
+        self.wait()
@@ -0,0 +1,85 @@
+import time
+import numpy as np
+from scipy import signal
+
+
+class FilterChain:
+    """Streaming ECG conditioning: baseline high-pass, mains notch, low-pass
+
+    All sections are cascaded into one second-order-section array and run
+    with persistent state, so feeding a recording in chunks gives exactly
+    the same output as filtering it in one go. Sections at or above the
+    Nyquist frequency are left out (e.g. a 50 Hz notch at 100 samples/s).
+    """
+    def __init__(self, sample_rate=100, highpass=0.5, notch=50.0, lowpass=40.0, notch_q=30.0,
+                 latency_budget=0.005):
+        self.sample_rate = sample_rate
+        self.highpass = highpass  # Hz, None disables; removes baseline wander
+        self.notch = notch  # Hz, None disables; mains interference
+        self.lowpass = lowpass  # Hz, None disables; muscle noise
+        self.latency_budget = latency_budget  # Seconds a single batch may take
+        self.sos = self.design(notch_q)
+        self._zi = None
+        # Timing counters
+        self.batches = 0
+        self.over_budget = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def design(self, notch_q):
+        """Return the cascaded sections for the enabled stages"""
+        fs = float(self.sample_rate)
+        nyquist = fs / 2
+        sections = []
+        if self.highpass and self.highpass < nyquist:
+            sections.append(signal.butter(2, self.highpass, btype='highpass', fs=fs, output='sos'))
+        if self.notch and self.notch < nyquist:
+            b, a = signal.iirnotch(self.notch, notch_q, fs=fs)
+            sections.append(signal.tf2sos(b, a))
+        if self.lowpass and self.lowpass < nyquist:
+            sections.append(signal.butter(2, self.lowpass, btype='lowpass', fs=fs, output='sos'))
+        if not sections:
+            return np.array([[1.0, 0.0, 0.0, 1.0, 0.0, 0.0]])  # Pass-through
+        return np.concatenate(sections)
+
+    def initialState(self, first_value):
+        """Filter state settled on first_value, so the output does not ring at start"""
+        return signal.sosfilt_zi(self.sos) * first_value
+
+    def process(self, samples):
+        """Filter one batch and return float64 output of the same length"""
+        start = time.perf_counter()
+        samples = np.asarray(samples, dtype=np.float64)
+        if len(samples) == 0:
+            return samples
+        if self._zi is None:
+            self._zi = self.initialState(samples[0])
+        filtered, self._zi = signal.sosfilt(self.sos, samples, zi=self._zi)
+        elapsed = time.perf_counter() - start
+        self.batches += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        if elapsed > self.latency_budget:
+            self.over_budget += 1
+        return filtered
+
+    def filterOffline(self, samples):
+        """Filter a whole recording at once, with the same start-up as process()"""
+        samples = np.asarray(samples, dtype=np.float64)
+        if len(samples) == 0:
+            return samples
+        filtered, _ = signal.sosfilt(self.sos, samples, zi=self.initialState(samples[0]))
+        return filtered
+
+    def reset(self):
+        """Forget the filter state, e.g. after a reconnect"""
+        self._zi = None
+
+    def stats(self):
+        """Timing summary in milliseconds"""
+        return {
+            'filter_batches': self.batches,
+            'filter_ms_mean': 1000 * self.total_seconds / self.batches if self.batches else 0.0,
+            'filter_ms_max': 1000 * self.max_seconds,
+            'filter_over_budget': self.over_budget,
+        }
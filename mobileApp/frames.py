@@ -0,0 +1,74 @@
+import time
+from PyQt5.QtCore import QObject, QTimer, Qt
+from PyQt5.QtGui import QGuiApplication
+
+
+class FrameScheduler(QObject):
+    """Coalesce repaint requests for a widget into at most one update() per frame"""
+    def __init__(self, widget, fps=None):
+        super().__init__(widget)
+        self.widget = widget
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.onTick)
+        self.setFps(fps)
+        self._dirty = False
+        self._pending_samples = 0
+        self.resetStats()
+
+    def setFps(self, fps=None):
+        """Cap repaints at fps, or at the display refresh rate when fps is None"""
+        if fps is None:
+            screen = QGuiApplication.primaryScreen()
+            fps = screen.refreshRate() if screen is not None else 0
+            if not fps or fps < 1:
+                fps = 60
+        self.fps = fps
+        self.timer.setInterval(max(int(1000 / fps), 1))
+
+    def requestFrame(self, samples=0):
+        """Mark the widget dirty; the next tick repaints it once"""
+        self._dirty = True
+        self._pending_samples += samples
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def onTick(self):
+        """Issue one update() if anything changed since the last frame"""
+        if not self._dirty:
+            # Nothing to draw - stop ticking until the next request
+            self.timer.stop()
+            return
+        self._dirty = False
+        self.frames_requested += 1
+        self.samples_drawn += self._pending_samples
+        self._pending_samples = 0
+        # Widgets that repaint only what changed, like a sweeping graph, say so in updateFrame()
+        getattr(self.widget, 'updateFrame', self.widget.update)()
+
+    def framePainted(self, seconds):
+        """Record how long a paintEvent took"""
+        self.frames_painted += 1
+        self.paint_time_total += seconds
+        self.paint_time_max = max(self.paint_time_max, seconds)
+
+    def resetStats(self):
+        """Zero the frame counters"""
+        self.frames_requested = 0
+        self.frames_painted = 0
+        self.samples_drawn = 0
+        self.paint_time_total = 0.0
+        self.paint_time_max = 0.0
+        self.stats_started = time.monotonic()
+
+    def stats(self):
+        """Return frame-time and samples-per-frame statistics"""
+        elapsed = max(time.monotonic() - self.stats_started, 1e-9)
+        frames = max(self.frames_painted, 1)
+        return {
+            'fps_cap': self.fps,
+            'fps': self.frames_painted / elapsed,
+            'frame_time_ms': 1000 * self.paint_time_total / frames,
+            'frame_time_max_ms': 1000 * self.paint_time_max,
+            'samples_per_frame': self.samples_drawn / max(self.frames_requested, 1),
+        }
@@ -0,0 +1,229 @@
+import numpy as np
+from PyQt5.QtCore import QTimer, pyqtSignal
+from PyQt5.QtGui import (QOpenGLBuffer, QOpenGLContext, QOpenGLShader, QOpenGLShaderProgram, QOpenGLVersionProfile,
+                         QPainter, QSurfaceFormat)
+from PyQt5.QtWidgets import QOpenGLWidget
+from graph import GraphView
+
+GL_LINE_STRIP = 0x0003
+GL_FLOAT = 0x1406
+GL_SCISSOR_TEST = 0x0C11
+GL_RENDERER = 0x1F01
+VERTEX_DTYPE = np.dtype(np.float32)
+
+# Slots of the mirrored buffer become x, the scroll offset is the start uniform.
+# Written for GLSL ES 1.00; Qt defines the precision qualifiers away on desktop GL.
+VERTEX_SHADER = """
+attribute highp float position;
+attribute highp float value;
+uniform highp float start;
+uniform highp float span;
+uniform highp vec2 range;
+void main() {
+    highp float x = (position - start) / span;
+    highp float y = (value - range.x) / (range.y - range.x);
+    gl_Position = vec4(2.0 * x - 1.0, clamp(2.0 * y - 1.0, -1.0, 1.0), 0.0, 1.0);
+}
+"""
+FRAGMENT_SHADER = """
+uniform lowp vec4 color;
+void main() {
+    gl_FragColor = color;
+}
+"""
+
+_available = None
+
+
+def openglAvailable():
+    """True if this platform can create an OpenGL context (Mesa llvmpipe counts, offscreen does not)"""
+    global _available
+    if _available is None:
+        _available = QOpenGLContext().create()
+    return _available
+
+
+def mirroredWrites(total, count, capacity):
+    """(slot, first, last) copies that put samples total-count..total-1 into a mirrored buffer
+
+    Sample k lives at slot k % capacity and again at that slot + capacity,
+    so the newest capacity samples are always one contiguous range.
+    first and last index the count new samples.
+    """
+    count = min(count, capacity)
+    slot = (total - count) % capacity
+    first = min(count, capacity - slot)
+    writes = [(slot, 0, first), (slot + capacity, 0, first)]
+    if count > first:
+        writes += [(0, first, count), (capacity, first, count)]
+    return writes
+
+
+def drawRange(total, count, capacity):
+    """(first slot, vertex count) of the newest count samples in a mirrored buffer"""
+    end = total % capacity + capacity
+    return end - count, count
+
+
+class TraceBuffer:
+    """Vertex buffers of one lane: the mirrored samples and their slot numbers
+
+    Only samples written since the last frame are uploaded; scrolling is
+    the start uniform of the shader.
+    """
+    def __init__(self, data):
+        self.data = data  # The trace's RingBuffer this buffer mirrors
+        self.capacity = data.capacity
+        self.uploaded = 0  # data.total_written at the last sync
+        size = 2 * self.capacity * VERTEX_DTYPE.itemsize
+        self.positions = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self.positions.create()
+        self.positions.bind()
+        positions = np.arange(2 * self.capacity, dtype=VERTEX_DTYPE)
+        self.positions.allocate(positions.tobytes(), size)
+        self.positions.release()
+        self.values = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self.values.setUsagePattern(QOpenGLBuffer.DynamicDraw)
+        self.values.create()
+        self.values.bind()
+        self.values.allocate(size)
+        self.values.release()
+
+    def sync(self):
+        """Upload the samples added to data since the last call"""
+        total = self.data.total_written
+        if total < self.uploaded:
+            self.uploaded = 0  # The trace was cleared
+        count = min(total - self.uploaded, len(self.data))
+        if count <= 0:
+            return
+        values = np.ascontiguousarray(self.data.last(count), dtype=VERTEX_DTYPE)
+        self.values.bind()
+        for slot, first, last in mirroredWrites(total, count, self.capacity):
+            chunk = values[first:last]
+            self.values.write(slot * VERTEX_DTYPE.itemsize, chunk.tobytes(), chunk.nbytes)
+        self.values.release()
+        self.uploaded = total
+
+    def destroy(self):
+        self.positions.destroy()
+        self.values.destroy()
+
+
+class GLGraphWidget(GraphView, QOpenGLWidget):
+    """OpenGL renderer: every sample of a lane drawn as one line strip on the GPU
+
+    Labels, pulse and overlay still come from QPainter on the same
+    surface, so both renderers look the same. If OpenGL turns out to be
+    unusable the lanes are drawn with QPainter and renderFailed is emitted.
+    """
+    renderer = 'opengl'
+    renderFailed = pyqtSignal(str)
+
+    def __init__(self, parent=None, sample_rate=100, window_seconds=5):
+        super().__init__(parent)
+        surface_format = QSurfaceFormat()
+        surface_format.setSamples(4)  # Multisampling stands in for QPainter's antialiasing
+        self.setFormat(surface_format)
+        self.gl = None  # OpenGL 2.0 / ES 2 functions once initializeGL succeeded
+        self.gl_renderer = ''  # GL_RENDERER string, e.g. "llvmpipe" for Mesa's software rasteriser
+        self.program = None
+        self.buffers = {}  # Trace -> TraceBuffer
+        self.failed = None  # Why OpenGL could not be used
+        self.initGraph(sample_rate, window_seconds)
+
+    def initializeGL(self):
+        """Resolve the GL functions and build the shader; runs again if the context is recreated"""
+        self.buffers = {}
+        context = self.context()
+        if context.isOpenGLES():
+            functions = context.versionFunctions()
+        else:
+            profile = QOpenGLVersionProfile()
+            profile.setVersion(2, 0)
+            functions = context.versionFunctions(profile)
+        if functions is None or not functions.initializeOpenGLFunctions():
+            self.fail('OpenGL 2.0 is not available')
+            return
+        program = QOpenGLShaderProgram(self)
+        if not (program.addShaderFromSourceCode(QOpenGLShader.Vertex, VERTEX_SHADER)
+                and program.addShaderFromSourceCode(QOpenGLShader.Fragment, FRAGMENT_SHADER)
+                and program.link()):
+            self.fail(program.log())
+            return
+        self.gl = functions
+        self.gl_renderer = functions.glGetString(GL_RENDERER) or ''
+        self.program = program
+        context.aboutToBeDestroyed.connect(self.releaseBuffers)
+
+    def fail(self, message):
+        """Give up on OpenGL; the owner hears about it once the current paint is over"""
+        self.gl = None
+        self.failed = message
+        QTimer.singleShot(0, lambda: self.renderFailed.emit(message))
+
+    def releaseBuffers(self):
+        """Free the vertex buffers while their context still exists"""
+        self.makeCurrent()
+        for buffer in self.buffers.values():
+            buffer.destroy()
+        self.buffers = {}
+        self.doneCurrent()
+
+    def paintGL(self):
+        """Draw the graph; lanes go through drawSamples below"""
+        painter = QPainter(self)
+        self.paintGraph(painter)
+        painter.end()
+        # Lanes replaced by setChannels or setWindowSeconds no longer need their buffers
+        for trace in [trace for trace in self.buffers if trace not in self.traces_by_id.values()]:
+            self.buffers.pop(trace).destroy()
+
+    def drawSamples(self, painter, trace, left, top, width, height, min_val, max_val):
+        """Draw every sample of one lane as a line strip"""
+        if self.gl is None:
+            super().drawSamples(painter, trace, left, top, width, height, min_val, max_val)
+            return
+        painter.beginNativePainting()
+        try:
+            self.drawStrip(trace, left, top, width, height, min_val, max_val)
+        finally:
+            painter.endNativePainting()
+
+    def drawStrip(self, trace, left, top, width, height, min_val, max_val):
+        """Sync the lane's buffer and draw it into the lane's viewport"""
+        buffer = self.buffers.get(trace)
+        if buffer is None or buffer.data is not trace.data:
+            if buffer is not None:
+                buffer.destroy()
+            buffer = self.buffers[trace] = TraceBuffer(trace.data)
+        buffer.sync()
+        start, count = drawRange(trace.data.total_written, len(trace.data), buffer.capacity)
+
+        gl = self.gl
+        ratio = self.devicePixelRatioF()
+        # GL counts rows from the bottom; the scissor keeps clamped lines inside the lane
+        x, y = int(left * ratio), int((self.height() - top - height) * ratio)
+        gl.glViewport(x, y, int(width * ratio), int(height * ratio))
+        gl.glScissor(x, y, int(width * ratio), int(height * ratio))
+        gl.glEnable(GL_SCISSOR_TEST)
+        gl.glLineWidth(trace.pen.widthF() * ratio)
+
+        program = self.program
+        program.bind()
+        program.setUniformValue('start', float(start))
+        program.setUniformValue('span', float(max(count - 1, 1)))
+        program.setUniformValue('range', float(min_val), float(max_val if max_val != min_val else min_val + 1))
+        program.setUniformValue('color', trace.pen.color())
+        buffer.positions.bind()
+        program.enableAttributeArray('position')
+        program.setAttributeBuffer('position', GL_FLOAT, 0, 1)
+        buffer.values.bind()
+        program.enableAttributeArray('value')
+        program.setAttributeBuffer('value', GL_FLOAT, 0, 1)
+        gl.glDrawArrays(GL_LINE_STRIP, start, count)
+        program.disableAttributeArray('position')
+        program.disableAttributeArray('value')
+        buffer.values.release()
+        program.release()
+        gl.glDisable(GL_SCISSOR_TEST)
@@ -0,0 +1,407 @@
+import time
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QPainter, QPen, QColor, QFont, QFontDatabase, QPixmap
+from ringbuffer import RingBuffer
+from graphics import drawPolyline, mapToScreen, polygonFromArrays
+from autoscale import AutoScaler
+from decimate import minMaxEnvelope
+from frames import FrameScheduler
+from protocol import CHANNEL_ECG
+from sweep import DISPLAY_MODES, Sweep
+
+RENDERERS = ('software', 'opengl', 'auto')
+
+
+class Trace:
+    """Display buffer, Y range and pen of one channel lane in GraphWidget"""
+    def __init__(self, channel_id, label, sample_rate, window_seconds, color='#0096c8', fixed_window=False):
+        self.channel_id = channel_id
+        self.label = label
+        self.sample_rate = sample_rate
+        self.fixed_window = fixed_window  # Keeps its own length when the graph window changes
+        self.pen = QPen(QColor(color), 2)
+        self.setWindowSeconds(window_seconds)
+    
+    def setWindowSeconds(self, seconds, keep=None):
+        """Resize the buffer to seconds of signal, keeping the newest values of keep"""
+        capacity = max(int(seconds * self.sample_rate), 2)
+        self.data = RingBuffer(capacity)
+        # Y range from running block extremes; 'fixed' mode shows a constant span in mV
+        self.autoscale = AutoScaler(capacity, block=max(int(self.sample_rate) // 10, 1))
+        if keep is not None:
+            self.extend(keep.last(capacity))
+    
+    def extend(self, values):
+        self.data.extend(values)
+        self.autoscale.extend(values)
+    
+    def clear(self):
+        self.data.clear()
+        self.autoscale.reset()
+
+
+class GraphView:
+    """Lanes, axes, pulse and overlay of the ECG graph, shared by every renderer
+
+    Mixed into a QWidget subclass that calls initGraph() from __init__ and
+    paintGraph() with a QPainter on itself; renderers override drawSamples().
+    """
+    def initGraph(self, sample_rate=100, window_seconds=5):
+        self.pulse_value = 0  # Store the current pulse value
+        self.sample_rate = sample_rate
+        self.window_seconds = window_seconds  # Show last 5 s by default
+        # One lane per channel, stacked top to bottom; ECG until setChannels() says otherwise
+        self.traces = [Trace(CHANNEL_ECG, 'ЭКГ', sample_rate, window_seconds)]
+        self.traces_by_id = {CHANNEL_ECG: self.traces[0]}
+        # Margins for axis labels
+        self.margin_left = 50
+        self.margin_bottom = 30
+        self.margin_top = 20
+        self.margin_right = 20
+        self.background = None  # Cached grid/axes pixmap, rebuilt on resize
+        self.label_font = QFont()
+        self.label_font.setPointSize(8)
+        self.pulse_font = QFont()
+        self.pulse_font.setPointSize(14)
+        self.pulse_font.setBold(True)
+        self.metrics = None  # Optional PipelineMetrics that records every paint
+        self.overlay_lines = None  # Statistics text drawn over the graph, None hides the overlay
+        self.overlay_font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        self.overlay_font.setPointSize(8)
+        # 'scroll' moves the whole trace every frame, 'sweep' draws like a bedside monitor
+        self.display_mode = 'scroll'
+        self.sweep = None  # Sweep image and cursors in sweep mode
+        self.sweep_seconds = 0.0  # Time spent drawing into the sweep image since the last paint
+        self.full_repaint = True  # Something besides new samples changed, so a strip is not enough
+        # Repaints are coalesced to the display refresh rate instead of one per sample
+        self.frame_scheduler = FrameScheduler(self)
+        self.setStyleSheet("background-color: white; border: 1px solid #ccc;")
+    
+    @property
+    def data(self):
+        """Display buffer of the first lane"""
+        return self.traces[0].data
+    
+    @property
+    def autoscale(self):
+        """AutoScaler of the first lane"""
+        return self.traces[0].autoscale
+    
+    def setChannels(self, channels):
+        """Show one stacked lane per channels.Channel, in the given order"""
+        if not channels:
+            return
+        self.traces = [Trace(channel.id, channel.label, channel.sample_rate,
+                             channel.display_seconds or self.window_seconds, channel.color,
+                             fixed_window=channel.display_seconds is not None)
+                       for channel in channels]
+        self.traces_by_id = {trace.channel_id: trace for trace in self.traces}
+        self.background = None  # Lane separators changed
+        self.requestRepaint()
+    
+    def onChannelData(self, channel, values):
+        """Channel consumer: add a batch to the channel's lane"""
+        self.addSamples(values, channel.id)
+    
+    def addData(self, value, channel_id=CHANNEL_ECG):
+        """Add a new data point to the graph"""
+        self.addSamples([value], channel_id)
+    
+    def addSamples(self, values, channel_id=CHANNEL_ECG):
+        """Add a batch of data points with a single repaint"""
+        trace = self.traces_by_id.get(channel_id)
+        if trace is None:
+            return
+        trace.extend(values)
+        self.frame_scheduler.requestFrame(len(values))
+    
+    def setPulse(self, bpm):
+        """Show a new pulse value, repainting only when it changed"""
+        if bpm != self.pulse_value:
+            self.pulse_value = bpm
+            self.requestRepaint()
+    
+    def setOverlay(self, lines):
+        """Show lines of statistics over the graph, or hide them with None"""
+        if lines != self.overlay_lines:
+            self.overlay_lines = lines
+            self.requestRepaint()
+    
+    def setWindowSeconds(self, seconds):
+        """Change how many seconds of signal the graph shows"""
+        self.window_seconds = seconds
+        for trace in self.traces:
+            if not trace.fixed_window:
+                trace.setWindowSeconds(seconds, keep=trace.data)
+        self.requestRepaint()
+    
+    def setScaleMode(self, mode, fixed_mv=None):
+        """Autoscale ('auto') or show a constant span of fixed_mv millivolts ('fixed')"""
+        for trace in self.traces:
+            trace.autoscale.setMode(mode, fixed_mv)
+        self.requestRepaint()
+    
+    def setDisplayMode(self, mode):
+        """Scroll the trace ('scroll') or sweep a cursor across a still one ('sweep')"""
+        if mode not in DISPLAY_MODES:
+            raise ValueError(f'unknown display mode: {mode}')
+        self.display_mode = mode
+        self.sweep = Sweep() if mode == 'sweep' else None
+        self.requestRepaint()
+    
+    def requestRepaint(self):
+        """Repaint the whole widget on the next frame, not just the strips new samples touched"""
+        self.full_repaint = True
+        self.frame_scheduler.requestFrame()
+    
+    def updateFrame(self):
+        """FrameScheduler tick: schedule the paint of everything that changed"""
+        if self.sweep is None:
+            self.update()
+            return
+        started = time.perf_counter()
+        region = self.sweep.advance(self)
+        self.sweep_seconds += time.perf_counter() - started
+        if region is None or self.full_repaint:
+            self.full_repaint = False
+            self.update()
+        elif not region.isEmpty():
+            self.update(region)
+    
+    def clearData(self):
+        """Remove all data points from the graph"""
+        for trace in self.traces:
+            trace.clear()
+        self.requestRepaint()
+    
+    def resizeEvent(self, event):
+        """Throw away the cached background so it is rebuilt at the new size"""
+        self.background = None
+        super().resizeEvent(event)
+    
+    def graphRect(self):
+        """Return (left, top, width, height) of the plotting area"""
+        graph_width = self.width() - self.margin_left - self.margin_right
+        graph_height = self.height() - self.margin_top - self.margin_bottom
+        return self.margin_left, self.margin_top, graph_width, graph_height
+    
+    def laneRect(self, index):
+        """Return (top, height) of the lane of traces[index]"""
+        _, top, _, graph_height = self.graphRect()
+        lane_height = graph_height // len(self.traces)
+        return top + index * lane_height, lane_height
+    
+    def backgroundPixmap(self):
+        """The cached background, rebuilt if the size or the lanes changed"""
+        if self.background is None or self.background.size() != self.size():
+            self.background = self.buildBackground()
+        return self.background
+    
+    def buildBackground(self):
+        """Render the background, grid and static labels into a pixmap"""
+        width = self.width()
+        height = self.height()
+        left, top, graph_width, graph_height = self.graphRect()
+        
+        pixmap = QPixmap(max(width, 1), max(height, 1))
+        pixmap.fill(QColor(255, 255, 255))
+        painter = QPainter(pixmap)
+        
+        # Draw grid
+        painter.setPen(QPen(QColor(220, 220, 220), 1))
+        # Horizontal grid lines (5 lines)
+        for i in range(6):
+            y = top + (graph_height * i // 5)
+            painter.drawLine(left, y, left + graph_width, y)
+        # Vertical grid lines (10 lines)
+        for i in range(11):
+            x = left + (graph_width * i // 10)
+            painter.drawLine(x, top, x, top + graph_height)
+        
+        # Separate stacked lanes and name their channels
+        if len(self.traces) > 1:
+            painter.setFont(self.label_font)
+            for index, trace in enumerate(self.traces):
+                lane_top, _ = self.laneRect(index)
+                if index:
+                    painter.setPen(QPen(QColor(150, 150, 150), 1))
+                    painter.drawLine(left, lane_top, left + graph_width, lane_top)
+                painter.setPen(trace.pen.color())
+                painter.drawText(left + 5, lane_top + 12, trace.label)
+        
+        # Draw X-axis label
+        painter.setPen(QPen(QColor(0, 0, 0), 1))
+        painter.setFont(self.label_font)
+        painter.drawText(left + graph_width // 2 - 30, height - 5, "Время")
+        painter.end()
+        return pixmap
+    
+    def takeGraph(self, other):
+        """Show the lanes, pulse, overlay and metrics of another graph, e.g. when switching renderers"""
+        self.sample_rate = other.sample_rate
+        self.window_seconds = other.window_seconds
+        self.traces = other.traces
+        self.traces_by_id = other.traces_by_id
+        self.pulse_value = other.pulse_value
+        self.overlay_lines = other.overlay_lines
+        self.metrics = other.metrics
+        self.setDisplayMode(other.display_mode)
+        self.background = None
+        self.requestRepaint()
+    
+    def paintGraph(self, painter):
+        """Draw background, labels, every lane, pulse and overlay with painter"""
+        paint_started = time.perf_counter()
+        
+        # Grid and axes only change on resize, so they come from a cached pixmap
+        painter.drawPixmap(0, 0, self.backgroundPixmap())
+        if self.sweep is not None:
+            # The sweep image is opaque, so it goes below the labels and the pulse
+            self.paintSweep(painter)
+        
+        width = self.width()
+        left, top, graph_width, graph_height = self.graphRect()
+        
+        # Draw axis labels
+        painter.setPen(QPen(QColor(0, 0, 0), 1))
+        painter.setFont(self.label_font)
+        if any(len(trace.data) > 1 for trace in self.traces):
+            # Draw Y-axis label
+            painter.drawText(10, 15, "Амплитуда")
+        
+        # Draw pulse value in top-right corner
+        if self.pulse_value > 0:
+            painter.setFont(self.pulse_font)
+            
+            # Determine if pulse is normal (60-100 BPM is considered normal)
+            is_normal = 60 <= self.pulse_value <= 100
+            
+            # Set color: black for normal, red for abnormal
+            if is_normal:
+                painter.setPen(QPen(QColor(0, 0, 0)))  # Black color for normal pulse
+            else:
+                painter.setPen(QPen(QColor(200, 0, 0)))  # Red color for abnormal pulse
+            
+            # Display pulse in Russian
+            pulse_text = f"Пульс: {self.pulse_value} уд/мин"
+            # Position in top-right corner with some padding
+            text_width = painter.fontMetrics().width(pulse_text)
+            painter.drawText(width - text_width - 10, 30, pulse_text)
+        
+        # All lanes are drawn in this one pass, each as a single polyline
+        if self.sweep is None:
+            painter.setFont(self.label_font)
+            for index, trace in enumerate(self.traces):
+                if len(trace.data) > 1:
+                    lane_top, lane_height = self.laneRect(index)
+                    self.drawTrace(painter, trace, left, lane_top, graph_width, lane_height)
+        
+        if self.overlay_lines:
+            self.drawOverlay(painter, left, top)
+        
+        # Sweep mode draws the samples between paints; that is part of the frame too
+        paint_seconds = time.perf_counter() - paint_started + self.sweep_seconds
+        self.sweep_seconds = 0.0
+        self.frame_scheduler.framePainted(paint_seconds)
+        if self.metrics is not None:
+            self.metrics.frame.record(paint_seconds)
+    
+    def paintSweep(self, painter):
+        """Copy the sweep image into the plot and label every lane with its range"""
+        left, top, _, _ = self.graphRect()
+        if self.sweep.image is None or self.sweep.background is not self.background:
+            # Shown or resized before the first frame of this size
+            self.sweep.advance(self)
+        if self.sweep.image is None:
+            return
+        # Qt clips this to the strips passed to update(), so partial frames copy only those
+        painter.drawImage(left, top, self.sweep.image)
+        painter.setPen(QPen(QColor(0, 0, 0), 1))
+        painter.setFont(self.label_font)
+        for index, trace in enumerate(self.traces):
+            lane_range = self.sweep.laneRange(index)
+            if lane_range is not None:
+                lane_top, lane_height = self.laneRect(index)
+                self.drawRangeLabels(painter, trace, lane_top, lane_height, *lane_range)
+    
+    def drawOverlay(self, painter, left, top):
+        """Draw the statistics text on a translucent box in the top-left corner of the plot"""
+        painter.setFont(self.overlay_font)
+        metrics = painter.fontMetrics()
+        line_height = metrics.height()
+        width = max(metrics.width(line) for line in self.overlay_lines) + 10
+        height = line_height * len(self.overlay_lines) + 6
+        painter.fillRect(left + 5, top + 5, width, height, QColor(255, 255, 255, 210))
+        painter.setPen(QPen(QColor(60, 60, 60), 1))
+        for index, line in enumerate(self.overlay_lines):
+            painter.drawText(left + 10, top + 8 + metrics.ascent() + index * line_height, line)
+    
+    def drawTrace(self, painter, trace, left, top, width, height):
+        """Draw Y labels and the samples of one lane"""
+        min_val, max_val = trace.autoscale.update()
+        if not trace.autoscale.settled():
+            # Keep easing towards the new range on the following frames
+            self.frame_scheduler.requestFrame()
+        
+        self.drawRangeLabels(painter, trace, top, height, min_val, max_val)
+        self.drawSamples(painter, trace, left, top, width, height, min_val, max_val)
+    
+    def drawRangeLabels(self, painter, trace, top, height, min_val, max_val):
+        """Draw min, middle, and max values of a lane left of the plot"""
+        if trace.autoscale.mode == 'fixed':
+            scale, unit = 1.0 / trace.autoscale.counts_per_mv, " мВ"
+        else:
+            scale, unit = 1.0, ""
+        painter.setPen(QPen(QColor(0, 0, 0), 1))
+        painter.drawText(5, top + height, f"{min_val * scale:.1f}{unit}")
+        painter.drawText(5, top + height // 2, f"{(min_val + max_val) / 2 * scale:.1f}{unit}")
+        painter.drawText(5, top + 15, f"{max_val * scale:.1f}{unit}")
+    
+    def drawSamples(self, painter, trace, left, top, width, height, min_val, max_val):
+        """Draw the decimated trace of one lane with QPainter"""
+        # Reduce to a min/max pair per pixel column so long windows cost the same as short ones
+        # and narrow QRS spikes survive
+        values = trace.data.view()
+        first_index = trace.data.total_written - len(values)
+        positions, samples = minMaxEnvelope(values, width, first_index)
+        xs, ys = mapToScreen(samples, left, top, width, height, min_val, max_val,
+                             positions=positions, count=len(values))
+        # One polygon for the whole trace instead of a drawLine per segment
+        painter.setPen(trace.pen)
+        # While the range eases after a spike the trace may briefly overshoot the lane
+        painter.setClipRect(left, top, width, height)
+        # The envelope is already one column per pixel; antialiasing its
+        # near-vertical strokes costs an order of magnitude more for no visible gain
+        painter.setRenderHint(QPainter.Antialiasing, len(samples) == len(values))
+        drawPolyline(painter, polygonFromArrays(xs, ys))
+        painter.setClipping(False)
+
+
+class GraphWidget(GraphView, QWidget):
+    """Software renderer: QPainter on the CPU, with min/max decimation per pixel column"""
+    renderer = 'software'
+    
+    def __init__(self, parent=None, sample_rate=100, window_seconds=5):
+        super().__init__(parent)
+        self.initGraph(sample_rate, window_seconds)
+    
+    def paintEvent(self, event):
+        """Draw the graph"""
+        painter = QPainter(self)
+        self.paintGraph(painter)
+        painter.end()
+
+
+def createGraphWidget(renderer='software', parent=None, sample_rate=100, window_seconds=5):
+    """GraphWidget, or GLGraphWidget for 'opengl' when OpenGL works here ('auto' prefers it)
+
+    Without a usable OpenGL context (e.g. the offscreen platform) the
+    software renderer is returned, whatever was asked for.
+    """
+    if renderer in ('opengl', 'auto'):
+        from glgraph import GLGraphWidget, openglAvailable
+        if openglAvailable():
+            return GLGraphWidget(parent, sample_rate=sample_rate, window_seconds=window_seconds)
+    elif renderer != 'software':
+        raise ValueError(f'unknown renderer: {renderer}')
+    return GraphWidget(parent, sample_rate=sample_rate, window_seconds=window_seconds)
@@ -0,0 +1,52 @@
+import numpy as np
+from PyQt5.QtGui import QPolygonF
+
+
+def polygonFromArrays(xs, ys):
+    """Build a QPolygonF from coordinate arrays without a per-point Python loop"""
+    count = len(xs)
+    polygon = QPolygonF(count)
+    if count == 0:
+        return polygon
+    # QPolygonF stores QPointF (two doubles) contiguously, so fill it through numpy
+    pointer = polygon.data()
+    pointer.setsize(count * 2 * np.dtype(np.float64).itemsize)
+    points = np.frombuffer(pointer, dtype=np.float64).reshape(count, 2)
+    points[:, 0] = xs
+    points[:, 1] = ys
+    return polygon
+
+
+def mapToScreen(values, left, top, width, height, min_val, max_val, positions=None, count=None):
+    """Map samples to (x, y) screen coordinates in one vectorized pass
+
+    positions/count place decimated samples at their original index within a
+    window of count samples; by default samples are evenly spaced.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if positions is None:
+        positions = np.arange(len(values), dtype=np.float64)
+        count = len(values)
+    range_val = max_val - min_val if max_val != min_val else 1
+    # X coordinate: spread data points across the width
+    xs = left + positions * (width / max(count - 1, 1))
+    # Y coordinate: map value to height (invert because Y=0 is top)
+    ys = top + height - (values - min_val) * (height / range_val)
+    # Ensure coordinates are within bounds
+    np.clip(ys, top, top + height, out=ys)
+    return xs, ys
+
+
+def drawPolyline(painter, polygon, run_length=64):
+    """Draw a polyline in short overlapping runs
+
+    Qt's stroker gets slower than linear for long antialiased wide-pen
+    polylines, so runs of a few dozen points are much cheaper than one call.
+    """
+    count = polygon.size()
+    if count <= run_length + 1:
+        painter.drawPolyline(polygon)
+        return
+    for start in range(0, count - 1, run_length):
+        # Consecutive runs share their end point so the trace has no gaps
+        painter.drawPolyline(polygon.mid(start, run_length + 1))
@@ -0,0 +1,87 @@
+import numpy as np
+from scipy import signal
+from scipy.integrate import trapezoid
+from qrs import QRSDetector
+
+# Frequency bands of short-term HRV in Hz (Task Force of ESC/NASPE, 1996)
+LF_BAND = (0.04, 0.15)
+HF_BAND = (0.15, 0.4)
+BREATH_BAND = (0.1, 0.7)  # 6-42 breaths per minute
+RR_RANGE = (0.3, 2.0)  # Seconds; anything outside is a missed or false beat
+RESAMPLE_HZ = 4.0  # Rate the RR tachogram and the respiration signal are resampled to
+
+
+def cleanRR(rr):
+    """RR intervals in seconds without physiologically impossible values"""
+    rr = np.asarray(rr, dtype=np.float64)
+    return rr[(rr >= RR_RANGE[0]) & (rr <= RR_RANGE[1])]
+
+
+def timeDomain(rr):
+    """Mean heart rate, SDNN and RMSSD of RR intervals in seconds"""
+    rr = cleanRR(rr)
+    if len(rr) < 3:
+        return {}
+    return {
+        'mean_hr': float(60.0 / rr.mean()),
+        'sdnn_ms': float(1000 * rr.std(ddof=1)),
+        'rmssd_ms': float(1000 * np.sqrt(np.mean(np.diff(rr) ** 2))),
+    }
+
+
+def bandPower(frequencies, power, band):
+    """Integrated power of a spectrum within band"""
+    mask = (frequencies >= band[0]) & (frequencies < band[1])
+    if mask.sum() < 2:
+        return 0.0
+    return float(trapezoid(power[mask], frequencies[mask]))
+
+
+def frequencyDomain(rr):
+    """LF and HF power (ms^2) and LF/HF of RR intervals
+
+    The tachogram is resampled evenly at RESAMPLE_HZ before Welch. Series
+    shorter than two cycles of the slowest LF frequency (50 s) return nothing.
+    """
+    rr = cleanRR(rr)
+    times = np.cumsum(rr)
+    if len(rr) < 10 or times[-1] - times[0] < 2 / LF_BAND[0]:
+        return {}
+    grid = np.arange(times[0], times[-1], 1 / RESAMPLE_HZ)
+    tachogram = np.interp(grid, times, rr * 1000)
+    frequencies, power = signal.welch(tachogram - tachogram.mean(), fs=RESAMPLE_HZ,
+                                      nperseg=min(len(grid), 256), detrend='linear')
+    lf = bandPower(frequencies, power, LF_BAND)
+    hf = bandPower(frequencies, power, HF_BAND)
+    return {'lf_ms2': lf, 'hf_ms2': hf, 'lf_hf': lf / hf if hf > 0 else None}
+
+
+def breathRate(samples, sample_rate):
+    """Breaths per minute from the respiratory modulation of the ECG, or None
+
+    Breathing shifts the ECG baseline and R amplitude; averaging blocks of
+    1 / RESAMPLE_HZ seconds keeps that modulation, and the spectral peak in
+    BREATH_BAND is the breathing rate.
+    """
+    block = int(sample_rate / RESAMPLE_HZ)
+    count = len(samples) // block
+    if block < 1 or count < 32:
+        return None
+    respiration = np.asarray(samples[-count * block:], dtype=np.float64).reshape(count, block).mean(axis=1)
+    frequencies, power = signal.welch(respiration, fs=RESAMPLE_HZ, nperseg=min(count, 256), detrend='linear')
+    mask = (frequencies >= BREATH_BAND[0]) & (frequencies <= BREATH_BAND[1])
+    if not mask.any() or power[mask].max() <= 0:
+        return None
+    return float(60.0 * frequencies[mask][np.argmax(power[mask])])
+
+
+def analyzeSamples(samples, sample_rate):
+    """HRV and breathing rate of a window of raw ECG samples"""
+    detector = QRSDetector(sample_rate)
+    beats = detector.process(samples)
+    rr = [beat.rr for beat in beats if beat.rr is not None]
+    metrics = {'beats': len(beats)}
+    metrics.update(timeDomain(rr))
+    metrics.update(frequencyDomain(rr))
+    metrics['breath_rate'] = breathRate(samples, sample_rate)
+    return metrics
@@ -0,0 +1,29 @@
+import os
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap
+
+_pixmaps = {}  # (path, width, height) -> scaled QPixmap, or None if the file cannot be read
+
+
+def loadPixmap(path, width=None, height=None):
+    """Decoded pixmap of path scaled to width or height, or None if it cannot be read
+
+    Decoding and smooth scaling happen once per process; windows opened
+    again share the cached pixmap.
+    """
+    key = (path, width, height)
+    if key not in _pixmaps:
+        pixmap = QPixmap(path) if os.path.exists(path) else QPixmap()
+        if pixmap.isNull():
+            pixmap = None
+        elif width is not None:
+            pixmap = pixmap.scaledToWidth(width, Qt.SmoothTransformation)
+        elif height is not None:
+            pixmap = pixmap.scaledToHeight(height, Qt.SmoothTransformation)
+        _pixmaps[key] = pixmap
+    return _pixmaps[key]
+
+
+def clearImageCache():
+    """Forget every cached pixmap, e.g. after the image files changed"""
+    _pixmaps.clear()
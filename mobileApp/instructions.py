@@ -1,10 +1,8 @@
 import sys
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QPushButton, QHBoxLayout
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
 import os
-# Import the USB connection window directly
-from usb import USBConnectionWindow
+from images import loadPixmap
 
 class InstructionsWindow(QMainWindow):
     def __init__(self, signal_type, main_window=None):
@@ -88,10 +86,9 @@ class InstructionsWindow(QMainWindow):
         # Try to load the ECG image
         image_path = 'imgs/EKG.PNG'
         if os.path.exists(image_path):
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull():
-                # Scale the image to fit nicely
-                pixmap = pixmap.scaledToWidth(400, Qt.SmoothTransformation)
+            # Decoded and scaled once; reopening the instructions reuses it
+            pixmap = loadPixmap(image_path, width=400)
+            if pixmap is not None:
                 image_label.setPixmap(pixmap)
             else:
                 # Fallback text if image cannot be loaded
@@ -0,0 +1,192 @@
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Upper bucket bounds in seconds: 10 us doubling up to about 10 s
+LATENCY_BOUNDS = tuple(1e-5 * 2 ** i for i in range(21))
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, cheap enough for the reader's hot path
+
+    record() is a bisect and a few additions; percentiles are the upper
+    bound of the bucket they fall in. Written by one thread, read by another
+    without a lock, so a snapshot may be off by the sample in flight.
+    """
+    def __init__(self, bounds=LATENCY_BOUNDS):
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)  # The last bucket takes everything above bounds[-1]
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper bound in seconds of the bucket holding the q-th percentile, 0 if empty"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self, name):
+        """Flat {name_ms_mean, _p50, _p95, _p99, _max} in milliseconds"""
+        return {
+            f'{name}_ms_mean': 1000 * self.total / max(self.count, 1),
+            f'{name}_ms_p50': 1000 * self.percentile(50),
+            f'{name}_ms_p95': 1000 * self.percentile(95),
+            f'{name}_ms_p99': 1000 * self.percentile(99),
+            f'{name}_ms_max': 1000 * self.max,
+        }
+
+
+class PipelineMetrics:
+    """Latency of every stage of one device's pipeline, from serial read to paint
+
+    parse: parsing one bulk read (reader thread)
+    deliver: recording, beat detection and display filters of one batch (reader thread)
+    queue: from the bytes being read to the GUI taking the batch
+    dispatch: channel consumers of one batch in the GUI thread
+    frame: one paintEvent of the graph
+    Owners hold None instead of a PipelineMetrics while nobody looks.
+    """
+    STAGES = ('parse', 'deliver', 'queue', 'dispatch', 'frame')
+
+    def __init__(self):
+        for stage in self.STAGES:
+            setattr(self, stage, Histogram())
+        self.parsed_lines = 0  # ASCII lines behind the parse histogram
+        self.parse_seconds = 0.0  # Spent parsing those lines; binary frames only go to the histogram
+        self.max_queue_depth = 0  # Most batches in flight to the GUI at once
+
+    def recordParse(self, seconds, lines=0):
+        self.parse.record(seconds)
+        if lines:
+            self.parsed_lines += lines
+            self.parse_seconds += seconds
+
+    def recordQueueDepth(self, depth):
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def reset(self):
+        for stage in self.STAGES:
+            getattr(self, stage).reset()
+        self.parsed_lines = 0
+        self.parse_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def stats(self):
+        """Flat metrics in the naming of readerStats()"""
+        stats = {}
+        for stage in self.STAGES:
+            stats.update(getattr(self, stage).summary(stage))
+        if self.parsed_lines:
+            stats['parse_us_per_line_mean'] = 1e6 * self.parse_seconds / self.parsed_lines
+        stats['queue_depth_max'] = self.max_queue_depth
+        return stats
+
+
+class Instrumentation:
+    """What to measure and where to report it; everything is off by default"""
+    def __init__(self, overlay=False, log_path=None, log_interval=5.0, profile_dir=None):
+        self.overlay = overlay  # Show the statistics overlay on every graph from the start
+        self.log_path = log_path  # JSON lines file for MetricsLog, None for no log
+        self.log_interval = log_interval  # Seconds between log lines
+        # cProfile output of every reader thread and folded stacks of the whole app go here
+        self.profile_dir = profile_dir
+
+    @property
+    def enabled(self):
+        """True when pipeline metrics have to be collected from the start"""
+        return self.overlay or self.log_path is not None
+
+
+class MetricsLog:
+    """Append one JSON line of pipeline statistics per write()
+
+    snapshot is called on the GUI thread and returns a JSON-serialisable
+    dict; a wall-clock time stamp is added to every line.
+    """
+    def __init__(self, path, snapshot):
+        self.path = path
+        self.snapshot = snapshot
+        self.errors = 0
+
+    def write(self):
+        entry = {'time': time.time()}
+        entry.update(self.snapshot())
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry, default=str) + '\n')
+        except OSError as e:
+            self.errors += 1
+            print(f"Error writing metrics log: {e}")
+
+
+class StackSampler:
+    """Sample the Python stacks of every thread into flame graph "folded" lines
+
+    Each line is "thread;outer (file:line);...;inner (file:line) count", the
+    raw format of py-spy record, so flamegraph.pl, inferno and speedscope
+    read it. Sampling runs in its own thread and costs nothing until
+    start(); profile reader threads with cProfile through
+    SerialReader.profile_path instead when call counts are needed.
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self.run, name='stack sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f'thread {ident}'))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, path):
+        """Save the folded stacks, most frequent first"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,101 @@
+import numpy as np
+from protocol import CHANNEL_ECG, TAG_BPM, TAG_BREATH, TAG_ERROR, TAG_HUMIDITY
+
+# Whole-line records of the firmware's ASCII output
+EXACT_LINES = {
+    b'breath': (TAG_BREATH, 1),
+    b'noBreath': (TAG_BREATH, 0),
+}
+ERROR_PREFIX = 'Ошибка'.encode('utf-8')
+
+
+class LineParser:
+    """Bytes-level parser for the firmware's ASCII lines
+
+    parse() takes the complete lines of one bulk read, without decoding them,
+    and returns ({channel: float64 array}, [(tag, value), ...]) - the same
+    records FrameDecoder yields for binary frames. A chunk of plain samples,
+    by far the common case, is converted with a single map(float, lines).
+    """
+    def __init__(self):
+        # Prefix -> handler(line, samples, records); checked in order after the numeric path
+        self.prefixes = [
+            (b'bpm', self.parseBpm),
+            (b'hum', self.parseHumidity),
+            (ERROR_PREFIX, self.parseError),
+        ]
+        self.lines = 0
+        self.samples = 0
+        self.bad_lines = 0
+
+    def parse(self, lines):
+        """Parse complete lines (bytes, with or without '\\r') into samples and records"""
+        try:
+            # float() accepts bytes and ignores the surrounding whitespace
+            values = list(map(float, lines))
+        except ValueError:
+            return self.parseMixed(lines)
+        self.lines += len(values)
+        self.samples += len(values)
+        return {CHANNEL_ECG: np.array(values)}, []
+
+    def parseMixed(self, lines):
+        """Slow path for chunks with records, channel lines, blanks or garbage"""
+        ecg = []
+        samples = {}
+        records = []
+        for raw in lines:
+            try:
+                ecg.append(float(raw))
+                self.lines += 1
+                continue
+            except ValueError:
+                pass
+            line = raw.strip()
+            if not line:
+                continue
+            self.lines += 1
+            record = EXACT_LINES.get(line)
+            if record is not None:
+                records.append(record)
+                continue
+            for prefix, handler in self.prefixes:
+                if line.startswith(prefix):
+                    handler(line, samples, records)
+                    break
+            else:
+                self.parseChannelLine(line, samples)
+        result = {CHANNEL_ECG: np.array(ecg, dtype=np.float64)}
+        for channel, values in samples.items():
+            result[channel] = np.array(values, dtype=np.float64)
+        self.samples += sum(len(values) for values in result.values())
+        return result, records
+
+    def parseBpm(self, line, samples, records):
+        try:
+            records.append((TAG_BPM, int(line[3:])))
+        except ValueError:
+            self.bad_lines += 1
+
+    def parseHumidity(self, line, samples, records):
+        """"hum<tenths of %RH>", the same value the binary TAG_HUMIDITY record carries"""
+        try:
+            records.append((TAG_HUMIDITY, int(line[3:])))
+        except ValueError:
+            self.bad_lines += 1
+
+    def parseError(self, line, samples, records):
+        """Sensor error text; the binary protocol reports it as TAG_ERROR"""
+        records.append((TAG_ERROR, 0))
+
+    def parseChannelLine(self, line, samples):
+        """"<channel>:<value>" from sensors other than ECG, anything else is corrupt"""
+        channel, separator, value = line.partition(b':')
+        if separator and channel.isdigit():
+            try:
+                samples.setdefault(int(channel), []).append(float(value))
+                return
+            except ValueError:
+                pass
+        # Corrupted sample line (e.g. split by a glitch on the wire)
+        self.bad_lines += 1
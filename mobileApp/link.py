@@ -0,0 +1,67 @@
+import time
+
+# Serial speeds tried during negotiation, fastest first. CP210x/CH340 bridges on
+# ESP32 boards handle up to 921600 reliably, many CH340s go to 2 Mbaud.
+DEFAULT_BAUD = 9600
+BAUD_CANDIDATES = (2000000, 921600, 460800, 230400, 115200)
+FIRMWARE_CONFIRM_TIMEOUT = 1.0  # Matches BAUD_CONFIRM_MS in esp32/src/main.cpp
+
+
+def waitForLine(serial_connection, prefix, timeout):
+    """Read until a line starting with prefix arrives; return the bytes after it or None"""
+    deadline = time.monotonic() + timeout
+    data = b''
+    while time.monotonic() < deadline:
+        data += serial_connection.read(max(serial_connection.in_waiting, 1))
+        start = data.find(prefix)
+        if start >= 0:
+            end = data.find(b'\n', start)
+            if end >= 0:
+                return data[end + 1:]
+    return None
+
+
+def negotiateBaudrate(serial_connection, candidates=BAUD_CANDIDATES, reply_timeout=0.5):
+    """Agree with the firmware on the fastest baud rate both sides can use
+
+    The port must be open at the firmware's default rate. Returns the rate the
+    link ends up on; firmware without the handshake leaves it unchanged.
+    """
+    initial = serial_connection.baudrate
+    for baud in candidates:
+        if baud <= initial:
+            break
+        serial_connection.reset_input_buffer()
+        serial_connection.write(b'baud %d\n' % baud)
+        if waitForLine(serial_connection, b'ok baud %d' % baud, reply_timeout) is None:
+            # No answer at all - the firmware does not know the command
+            return initial
+        serial_connection.baudrate = baud
+        serial_connection.reset_input_buffer()
+        serial_connection.write(b'ping\n')
+        if waitForLine(serial_connection, b'pong', reply_timeout) is not None:
+            return baud
+        # The rate does not work on this cable/bridge. The firmware reverts on
+        # its own once it misses the ping, so wait for that before the next try.
+        serial_connection.baudrate = initial
+        time.sleep(FIRMWARE_CONFIRM_TIMEOUT)
+    return initial
+
+
+class RateMeter:
+    """Turn monotonically increasing counters into per-second rates"""
+    def __init__(self):
+        self._last_time = None
+        self._last_values = {}
+
+    def update(self, **counters):
+        """Return {name: rate per second} since the previous call"""
+        now = time.monotonic()
+        rates = {}
+        if self._last_time is not None:
+            elapsed = max(now - self._last_time, 1e-9)
+            for name, value in counters.items():
+                rates[name] = (value - self._last_values.get(name, value)) / elapsed
+        self._last_time = now
+        self._last_values = counters
+        return rates
@@ -1,16 +1,26 @@
+from startup import StartupProfile
+# Started before any other import so the cold start report covers them all
+startup_profile = StartupProfile() if __name__ == '__main__' else None
+import argparse
 import sys
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QGridLayout
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
-import os
+from PyQt5.QtCore import Qt, pyqtSignal
 # Import the instructions window
 from instructions import InstructionsWindow
-# Import the USB connection window directly
-from usb import USBConnectionWindow
+from images import loadPixmap
+from instrumentation import Instrumentation
+# usb (pyserial, scipy and the reader stack) is imported when Continue is clicked
 
 class SignalRegistrationApp(QMainWindow):
-    def __init__(self):
+    firstPainted = pyqtSignal()  # Emitted once, when the window has been drawn for the first time
+    
+    def __init__(self, data_source=None, instrumentation=None, renderer='software', display_mode='scroll'):
         super().__init__()
+        self.data_source = data_source  # e.g. a BluetoothSource; None means detect a USB device
+        self.instrumentation = instrumentation  # Pipeline metrics and profiling for the USB window
+        self.renderer = renderer  # Graph renderer of the USB window, see graph.RENDERERS
+        self.display_mode = display_mode  # 'scroll' or 'sweep' graphs in the USB window
+        self.painted = False
         self.selected_signals = set()  # Use a set to track selected signals
         self.buttons = {}  # Store button references
         self.info_buttons = {}  # Store info button references
@@ -37,30 +47,13 @@ class SignalRegistrationApp(QMainWindow):
         logo_label = QLabel()
         logo_label.setAlignment(Qt.AlignCenter)
         
-        # Try to load the SVG logo
-        svg_path = 'imgs/neurotech.svg'
-        # Also check for PNG version as fallback
-        png_path = 'imgs/neurotech.png'
-        
-        pixmap = None
-        if os.path.exists(svg_path):
-            # Try to load SVG directly (may work depending on Qt installation)
-            pixmap = QPixmap(svg_path)
-            if pixmap.isNull():
-                # If SVG loading failed, use text as fallback
-                logo_label.setText("NeuroTech")
-                logo_label.setStyleSheet("font-size: 28px; font-weight: bold; color: #2E86AB; padding: 10px;")
-        elif os.path.exists(png_path):
-            # Try to load PNG version
-            pixmap = QPixmap(png_path)
-            
-        # If we have a valid pixmap, set it to the label
-        if pixmap and not pixmap.isNull():
-            # Scale the logo to fit nicely
-            pixmap = pixmap.scaledToHeight(80, Qt.SmoothTransformation)
+        # Try the SVG logo (depends on the Qt installation), then a PNG version;
+        # both are decoded and scaled once per process
+        pixmap = loadPixmap('imgs/neurotech.svg', height=80) or loadPixmap('imgs/neurotech.png', height=80)
+        if pixmap is not None:
             logo_label.setPixmap(pixmap)
-        elif not pixmap:
-            # Fallback text if no image file found
+        else:
+            # Fallback text if no image could be loaded
             logo_label.setText("NeuroTech")
             logo_label.setStyleSheet("font-size: 28px; font-weight: bold; color: #2E86AB; padding: 10px;")
         
@@ -204,7 +197,11 @@ class SignalRegistrationApp(QMainWindow):
         """Handle continue button click - open USB connection directly"""
         if self.selected_signals:
             # Open the USB connection window directly (skip connection selection)
-            self.usb_window = USBConnectionWindow(main_window=self, selected_signals=self.selected_signals)
+            from usb import USBConnectionWindow
+            self.usb_window = USBConnectionWindow(main_window=self, selected_signals=self.selected_signals,
+                                                  data_source=self.data_source,
+                                                  instrumentation=self.instrumentation, renderer=self.renderer,
+                                                  display_mode=self.display_mode)
             self.usb_window.show()
             # Hide the main window
             self.hide()
@@ -212,12 +209,60 @@ class SignalRegistrationApp(QMainWindow):
     def showEvent(self, event):
         """Override showEvent to ensure proper cleanup when window is shown again"""
         super().showEvent(event)
+    
+    def paintEvent(self, event):
+        """Announce the first paint, which ends the cold start"""
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            self.firstPainted.emit()
 
 def main():
-    app = QApplication(sys.argv)
-    window = SignalRegistrationApp()
+    parser = argparse.ArgumentParser(description='Регистрация сигналов')
+    parser.add_argument('--bluetooth', metavar='ADDRESS', help='connect over Bluetooth SPP instead of USB')
+    parser.add_argument('--bluetooth-channel', type=int, default=1, help='RFCOMM channel (default 1)')
+    parser.add_argument('--renderer', choices=('software', 'opengl', 'auto'), default='software',
+                        help='graph renderer; opengl falls back to software without OpenGL (F4 switches)')
+    parser.add_argument('--sweep', action='store_true',
+                        help='draw graphs like a bedside monitor, a cursor sweeping over a still trace (F5 switches)')
+    parser.add_argument('--startup-report', nargs='?', const='-', metavar='PATH',
+                        help='after the first paint print start-up and import timings, or save them as JSON to PATH')
+    parser.add_argument('--startup-budget', type=float, metavar='MS',
+                        help='warn when the first paint takes longer than MS milliseconds')
+    parser.add_argument('--quit-after-startup', action='store_true', help='exit after the first paint (benchmarks)')
+    parser.add_argument('--metrics-overlay', action='store_true', help='show pipeline statistics on the graph (F3)')
+    parser.add_argument('--metrics-log', metavar='PATH', help='append pipeline statistics to PATH as JSON lines')
+    parser.add_argument('--metrics-interval', type=float, default=5.0, metavar='S',
+                        help='seconds between --metrics-log lines (default 5)')
+    parser.add_argument('--profile-dir', metavar='DIR',
+                        help='save cProfile stats of every reader thread and folded stacks of the app to DIR')
+    args, qt_args = parser.parse_known_args()
+    if startup_profile is not None:
+        startup_profile.mark('main')
+    data_source = None
+    if args.bluetooth:
+        from sources import BluetoothSource
+        data_source = BluetoothSource(args.bluetooth, args.bluetooth_channel)
+    app = QApplication(sys.argv[:1] + qt_args)
+    instrumentation = Instrumentation(args.metrics_overlay, args.metrics_log, args.metrics_interval, args.profile_dir)
+    window = SignalRegistrationApp(data_source, instrumentation, args.renderer, 'sweep' if args.sweep else 'scroll')
+    if startup_profile is not None:
+        startup_profile.mark('window')
+        window.firstPainted.connect(lambda: reportStartup(startup_profile, args))
     window.show()
     sys.exit(app.exec_())
 
+def reportStartup(profile, args):
+    """Report the cold start and hold it against the budget"""
+    profile.firstPaint()
+    if args.startup_report:
+        profile.write(args.startup_report)
+    first_paint_ms = 1000 * profile.marks[-1][1]
+    if args.startup_budget is not None and first_paint_ms > args.startup_budget:
+        print(f"Start-up took {first_paint_ms:.0f} ms, over the budget of {args.startup_budget:.0f} ms",
+              file=sys.stderr)
+    if args.quit_after_startup:
+        QApplication.instance().quit()
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
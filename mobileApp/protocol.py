@@ -0,0 +1,152 @@
+import binascii
+import re
+import struct
+import numpy as np
+
+# Binary framing used by the firmware after the host sends "mode bin":
+#   A5 5A | seq u16 | n_samples u8 | n_records u8 | int16 x n_samples |
+#   (tag u8, value int16) x n_records | CRC-16/CCITT-FALSE u16
+# All integers are little-endian; the CRC covers everything from seq to the records.
+# Frames of other sensors use a second sync word and carry a channel byte:
+#   A5 5C | seq u16 | channel u8 | n_samples u8 | n_records u8 | ... as above
+# Plain A5 5A frames are ECG (channel 0), so older firmware keeps working.
+SYNC = b'\xa5\x5a'
+SYNC_CHANNEL = b'\xa5\x5c'
+FRAME_START = re.compile(rb'\xa5[\x5a\x5c]')
+HEADER = struct.Struct('<HBB')
+CHANNEL_HEADER = struct.Struct('<HBBB')
+CRC = struct.Struct('<H')
+SAMPLE_DTYPE = np.dtype('<i2')
+RECORD_DTYPE = np.dtype([('tag', 'u1'), ('value', '<i2')])
+HEADER_SIZE = len(SYNC) + HEADER.size
+CHANNEL_HEADER_SIZE = len(SYNC_CHANNEL) + CHANNEL_HEADER.size
+
+MODE_BINARY_COMMAND = b'mode bin\n'
+MODE_ASCII_COMMAND = b'mode ascii\n'
+MODE_BINARY_ACK = b'ok mode bin'  # Followed by the firmware's line ending
+
+TAG_BPM = 1
+TAG_BREATH = 2
+TAG_ERROR = 3
+TAG_HUMIDITY = 4  # Relative humidity of the breath sensor in tenths of a percent, once per second
+
+# Channel numbers on the wire
+CHANNEL_ECG = 0
+CHANNEL_BREATH = 1
+CHANNEL_EMG = 2
+CHANNEL_PPG = 3
+CHANNEL_HUMIDITY = 4  # Fed from TAG_HUMIDITY records, values in %RH
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE as computed by the firmware"""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encodeFrame(seq, samples=(), records=(), channel=CHANNEL_ECG):
+    """Build one frame; used by tests and replay sources"""
+    samples = np.asarray(samples, dtype=SAMPLE_DTYPE)
+    records = np.array(list(records), dtype=RECORD_DTYPE)
+    if channel == CHANNEL_ECG:
+        sync, header = SYNC, HEADER.pack(seq & 0xFFFF, len(samples), len(records))
+    else:
+        sync, header = SYNC_CHANNEL, CHANNEL_HEADER.pack(seq & 0xFFFF, channel, len(samples), len(records))
+    body = header + samples.tobytes() + records.tobytes()
+    return sync + body + CRC.pack(crc16(body))
+
+
+class FrameDecoder:
+    """Incrementally decode binary frames from arbitrary byte chunks"""
+    def __init__(self):
+        self._buffer = bytearray()
+        self._expected_seq = None
+        self._last_frame_samples = 0
+        # Counters for link quality
+        self.frames = 0
+        self.crc_errors = 0
+        self.lost_frames = 0
+        self.lost_samples = 0  # Estimated from sequence gaps
+        self.skipped_bytes = 0
+
+    def feed(self, data):
+        """Consume bytes and return (samples, records) from every complete frame
+
+        samples is one int16 array of the ECG channel for all frames in the
+        chunk, records a list of (tag, value) tuples in arrival order.
+        """
+        channels, records = self.feedChannels(data)
+        samples = channels.get(CHANNEL_ECG)
+        return (samples if samples is not None else np.empty(0, dtype=SAMPLE_DTYPE)), records
+
+    def feedChannels(self, data):
+        """Like feed(), but return samples as a {channel: int16 array} dict"""
+        buffer = self._buffer
+        buffer += data
+        views = {}
+        records = []
+        position = 0
+        length = len(buffer)
+        while True:
+            match = FRAME_START.search(buffer, position)
+            if match is None:
+                # Keep a trailing first sync byte, it may be completed by the next chunk
+                keep = length - 1 if length and buffer[-1] == SYNC[0] else length
+                self.skipped_bytes += keep - position
+                position = keep
+                break
+            start = match.start()
+            self.skipped_bytes += start - position
+            position = start
+            if buffer[start + 1] == SYNC[1]:
+                if length - start < HEADER_SIZE:
+                    break
+                channel = CHANNEL_ECG
+                seq, n_samples, n_records = HEADER.unpack_from(buffer, start + len(SYNC))
+                samples_start = start + HEADER_SIZE
+            else:
+                if length - start < CHANNEL_HEADER_SIZE:
+                    break
+                seq, channel, n_samples, n_records = CHANNEL_HEADER.unpack_from(buffer, start + len(SYNC))
+                samples_start = start + CHANNEL_HEADER_SIZE
+            body_end = samples_start + n_samples * SAMPLE_DTYPE.itemsize + n_records * RECORD_DTYPE.itemsize
+            if length < body_end + CRC.size:
+                break
+            (crc,) = CRC.unpack_from(buffer, body_end)
+            with memoryview(buffer) as view:
+                valid = crc16(view[start + len(SYNC):body_end]) == crc
+            if not valid:
+                # Either corruption or a false sync inside sample data - resync one byte later
+                self.crc_errors += 1
+                position = start + 1
+                continue
+
+            self.checkSequence(seq, n_samples)
+            # Zero-copy views into the receive buffer; copied once below
+            views.setdefault(channel, []).append(
+                np.frombuffer(buffer, dtype=SAMPLE_DTYPE, count=n_samples, offset=samples_start))
+            if n_records:
+                records.extend(np.frombuffer(buffer, dtype=RECORD_DTYPE, count=n_records,
+                                             offset=body_end - n_records * RECORD_DTYPE.itemsize).tolist())
+            self.frames += 1
+            position = body_end + CRC.size
+
+        channels = {channel: parts[0].copy() if len(parts) == 1 else np.concatenate(parts)
+                    for channel, parts in views.items()}
+        # Views must be released before the bytearray can shrink
+        del views
+        del buffer[:position]
+        return channels, records
+
+    def checkSequence(self, seq, n_samples):
+        """Count frames missing between the previous and this sequence number"""
+        if self._expected_seq is not None and seq != self._expected_seq:
+            gap = (seq - self._expected_seq) & 0xFFFF
+            self.lost_frames += gap
+            self.lost_samples += gap * (self._last_frame_samples or n_samples)
+        self._expected_seq = (seq + 1) & 0xFFFF
+        if n_samples:
+            self._last_frame_samples = n_samples
+
+    def pending(self):
+        """Bytes buffered while waiting for the rest of a frame"""
+        return len(self._buffer)
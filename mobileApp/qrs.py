@@ -0,0 +1,147 @@
+from collections import deque
+import numpy as np
+from scipy import signal
+
+
+class Beat:
+    """One detected R peak"""
+    def __init__(self, sample_index, sample_rate, rr, heart_rate):
+        self.sample_index = int(sample_index)  # Absolute sample number of the R peak
+        self.time = sample_index / sample_rate  # Seconds since the detector started
+        self.rr = rr  # Seconds since the previous beat, None for the first one
+        self.heart_rate = heart_rate  # Rolling beats per minute, None until two beats are seen
+
+    def __repr__(self):
+        return f"Beat(t={self.time:.2f}s, rr={self.rr}, hr={self.heart_rate})"
+
+
+class QRSDetector:
+    """Streaming Pan-Tompkins QRS detector
+
+    Filtering is vectorized per batch with persistent filter state; only the
+    few local maxima of the integrated signal go through the Python decision
+    logic, and every piece of state is bounded.
+    """
+    def __init__(self, sample_rate=100, hr_beats=8):
+        self.sample_rate = sample_rate
+        fs = float(sample_rate)
+        # Band-pass 5-15 Hz keeps the QRS energy and rejects baseline and T waves
+        self._bandpass = signal.butter(2, [5.0, min(15.0, 0.45 * fs)], btype='bandpass', fs=fs, output='sos')
+        self._bandpass_zi = None
+        # Five-point derivative, causal form
+        self._derivative = np.array([2.0, 1.0, 0.0, -1.0, -2.0]) * fs / 8.0
+        self._derivative_zi = np.zeros(len(self._derivative) - 1)
+        # 150 ms moving-window integration
+        window = max(int(round(0.15 * fs)), 1)
+        self._integrator = np.ones(window) / window
+        self._integrator_zi = np.zeros(window - 1)
+        # Approximate delay from raw R peak to integrated peak, removed from timestamps
+        self._delay = 2 + window // 2 + int(round(0.02 * fs))
+
+        self._refractory = int(0.2 * fs)  # No second QRS within 200 ms
+        self._learning = int(2 * fs)  # Thresholds start after 2 s of signal
+        self._learning_values = []
+        self._spki = 0.0  # Running signal peak estimate
+        self._npki = 0.0  # Running noise peak estimate
+        self._threshold = None
+        self._previous = np.zeros(2)  # Last two integrated values, to find peaks across batches
+        self._processed = 0  # Samples seen so far
+        self._last_beat = None  # Sample index of the last detected peak (integrated signal)
+        self._pending = None  # (index, value) of a QRS waiting out the refractory period
+        self._candidates = deque(maxlen=64)  # Sub-threshold peaks since the last beat, for searchback
+        self._rr = deque(maxlen=hr_beats)
+        self.heart_rate = None
+
+    def process(self, samples):
+        """Feed a batch of raw samples and return the Beats found in it"""
+        samples = np.asarray(samples, dtype=np.float64)
+        if len(samples) == 0:
+            return []
+        if self._bandpass_zi is None:
+            # Start the filter settled on the first value instead of ringing from zero
+            self._bandpass_zi = signal.sosfilt_zi(self._bandpass) * samples[0]
+        filtered, self._bandpass_zi = signal.sosfilt(self._bandpass, samples, zi=self._bandpass_zi)
+        slope, self._derivative_zi = signal.lfilter(self._derivative, 1.0, filtered, zi=self._derivative_zi)
+        integrated, self._integrator_zi = signal.lfilter(self._integrator, 1.0, slope * slope,
+                                                         zi=self._integrator_zi)
+
+        start = self._processed
+        self._processed += len(samples)
+        if self._threshold is None:
+            self._learning_values.append(integrated)
+            seen = sum(len(values) for values in self._learning_values)
+            if seen < self._learning:
+                self._previous = np.concatenate([self._previous, integrated])[-2:]
+                return []
+            learned = np.concatenate(self._learning_values)
+            self._learning_values = []
+            self._spki = 0.25 * learned.max()
+            self._npki = 0.5 * learned.mean()
+            self.updateThreshold()
+
+        # Local maxima, including the one that straddles the previous batch
+        extended = np.concatenate([self._previous, integrated])
+        self._previous = extended[-2:]
+        middle = extended[1:-1]
+        peaks = np.flatnonzero((middle > extended[:-2]) & (middle >= extended[2:]))
+        beats = []
+        for peak in peaks:
+            index = start - 1 + peak  # Absolute index of middle[peak]
+            beat = self.classifyPeak(index, middle[peak])
+            if beat is not None:
+                beats.append(beat)
+        # A QRS is final once no larger peak can follow inside the refractory period
+        if self._pending is not None and self._processed - 1 - self._pending[0] >= self._refractory:
+            beats.append(self.acceptBeat(self._pending[0]))
+        return beats
+
+    def classifyPeak(self, index, value):
+        """Pan-Tompkins decision for one integrated peak"""
+        beat = None
+        if self._pending is not None:
+            if index - self._pending[0] < self._refractory:
+                # The integrated QRS can have several humps - keep the largest
+                if value > self._pending[1]:
+                    self._pending = (index, value)
+                return None
+            beat = self.acceptBeat(self._pending[0])
+        elif self._last_beat is not None and index - self._last_beat < self._refractory:
+            return None
+        if value > self._threshold:
+            self._spki = 0.125 * value + 0.875 * self._spki
+            self.updateThreshold()
+            self._pending = (index, value)
+            return beat
+
+        self._npki = 0.125 * value + 0.875 * self._npki
+        self.updateThreshold()
+        self._candidates.append((index, value))
+        # Searchback: a beat seems missed if the gap exceeds 166% of the average RR
+        if self._rr and self._last_beat is not None:
+            average = sum(self._rr) / len(self._rr) * self.sample_rate
+            if index - self._last_beat > 1.66 * average:
+                best = max(self._candidates, key=lambda candidate: candidate[1])
+                if best[1] > 0.5 * self._threshold:
+                    self._spki = 0.25 * best[1] + 0.75 * self._spki
+                    self.updateThreshold()
+                    return self.acceptBeat(best[0])
+        return beat
+
+    def acceptBeat(self, index):
+        """Record a beat and update the RR statistics"""
+        rr = None
+        if self._last_beat is not None:
+            rr = float(index - self._last_beat) / self.sample_rate
+            self._rr.append(rr)
+            self.heart_rate = 60.0 * len(self._rr) / sum(self._rr)
+        self._last_beat = index
+        self._pending = None
+        self._candidates.clear()
+        return Beat(max(index - self._delay, 0), self.sample_rate, rr, self.heart_rate)
+
+    def updateThreshold(self):
+        self._threshold = self._npki + 0.25 * (self._spki - self._npki)
+
+    def reset(self):
+        """Forget everything, e.g. after a reconnect"""
+        self.__init__(self.sample_rate, self._rr.maxlen)
@@ -0,0 +1,355 @@
+import cProfile
+import threading
+import time
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+from link import negotiateBaudrate
+from protocol import (CHANNEL_ECG, CHANNEL_HUMIDITY, FrameDecoder, MODE_BINARY_ACK, MODE_BINARY_COMMAND,
+                      TAG_BPM, TAG_BREATH, TAG_HUMIDITY)
+from lineparser import LineParser
+from recording import BLOCK_BPM, BLOCK_BREATH, BLOCK_HUMIDITY
+from sources import SerialSource
+
+
+class SampleBatch:
+    """A batch of samples of one channel parsed from one bulk read"""
+    def __init__(self, samples, read_time, channel=CHANNEL_ECG):
+        self.samples = samples
+        self.read_time = read_time  # time.monotonic() when the bytes were read
+        self.channel = channel  # Channel number, see protocol.CHANNEL_*
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class SerialReader(QThread):
+    """Own the serial port and parse incoming lines off the GUI thread"""
+    samplesReady = pyqtSignal(object)  # SampleBatch
+    pulseReceived = pyqtSignal(int)
+    breathReceived = pyqtSignal(int)  # 1 breathing, 0 not
+    beatsDetected = pyqtSignal(list)  # qrs.Beat objects from the host-side detector
+    connectionFailed = pyqtSignal(str)
+    reconnecting = pyqtSignal(str)  # Link lost or not up yet; the source is being reopened
+
+    def __init__(self, port=None, baudrate=9600, parent=None, protocol='ascii', baud_candidates=(), source=None):
+        super().__init__(parent)
+        # Any DataSource works (replay, pty, ...); a port name means a real serial port
+        self.source = source if source is not None else SerialSource(port, baudrate)
+        self.port = port if port is not None else self.source.name
+        self.setObjectName(f'reader {self.port}')  # Thread name seen by py-spy, top -H and gdb
+        self.baudrate = baudrate  # Rate the firmware starts on; updated after negotiation
+        self.baud_candidates = baud_candidates  # Faster rates to try, fastest first
+        # 'binary' asks the firmware for framed output and falls back to ASCII
+        # if it does not acknowledge within binary_ack_timeout
+        self.protocol = protocol
+        self.binary_ack_timeout = 1.0
+        self.binary_active = False
+        self.decoder = FrameDecoder()
+        self.parser = LineParser()
+        self.recorder = None  # Optional SessionWriter fed straight from this thread
+        # Hold raw ECG while recorder is None because the session is about to hand over a new one
+        self.await_recorder = False
+        self._unrecorded = []  # (samples, read_time) held for the awaited recorder
+        self._unrecorded_samples = 0
+        self.analysis_buffer = None  # Optional SharedRing of raw ECG for the analysis workers
+        self.qrs_detector = None  # Optional QRSDetector run on every batch in this thread
+        self.channels = None  # Optional ChannelRegistry; channel decoders run on batches in this thread
+        self.metrics = None  # Optional PipelineMetrics timing parse, delivery and queueing
+        self.profile_path = None  # Run the thread under cProfile and save its stats here
+        self.read_timeout = 0.1  # Short timeout so stop() is honoured quickly
+        self.reconnect_delay = 0.5  # First wait before reopening a source that allows reconnects
+        self.max_reconnect_delay = 10.0
+        self.max_pending_batches = 50  # Batches the GUI may fall behind by before samples are held back
+        self.max_backlog_samples = 3000  # Held-back samples per channel; the oldest are dropped beyond this
+        self.late_threshold = 0.25  # Seconds between read and delivery before a sample counts as late
+        self.serial_connection = None
+        self._stop_requested = False
+        self._stop_event = threading.Event()  # Wakes the reconnect back-off on stop()
+        self._lock = threading.Lock()
+        self._pending_batches = 0
+        self._backlog = {}  # channel -> SampleBatch held back while the GUI is behind
+        # Counters for diagnosing throughput under load
+        self.bytes_read = 0
+        self.samples_read = 0
+        self.dropped_samples = 0
+        self.late_samples = 0
+        self.reconnects = 0
+        self.delivered_batches = 0
+        self.delivery_seconds = 0.0  # Sum of read-to-consumer delays of delivered batches
+        self.max_delivery_seconds = 0.0
+        self.errors = 0  # Failed opens and lost connections
+        self.last_error = ''
+
+    def run(self):
+        """Thread entry: readLoop, under cProfile if profile_path is set"""
+        threading.current_thread().name = self.objectName()
+        if self.profile_path is None:
+            self.readLoop()
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(self.readLoop)
+        finally:
+            profiler.dump_stats(self.profile_path)
+
+    def readLoop(self):
+        """Read from the source until stop() is called, reopening it if it allows reconnects"""
+        delay = self.reconnect_delay
+        while not self._stop_requested:
+            try:
+                self.serial_connection = self.source.open(self.read_timeout)
+            except Exception as e:
+                self.noteError(e)
+                if not self.source.reconnect:
+                    self.connectionFailed.emit(str(e))
+                    return
+                self.reconnecting.emit(str(e))
+                # Back off exponentially so an absent device is not hammered
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+            bytes_before = self.bytes_read
+            try:
+                self.readConnection()
+            except Exception as e:
+                if self._stop_requested:
+                    break
+                self.noteError(e)
+                if not self.source.reconnect:
+                    self.connectionFailed.emit(str(e))
+                    return
+                self.reconnects += 1
+                self.reconnecting.emit(str(e))
+                # Only a connection that delivered data resets the back-off; a peer that
+                # accepts and hangs up at once must not be redialled in a tight loop
+                if self.bytes_read > bytes_before:
+                    delay = self.reconnect_delay
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+            finally:
+                if self.serial_connection and self.serial_connection.is_open:
+                    self.serial_connection.close()
+
+    def noteError(self, error):
+        """Count an error the thread recovers from or reports through a signal"""
+        self.errors += 1
+        self.last_error = f'{type(error).__name__}: {error}'
+
+    def readConnection(self):
+        """Negotiate and parse one open connection until stop() or an error"""
+        # Every connection starts in ASCII with a fresh frame decoder
+        self.binary_active = False
+        self.decoder = FrameDecoder()
+        remainder = b''
+        awaiting_ack_until = None
+        if self.baud_candidates and self.source.negotiable:
+            self.baudrate = negotiateBaudrate(self.serial_connection, self.baud_candidates)
+        if self.protocol == 'binary' and self.source.supports_binary:
+            self.serial_connection.write(MODE_BINARY_COMMAND)
+            awaiting_ack_until = time.monotonic() + self.binary_ack_timeout
+        while not self._stop_requested:
+            # Block until at least one byte arrives, then take everything already buffered
+            chunk = self.serial_connection.read(1)
+            if not chunk:
+                continue
+            waiting = self.serial_connection.in_waiting
+            if waiting:
+                chunk += self.serial_connection.read(waiting)
+            read_time = time.monotonic()
+            self.bytes_read += len(chunk)
+
+            if self.binary_active:
+                self.handleFrames(chunk, read_time)
+                continue
+
+            data = remainder + chunk
+            if awaiting_ack_until is not None:
+                ack = data.find(MODE_BINARY_ACK)
+                ack_end = data.find(b'\n', ack) if ack >= 0 else -1
+                if ack_end >= 0:
+                    # Text before the acknowledgement is still ASCII, everything after is framed
+                    self.binary_active = True
+                    awaiting_ack_until = None
+                    remainder = b''
+                    self.handleLines(data[:ack].split(b'\n'), read_time)
+                    self.handleFrames(data[ack_end + 1:], read_time)
+                    continue
+                if read_time > awaiting_ack_until:
+                    # Old firmware without framing support - stay on ASCII
+                    awaiting_ack_until = None
+
+            lines = data.split(b'\n')
+            # The last element is an incomplete line (or empty) - keep it for the next read
+            remainder = lines.pop()
+            self.handleLines(lines, read_time)
+
+    @property
+    def lines_read(self):
+        return self.parser.lines
+
+    @property
+    def bad_lines(self):
+        return self.parser.bad_lines
+
+    def handleLines(self, lines, read_time):
+        """Parse complete ASCII lines and deliver their samples"""
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        parsed = self.parseLines(lines, read_time)
+        if metrics is not None:
+            metrics.recordParse(time.perf_counter() - started, len(lines))
+        for channel, samples in parsed.items():
+            if len(samples):
+                self.deliverSamples(SampleBatch(samples, read_time, channel))
+
+    def handleFrames(self, data, read_time):
+        """Decode binary frames and deliver their samples and records"""
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        lost_before = self.decoder.lost_samples
+        channels, records = self.decoder.feedChannels(data)
+        if metrics is not None:
+            metrics.recordParse(time.perf_counter() - started)
+        self.dropped_samples += self.decoder.lost_samples - lost_before
+        self.handleRecords(records, read_time)
+        for channel, samples in channels.items():
+            if len(samples):
+                self.samples_read += len(samples)
+                self.deliverSamples(SampleBatch(samples, read_time, channel))
+
+    def handleRecords(self, records, read_time):
+        """Act on (tag, value) records from either protocol"""
+        for tag, value in records:
+            if tag == TAG_BPM:
+                self.emitPulse(value, read_time)
+            elif tag == TAG_BREATH:
+                self.emitBreath(1 if value else 0, read_time)
+            elif tag == TAG_HUMIDITY:
+                self.emitHumidity(value, read_time)
+
+    def emitPulse(self, bpm, read_time=None):
+        """Record and forward a pulse value"""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.writeEvent(BLOCK_BPM, bpm, read_time)
+        self.pulseReceived.emit(bpm)
+
+    def emitBreath(self, status, read_time=None):
+        """Record and forward a breath status (1 breathing, 0 not)"""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.writeEvent(BLOCK_BREATH, status, read_time)
+        self.breathReceived.emit(status)
+
+    def emitHumidity(self, tenths, read_time=None):
+        """Record a humidity reading and deliver it as a sample of the humidity channel"""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.writeEvent(BLOCK_HUMIDITY, tenths, read_time)
+        self.samples_read += 1
+        self.deliverSamples(SampleBatch(np.array([tenths / 10.0]), read_time, CHANNEL_HUMIDITY))
+
+    def parseLines(self, lines, read_time=None):
+        """Parse raw lines, emit BPM/breath events and return {channel: samples array}
+
+        Bare numbers are ECG samples; other channels send "<channel>:<value>".
+        """
+        bad_before = self.parser.bad_lines
+        samples, records = self.parser.parse(lines)
+        # Lines that fail to parse are almost always samples corrupted on the wire
+        self.dropped_samples += self.parser.bad_lines - bad_before
+        self.samples_read += sum(len(values) for values in samples.values())
+        self.handleRecords(records, read_time)
+        return samples
+
+    def deliverSamples(self, batch):
+        """Hand a batch to the GUI, holding it back while the GUI is too far behind"""
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        if batch.channel == CHANNEL_ECG:
+            # Recording happens here so a slow GUI never loses recorded samples; the session
+            # may swap the recorder from the GUI thread, so it is read once
+            recorder = self.recorder
+            if recorder is not None:
+                if self._unrecorded:
+                    self.flushUnrecorded(recorder)
+                recorder.writeSamples(batch.samples, batch.read_time)
+            elif self.await_recorder:
+                self.holdUnrecorded(batch.samples, batch.read_time)
+            if self.analysis_buffer is not None:
+                self.analysis_buffer.extend(batch.samples)
+            if self.qrs_detector is not None:
+                beats = self.qrs_detector.process(batch.samples)
+                if beats:
+                    self.beatsDetected.emit(beats)
+        # Recording and beat detection see raw values; only the display is conditioned
+        channel = self.channels.get(batch.channel) if self.channels is not None else None
+        if channel is not None and channel.decoder is not None:
+            batch.samples = channel.decoder.process(batch.samples)
+        backlog = self._backlog.pop(batch.channel, None)
+        if backlog is not None:
+            batch = self.mergeBacklog(backlog, batch)
+        with self._lock:
+            if self._pending_batches >= self.max_pending_batches:
+                # Merged into one batch once the GUI catches up
+                self._backlog[batch.channel] = batch
+                return
+            self._pending_batches += 1
+            depth = self._pending_batches
+        if metrics is not None:
+            metrics.deliver.record(time.perf_counter() - started)
+            metrics.recordQueueDepth(depth)
+        self.samplesReady.emit(batch)
+
+    def holdUnrecorded(self, samples, read_time):
+        """Keep samples for the awaited recorder, at most max_backlog_samples of them"""
+        self._unrecorded.append((samples, read_time))
+        self._unrecorded_samples += len(samples)
+        while self._unrecorded_samples > self.max_backlog_samples and len(self._unrecorded) > 1:
+            self._unrecorded_samples -= len(self._unrecorded.pop(0)[0])
+
+    def flushUnrecorded(self, recorder):
+        """Write the held samples to the recorder that has arrived, before anything newer"""
+        for samples, read_time in self._unrecorded:
+            recorder.writeSamples(samples, read_time)
+        self._unrecorded = []
+        self._unrecorded_samples = 0
+
+    def mergeBacklog(self, backlog, batch):
+        """Append batch to a held-back one, keeping at most max_backlog_samples"""
+        samples = np.concatenate((backlog.samples, batch.samples))
+        excess = len(samples) - self.max_backlog_samples
+        if excess > 0:
+            # The newest samples matter most to the display
+            self.dropped_samples += excess
+            samples = samples[excess:]
+        # The oldest read time keeps late_samples honest about the delay
+        return SampleBatch(samples, backlog.read_time, batch.channel)
+
+    def batchDelivered(self, batch):
+        """Called from the GUI thread once a batch has been consumed"""
+        with self._lock:
+            self._pending_batches -= 1
+        delay = time.monotonic() - batch.read_time
+        self.delivered_batches += 1
+        self.delivery_seconds += delay
+        self.max_delivery_seconds = max(self.max_delivery_seconds, delay)
+        if self.metrics is not None:
+            self.metrics.queue.record(delay)
+        if delay > self.late_threshold:
+            self.late_samples += len(batch)
+
+    def pendingBatches(self):
+        """Number of batches emitted but not yet consumed by the GUI"""
+        with self._lock:
+            return self._pending_batches
+
+    def stop(self):
+        """Ask the reader loop to finish and wait for the port to close"""
+        self._stop_requested = True
+        self._stop_event.set()
+        self.wait()
+        recorder = self.recorder
+        if recorder is not None and self._unrecorded:
+            # The thread is gone, so the held samples can be written from here
+            self.flushUnrecorded(recorder)
@@ -0,0 +1,226 @@
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import numpy as np
+
+# Session file layout (little-endian):
+#   header:  magic 'CARDIOGR', version u16, flags u16, sample_rate u32, start time f64 (unix seconds)
+#   blocks:  kind u8, pad x3, count u32, first sample u64, time f64 (seconds since start),
+#            followed by count int16 values
+# Sample blocks hold up to BLOCK_SAMPLES values; BPM, breath and humidity blocks
+# hold one value each and record the sample number they arrived at.
+MAGIC = b'CARDIOGR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sHHId')
+BLOCK_HEADER = struct.Struct('<B3xIQd')
+SAMPLE_DTYPE = np.dtype('<i2')
+EVENT_VALUE = struct.Struct('<h')
+BLOCK_SAMPLES = 1024
+
+BLOCK_SAMPLES_KIND = 1
+BLOCK_BPM = 2
+BLOCK_BREATH = 3
+BLOCK_HUMIDITY = 4  # Tenths of a percent relative humidity
+
+
+class SessionWriter:
+    """Append samples and events to a session file from a background thread
+
+    write* calls only enqueue, so the caller never blocks on disk.
+    """
+    def __init__(self, path, sample_rate, flush_interval=1.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval  # Longest time samples wait before hitting the file
+        self.samples_written = 0
+        self.bytes_written = 0
+        self.closed = False  # Writes after close() are dropped instead of piling up in the queue
+        self._queue = queue.SimpleQueue()
+        self._start = time.monotonic()
+        self._samples_queued = 0  # Sample number of the next enqueued sample
+        self._file = open(path, 'xb')  # Never overwrite an existing recording
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, sample_rate, time.time()))
+        self._thread = threading.Thread(target=self.run, name='SessionWriter', daemon=True)
+        self._thread.start()
+
+    def writeSamples(self, samples, timestamp=None):
+        """Queue a batch of samples; timestamp is time.monotonic() of their arrival"""
+        samples = np.asarray(samples, dtype=SAMPLE_DTYPE)
+        if len(samples) == 0 or self.closed:
+            return
+        self._queue.put((BLOCK_SAMPLES_KIND, samples, self._samples_queued, self.elapsed(timestamp)))
+        self._samples_queued += len(samples)
+
+    def writeEvent(self, kind, value, timestamp=None):
+        """Queue a BPM or breath record at the current sample position"""
+        if self.closed:
+            return
+        self._queue.put((kind, np.array([value], dtype=SAMPLE_DTYPE), self._samples_queued, self.elapsed(timestamp)))
+
+    def elapsed(self, timestamp):
+        """Seconds since the session started"""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        return timestamp - self._start
+
+    def run(self):
+        """Writer thread: gather samples into blocks and flush periodically"""
+        pending = []  # Sample arrays not yet written
+        pending_count = 0
+        first_sample = 0
+        first_time = 0.0
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is not None and item[0] is None:
+                break
+            if item is not None:
+                kind, values, sample_number, elapsed = item
+                if kind == BLOCK_SAMPLES_KIND:
+                    if not pending:
+                        first_sample, first_time = sample_number, elapsed
+                    pending.append(values)
+                    pending_count += len(values)
+                else:
+                    # Keep events after the samples that preceded them
+                    self.writeSampleBlocks(pending, first_sample, first_time)
+                    pending, pending_count = [], 0
+                    self.writeBlock(kind, values, sample_number, elapsed)
+            now = time.monotonic()
+            if pending_count >= BLOCK_SAMPLES or (pending and now - last_flush >= self.flush_interval):
+                self.writeSampleBlocks(pending, first_sample, first_time)
+                pending, pending_count = [], 0
+            if now - last_flush >= self.flush_interval:
+                self._file.flush()
+                last_flush = now
+        self.writeSampleBlocks(pending, first_sample, first_time)
+        self._file.close()
+
+    def writeSampleBlocks(self, arrays, first_sample, first_time):
+        """Write gathered samples as blocks of at most BLOCK_SAMPLES"""
+        if not arrays:
+            return
+        samples = np.concatenate(arrays) if len(arrays) > 1 else arrays[0]
+        seconds_per_sample = 1.0 / self.sample_rate
+        for start in range(0, len(samples), BLOCK_SAMPLES):
+            block = samples[start:start + BLOCK_SAMPLES]
+            self.writeBlock(BLOCK_SAMPLES_KIND, block, first_sample + start,
+                            first_time + start * seconds_per_sample)
+
+    def writeBlock(self, kind, values, first_sample, elapsed):
+        """Write one block header and its payload"""
+        header = BLOCK_HEADER.pack(kind, len(values), first_sample, elapsed)
+        self._file.write(header)
+        self._file.write(values.tobytes())
+        self.bytes_written += len(header) + values.nbytes
+        if kind == BLOCK_SAMPLES_KIND:
+            self.samples_written += len(values)
+
+    def close(self):
+        """Flush everything queued and close the file"""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put((None, None, None, None))
+        self._thread.join()
+
+
+class SessionReader:
+    """Random access to a session file through a memory map"""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < FILE_HEADER.size:
+            raise ValueError(f'{path} is not a session file')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, _, self.sample_rate, self.start_time = FILE_HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a session file')
+        self.buildIndex()
+
+    def buildIndex(self):
+        """Walk the block headers once; payloads are never read here"""
+        offsets, first_samples, counts, times = [], [], [], []
+        self.events = []  # (kind, sample number, seconds since start, value)
+        position = FILE_HEADER.size
+        size = len(self._map)
+        while position + BLOCK_HEADER.size <= size:
+            kind, count, first_sample, elapsed = BLOCK_HEADER.unpack_from(self._map, position)
+            payload = position + BLOCK_HEADER.size
+            end = payload + count * SAMPLE_DTYPE.itemsize
+            if end > size:
+                break  # Block cut short by a crash - ignore it
+            if kind == BLOCK_SAMPLES_KIND:
+                offsets.append(payload)
+                first_samples.append(first_sample)
+                counts.append(count)
+                times.append(elapsed)
+            else:
+                (value,) = EVENT_VALUE.unpack_from(self._map, payload)
+                self.events.append((kind, first_sample, elapsed, value))
+            position = end
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._first_samples = np.array(first_samples, dtype=np.int64)
+        self._counts = np.array(counts, dtype=np.int64)
+        self.block_times = np.array(times, dtype=np.float64)
+
+    def __len__(self):
+        """Total number of recorded samples"""
+        if len(self._counts) == 0:
+            return 0
+        return int(self._first_samples[-1] + self._counts[-1])
+
+    @property
+    def duration(self):
+        """Recording length in seconds at the nominal sample rate"""
+        return len(self) / self.sample_rate
+
+    def samples(self, start=0, stop=None):
+        """Return samples [start, stop); a view into the map when inside one block
+
+        Views keep the map alive - copy them if they must outlive close().
+        """
+        total = len(self)
+        stop = total if stop is None else min(stop, total)
+        start = max(start, 0)
+        if start >= stop:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        first = np.searchsorted(self._first_samples, start, side='right') - 1
+        last = np.searchsorted(self._first_samples, stop - 1, side='right') - 1
+        parts = []
+        for block in range(first, last + 1):
+            block_start = self._first_samples[block]
+            lo = max(start - block_start, 0)
+            hi = min(stop - block_start, self._counts[block])
+            parts.append(np.frombuffer(self._map, dtype=SAMPLE_DTYPE, count=int(hi - lo),
+                                       offset=int(self._offsets[block] + lo * SAMPLE_DTYPE.itemsize)))
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def sampleAtTime(self, seconds):
+        """Sample number recorded closest to the given time since start"""
+        if len(self._first_samples) == 0:
+            return 0
+        block = max(np.searchsorted(self.block_times, seconds, side='right') - 1, 0)
+        offset = int((seconds - self.block_times[block]) * self.sample_rate)
+        return int(self._first_samples[block] + min(max(offset, 0), self._counts[block] - 1))
+
+    def close(self):
+        try:
+            self._map.close()
+        except BufferError:
+            # Sample views are still in use; the map is released when they go away
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
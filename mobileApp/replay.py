@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+from protocol import MODE_BINARY_COMMAND, MODE_ASCII_COMMAND, TAG_BPM, TAG_BREATH, TAG_HUMIDITY, encodeFrame
+from recording import BLOCK_BPM, BLOCK_BREATH, BLOCK_HUMIDITY, SessionReader
+from sources import DataSource, SerialSource
+
+FRAME_SAMPLES = 10  # Same batch size as the firmware's binary frames
+REPORT_SECONDS = 15  # The firmware reports bpm and breath once per 15 s window
+
+
+class SyntheticECG:
+    """ECG-like signal with bpm/breath/humidity records at the firmware's cadence"""
+    def __init__(self, sample_rate=100, heart_rate=72, breathing=True, noise=8.0, seed=None, breath_rate=15):
+        self.sample_rate = sample_rate
+        self.heart_rate = heart_rate
+        self.breathing = breathing
+        self.breath_rate = breath_rate  # Breaths per minute seen by the humidity sensor
+        self.noise = noise
+        self._random = np.random.default_rng(seed)
+        self._position = 0
+
+    def beat(self, phase):
+        """ADC counts of one heartbeat at phase in [0, 1)"""
+        def wave(center, width, height):
+            return height * np.exp(-((phase - center) / width) ** 2)
+        return (1800
+                + wave(0.15, 0.03, 60)     # P
+                - wave(0.27, 0.008, 80)    # Q
+                + wave(0.30, 0.012, 1300)  # R
+                - wave(0.33, 0.01, 200)    # S
+                + wave(0.55, 0.05, 180))   # T
+
+    def read(self, count):
+        """Return (samples, events) for the next count samples
+
+        events are (offset, tag, value) where offset is the number of the
+        returned samples that precede the record.
+        """
+        index = self._position + np.arange(count)
+        phase = (index / self.sample_rate * self.heart_rate / 60.0) % 1.0
+        samples = self.beat(phase)
+        if self.noise:
+            samples += self._random.normal(0, self.noise, count)
+        window = REPORT_SECONDS * self.sample_rate
+        events = []
+        # Records follow the last sample of every 15 s window, breath first like the firmware
+        for end in range((self._position // window + 1) * window, self._position + count + 1, window):
+            offset = end - self._position
+            events.append((offset, TAG_BREATH, 1 if self.breathing else 0))
+            events.append((offset, TAG_BPM, int(self.heart_rate)))
+        # Humidity once per second, in tenths of a percent; exhaled air raises it
+        for end in range((self._position // self.sample_rate + 1) * self.sample_rate,
+                         self._position + count + 1, self.sample_rate):
+            humidity = 60.0
+            if self.breathing:
+                humidity += 3.0 * np.sin(2 * np.pi * self.breath_rate / 60 * end / self.sample_rate)
+            events.append((end - self._position, TAG_HUMIDITY, int(round(humidity * 10))))
+        events.sort(key=lambda event: event[0])
+        self._position += count
+        return samples.astype(np.int16), events
+
+
+class SessionPlayback:
+    """Samples and events of a recorded session, in recording order"""
+    def __init__(self, path, loop=False):
+        self.session = SessionReader(path)
+        self.sample_rate = self.session.sample_rate
+        self.loop = loop
+        kinds = {BLOCK_BPM: TAG_BPM, BLOCK_BREATH: TAG_BREATH, BLOCK_HUMIDITY: TAG_HUMIDITY}
+        self._events = [(sample, kinds[kind], value) for kind, sample, _, value in self.session.events
+                        if kind in kinds]
+        self._position = 0
+
+    def read(self, count):
+        """Return (samples, events) like SyntheticECG.read; empty samples at the end"""
+        total = len(self.session)
+        if self._position >= total and self.loop and total:
+            self._position = 0
+        start = self._position
+        samples = np.array(self.session.samples(start, start + count))
+        stop = start + len(samples)
+        events = [(sample - start, tag, value) for sample, tag, value in self._events
+                  if start < sample <= stop or (start == 0 and sample == 0)]
+        self._position = stop
+        return samples, events
+
+
+class ReplayStream:
+    """Serial-like stream that paces a generator in real time, N x speed or flat out"""
+    def __init__(self, generator, speed=1.0, timeout=0.1, chunk_samples=1000):
+        self.generator = generator
+        self.sample_rate = generator.sample_rate
+        self.speed = speed  # None or 0 means as fast as the reader can take it
+        self.timeout = timeout
+        self.chunk_samples = chunk_samples  # Samples generated per read when not paced
+        self.baudrate = 0
+        self.is_open = True
+        self.binary = False
+        self.finished = False
+        self._pending = bytearray()
+        self._commands = b''
+        self._emitted = 0
+        self._seq = 0
+        self._start = time.monotonic()
+
+    def due(self):
+        """Samples that should have been sent by now"""
+        if not self.speed:
+            return self.chunk_samples if not self._pending else 0
+        elapsed = time.monotonic() - self._start
+        due = int(elapsed * self.sample_rate * self.speed) - self._emitted
+        if self.binary:
+            due -= due % FRAME_SAMPLES  # The firmware only sends whole frames
+        return due
+
+    def fill(self):
+        """Generate and encode everything that is due"""
+        count = self.due()
+        if count <= 0 or self.finished:
+            return
+        samples, events = self.generator.read(count)
+        if len(samples) == 0:
+            self.finished = True
+            return
+        self._emitted += count
+        self._pending += self.encodeBinary(samples, events) if self.binary else self.encodeAscii(samples, events)
+
+    def encodeAscii(self, samples, events):
+        """Encode like Serial.println in the firmware"""
+        lines = [b'%d\r\n' % value for value in samples.tolist()]
+        # Insert records from the back so earlier offsets stay valid
+        for offset, tag, value in reversed(events):
+            if tag == TAG_BPM:
+                lines.insert(offset, b'bpm%d\r\n' % value)
+            elif tag == TAG_BREATH:
+                lines.insert(offset, b'breath\r\n' if value else b'noBreath\r\n')
+            elif tag == TAG_HUMIDITY:
+                lines.insert(offset, b'hum%d\r\n' % value)
+        return b''.join(lines)
+
+    def encodeBinary(self, samples, events):
+        """Encode as firmware frames, attaching records to the frame they follow"""
+        data = []
+        for start in range(0, len(samples), FRAME_SAMPLES):
+            stop = start + FRAME_SAMPLES
+            records = [(tag, value) for offset, tag, value in events if start < offset <= stop]
+            data.append(encodeFrame(self._seq, samples[start:stop], records))
+            self._seq += 1
+        return b''.join(data)
+
+    @property
+    def in_waiting(self):
+        self.fill()
+        return len(self._pending)
+
+    def read(self, size=1):
+        """Return up to size bytes, waiting at most timeout for the next sample"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            self.fill()
+            if self._pending:
+                data = bytes(self._pending[:size])
+                del self._pending[:size]
+                return data
+            now = time.monotonic()
+            if self.finished or now >= deadline:
+                return b''
+            time.sleep(min(1.0 / (self.sample_rate * (self.speed or 1)), deadline - now))
+
+    def write(self, data):
+        """Understand the firmware's mode commands; other commands get no reply"""
+        self._commands += data
+        while b'\n' in self._commands:
+            command, self._commands = self._commands.split(b'\n', 1)
+            command += b'\n'
+            if command == MODE_BINARY_COMMAND:
+                self._pending += b'ok mode bin\r\n'
+                self.binary = True
+            elif command == MODE_ASCII_COMMAND:
+                self._pending += b'ok mode ascii\r\n'
+                self.binary = False
+        return len(data)
+
+    def reset_input_buffer(self):
+        self._pending.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+class ReplaySource(DataSource):
+    """DataSource that replays a recording or a synthetic ECG"""
+    def __init__(self, generator_factory, speed=1.0):
+        self.generator_factory = generator_factory  # Called on every open() for a fresh stream
+        self.speed = speed
+        self.name = 'replay'
+
+    def open(self, timeout):
+        return ReplayStream(self.generator_factory(), self.speed, timeout)
+
+
+class PtyBridge:
+    """Serve a stream on a pseudo-terminal so it can stand in for a serial port"""
+    def __init__(self, stream):
+        import pty
+        import tty
+        self.stream = stream
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='PtyBridge', daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Pump commands from the pty into the stream and stream output back"""
+        import select
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([self.master], [], [], 0)
+            if readable:
+                self.stream.write(os.read(self.master, 1024))
+            data = self.stream.read(4096)
+            if data:
+                os.write(self.master, data)
+            elif self.stream.finished:
+                self._stop_event.wait(0.1)
+
+    def close(self):
+        self._stop_event.set()
+        self._thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def main():
+    """Run USBConnectionWindow on a replayed stream and print throughput statistics as JSON"""
+    parser = argparse.ArgumentParser(description='Replay recorded or synthetic ECG into the app')
+    parser.add_argument('--session', help='recorded .crdg file (default: synthetic ECG)')
+    parser.add_argument('--speed', type=float, default=1.0, help='playback speed, 0 = as fast as possible')
+    parser.add_argument('--seconds', type=float, default=10.0, help='how long to run (wall clock)')
+    parser.add_argument('--heart-rate', type=float, default=72)
+    parser.add_argument('--ascii', action='store_true', help='stay on the ASCII protocol')
+    parser.add_argument('--pty', action='store_true', help='serve the stream through a pseudo-terminal')
+    parser.add_argument('--renderer', choices=('software', 'opengl', 'auto'), default='software',
+                        help='graph renderer (default software)')
+    parser.add_argument('--sweep', action='store_true', help='sweep the graph like a bedside monitor')
+    args = parser.parse_args()
+
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    from usb import USBConnectionWindow
+
+    if args.session:
+        factory = lambda: SessionPlayback(args.session)
+    else:
+        factory = lambda: SyntheticECG(heart_rate=args.heart_rate, seed=0)
+    source = ReplaySource(factory, args.speed)
+    bridge = None
+    if args.pty:
+        bridge = PtyBridge(source.open(0.01))
+        source = SerialSource(bridge.port)
+
+    app = QApplication(sys.argv)
+    window = USBConnectionWindow(selected_signals={'ЭКГ', 'Дыхание'}, data_source=source, renderer=args.renderer,
+                                 display_mode='sweep' if args.sweep else 'scroll')
+    panel = window.panels[0]
+    panel.session.serial_protocol = 'ascii' if args.ascii else 'binary'
+    panel.session.record_sessions = False
+    window.show()
+    QTimer.singleShot(int(args.seconds * 1000), app.quit)
+    app.exec_()
+
+    results = dict(window.readerStats())
+    results.update(panel.graph_widget.frame_scheduler.stats())
+    results['samples_per_second'] = results.get('samples_read', 0) / args.seconds
+    results['heart_rate'] = panel.heart_rate
+    window.close()
+    if bridge is not None:
+        bridge.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
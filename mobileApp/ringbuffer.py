@@ -0,0 +1,130 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Preallocated numeric ring buffer with O(1) append and zero-copy views"""
+    def __init__(self, capacity, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        # Every value is written twice (at i and i + capacity) so the newest
+        # `capacity` values always form one contiguous slice
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._head = 0  # Index of the next write
+        self._count = 0
+        self.total_written = 0  # Samples appended since creation/clear
+        self._min = None  # Cached extremes, None when they need a rescan
+        self._max = None
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    def append(self, value):
+        """Append one value, overwriting the oldest one when full"""
+        capacity = self.capacity
+        head = self._head
+        if self._count == capacity:
+            evicted = self._data[head]
+            # Only a rescan can find the new extreme if the old one is leaving
+            if evicted == self._min or evicted == self._max:
+                self._min = self._max = None
+        else:
+            self._count += 1
+        self._data[head] = value
+        self._data[head + capacity] = value
+        self._head = (head + 1) % capacity
+        self.total_written += 1
+        if self._min is not None:
+            if value < self._min:
+                self._min = value
+            if value > self._max:
+                self._max = value
+        elif self._count == 1:
+            self._min = self._max = value
+
+    def extend(self, values):
+        """Append a batch of values with at most two slice copies"""
+        values = np.asarray(values, dtype=self._data.dtype)
+        n = len(values)
+        if n == 0:
+            return
+        capacity = self.capacity
+        self.total_written += n
+        if n >= capacity:
+            values = values[-capacity:]
+            self._data[:capacity] = values
+            self._data[capacity:] = values
+            self._head = 0
+            self._count = capacity
+            self._min, self._max = values.min(), values.max()
+            return
+
+        head = self._head
+        evicted = self._count + n - capacity
+        if evicted > 0 and self._min is not None:
+            # The oldest values are overwritten below; only a rescan can replace an extreme among them
+            start = (head + capacity - self._count) % capacity
+            leaving = self._data[start:start + evicted]
+            if leaving.min() <= self._min or leaving.max() >= self._max:
+                self._min = self._max = None
+        first = min(n, capacity - head)
+        self._data[head:head + first] = values[:first]
+        self._data[head + capacity:head + capacity + first] = values[:first]
+        rest = n - first
+        if rest:
+            self._data[:rest] = values[first:]
+            self._data[capacity:capacity + rest] = values[first:]
+        self._head = (head + n) % capacity
+        self._count = min(self._count + n, capacity)
+
+        if self._min is not None:
+            self._min = min(self._min, values.min())
+            self._max = max(self._max, values.max())
+        elif self._count == n:
+            self._min, self._max = values.min(), values.max()
+
+    def view(self):
+        """Read-only view of the buffered values, oldest first, without copying"""
+        start = (self._head - self._count) % self.capacity
+        result = self._data[start:start + self._count]
+        result.flags.writeable = False
+        return result
+
+    def last(self, n):
+        """Read-only view of the newest n values"""
+        if n <= 0:
+            return self.view()[:0]
+        return self.view()[-n:]
+
+    def min(self):
+        """Smallest buffered value"""
+        if self._count == 0:
+            raise ValueError('min() of an empty RingBuffer')
+        if self._min is None:
+            self._rescan()
+        return self._min
+
+    def max(self):
+        """Largest buffered value"""
+        if self._count == 0:
+            raise ValueError('max() of an empty RingBuffer')
+        if self._max is None:
+            self._rescan()
+        return self._max
+
+    def _rescan(self):
+        """Find both extremes again, O(capacity)"""
+        view = self.view()
+        self._min = view.min()
+        self._max = view.max()
+
+    def clear(self):
+        """Forget all values without releasing the preallocated storage"""
+        self._head = 0
+        self._count = 0
+        self.total_written = 0
+        self._min = self._max = None
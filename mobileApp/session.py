@@ -0,0 +1,337 @@
+import os
+import re
+import time
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from discovery import DeviceDiscovery
+from filters import FilterChain
+from link import BAUD_CANDIDATES, DEFAULT_BAUD
+from protocol import CHANNEL_ECG
+from qrs import QRSDetector
+from reader import SerialReader
+from recording import SessionWriter
+
+# Session states, reported through DeviceSession.stateChanged
+IDLE = 'idle'  # start() not called yet; reported ports are only remembered
+SEARCHING = 'searching'  # Waiting for a device to be plugged in
+CONNECTING = 'connecting'  # Reader started, no samples yet
+STREAMING = 'streaming'  # Samples are arriving
+RECONNECTING = 'reconnecting'  # Link lost; the recording stays open for resume_timeout
+FAILED = 'failed'  # Device could not be opened or stayed silent; retried while its port is listed
+CLOSED = 'closed'
+
+
+class DeviceSession(QObject):
+    """Lifecycle of one device connection: discovery, reader thread, recording and resume
+
+    Lives in the GUI thread and owns the SerialReader. Ports come from a
+    DeviceManager through onPortsChanged. A device that is unplugged and
+    comes back within resume_timeout continues the same recording; the
+    window only follows stateChanged and the data signals.
+    """
+    stateChanged = pyqtSignal(str, str)  # (state, detail message)
+    samplesReady = pyqtSignal(object)  # SampleBatch, already acknowledged to the reader
+    pulseReceived = pyqtSignal(int)
+    breathReceived = pyqtSignal(int)
+    beatsDetected = pyqtSignal(list)
+    errorOccurred = pyqtSignal(str)  # Problem of this device for the window to show, see reportError()
+
+    def __init__(self, parent=None, channels=None, data_source=None, sample_rate=100, port=None):
+        super().__init__(parent)
+        self.channels = channels  # ChannelRegistry whose decoders run in the reader thread
+        self.data_source = data_source  # DataSource to use instead of a detected ESP32 (replay, tests)
+        self.sample_rate = sample_rate
+        self.serial_protocol = 'binary'  # Framed output if the firmware supports it, ASCII otherwise
+        self.initial_baudrate = DEFAULT_BAUD  # Rate the firmware boots with
+        self.baud_candidates = BAUD_CANDIDATES  # Faster rates to negotiate, fastest first
+        self.record_sessions = True  # Save every session to recordings_dir
+        self.recordings_dir = 'recordings'
+        self.detect_beats = True  # Run the QRS detector in the reader thread
+        # Display conditioning; None disables a stage, sections above Nyquist are skipped
+        self.filter_settings = {'highpass': 0.5, 'notch': 50.0, 'lowpass': 40.0}
+        # Seconds of silence before a connecting device counts as dead; after power-up the
+        # firmware calibrates for 15 s and sends no samples, only answers mode commands
+        self.connect_timeout = 20.0
+        self.stall_timeout = 3.0  # Seconds without a byte before a streaming link counts as stuck
+        self.resume_timeout = 60.0  # Seconds a lost device may take to rejoin the same recording
+        self.retry_interval = 2.0  # Seconds between reopening a port that is still listed
+        self.state = IDLE
+        self.message = ''
+        self.bound_port = port  # Only this port is used; None takes the first one reported
+        self.port = port
+        self.reader = None
+        self.recorder = None  # SessionWriter shared by every reader of this session
+        self.analysis_buffer = None  # Optional SharedRing the readers copy raw ECG into
+        self.metrics = None  # Optional PipelineMetrics shared by every reader of this session
+        self.profile_dir = None  # Profile every reader thread with cProfile into this directory
+        self.readers_started = 0
+        self.resumes = 0
+        self.errors = 0  # Problems reported through errorOccurred
+        self.last_error = ''
+        self._ports = []
+        self._state_since = time.monotonic()
+        self._lost_since = None  # monotonic time the link went down while a recording is open
+        self._retry_at = 0.0
+        self._bytes_seen = 0
+        self._bytes_time = 0.0
+        self.watchdog = QTimer(self)
+        self.watchdog.timeout.connect(self.checkTimeouts)
+
+    def start(self):
+        """Open data_source right away, or wait for onPortsChanged to report a device"""
+        if self.state != IDLE:
+            return
+        self.watchdog.start(250)
+        if self.data_source is not None:
+            self.port = self.data_source.name
+            self.openReader()
+            return
+        self.setState(SEARCHING)
+        self.onPortsChanged(self._ports)
+
+    def setMetrics(self, metrics):
+        """Start (or with None stop) timing the pipeline, including a reader already running"""
+        self.metrics = metrics
+        if self.reader is not None:
+            self.reader.metrics = metrics
+
+    def close(self):
+        """Stop the reader and close the recording"""
+        self.watchdog.stop()
+        self.closeReader()
+        self.stopRecording()
+        self.setState(CLOSED)
+
+    @property
+    def resuming(self):
+        """True while a lost device is expected back in the open recording"""
+        return self._lost_since is not None
+
+    def setState(self, state, message=''):
+        """Switch state and tell the window"""
+        if (state, message) == (self.state, self.message):
+            return
+        self.state = state
+        self.message = message
+        self._state_since = time.monotonic()
+        self.stateChanged.emit(state, message)
+
+    def onPortsChanged(self, ports):
+        """React to the ESP32 ports reported by discovery"""
+        if self.bound_port is not None:
+            ports = [port for port in ports if port == self.bound_port]
+        self._ports = ports
+        if self.state in (IDLE, CLOSED):
+            return
+        if self.reader is not None and self.port not in ports:
+            # Unplugged: the reader would only fail on a dead handle
+            self.closeReader()
+            self.linkLost('устройство отключено')
+        elif self.reader is None and ports:
+            if self.state == SEARCHING:
+                self.port = ports[0]
+                self.openReader()
+            elif self.state in (RECONNECTING, FAILED):
+                # Replug; the device may come back under another name
+                self.port = self.port if self.port in ports else ports[0]
+                self.openReader()
+        elif self.reader is None and self.state == FAILED:
+            self.setState(SEARCHING)
+
+    def openReader(self):
+        """Start a reader on self.port, keeping the recording of a resumed session"""
+        self.reader = SerialReader(self.port, self.initial_baudrate, protocol=self.serial_protocol,
+                                   baud_candidates=self.baud_candidates, source=self.data_source)
+        if self.record_sessions and self.recorder is None:
+            self.startRecording()
+        self.reader.recorder = self.recorder
+        self.reader.analysis_buffer = self.analysis_buffer
+        self.reader.metrics = self.metrics
+        self.readers_started += 1
+        if self.profile_dir is not None:
+            self.reader.profile_path = os.path.join(self.profile_dir, f'reader_{self.portName()}_{self.readers_started}.prof')
+        if self.detect_beats:
+            self.reader.qrs_detector = QRSDetector(self.sample_rate)
+            self.reader.beatsDetected.connect(self.beatsDetected)
+        if self.channels is not None:
+            ecg = self.channels.get(CHANNEL_ECG)
+            ecg.decoder = FilterChain(self.sample_rate, **self.filter_settings) if self.filter_settings else None
+            self.reader.channels = self.channels
+        # Signals cross threads, so Qt queues them onto the GUI event loop
+        self.reader.samplesReady.connect(self.onReaderSamples)
+        self.reader.pulseReceived.connect(self.pulseReceived)
+        self.reader.breathReceived.connect(self.breathReceived)
+        self.reader.connectionFailed.connect(self.onReaderFailed)
+        self.reader.reconnecting.connect(self.onReaderReconnecting)
+        self._bytes_seen = 0
+        self._bytes_time = time.monotonic()
+        self.reader.start()
+        self.setState(CONNECTING, self.port or '')
+
+    def portName(self):
+        """self.port reduced to characters that are safe in a file name"""
+        return re.sub(r'\W+', '_', self.port or 'source').strip('_')
+
+    def closeReader(self):
+        """Stop the reader thread; the recording stays open"""
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+
+    def linkLost(self, message):
+        """Keep the recording open and wait for the device to come back"""
+        if self._lost_since is None:
+            self._lost_since = time.monotonic()
+        self._retry_at = time.monotonic() + self.retry_interval
+        self.setState(RECONNECTING, message)
+
+    def onReaderSamples(self, batch):
+        """Acknowledge a batch to its reader and pass it on"""
+        reader = self.sender()
+        if isinstance(reader, SerialReader):
+            reader.batchDelivered(batch)
+        if reader is not None and reader is self.reader and self.state != STREAMING:
+            if self._lost_since is not None:
+                self.resumes += 1
+                self._lost_since = None
+            if reader.await_recorder:
+                # The last recording ended at the resume deadline while this reader kept reconnecting;
+                # it held the samples read since then and writes them first
+                self.startRecording()
+                reader.recorder = self.recorder
+                reader.await_recorder = False
+            self.setState(STREAMING)
+        self.samplesReady.emit(batch)
+
+    def onReaderFailed(self, message):
+        """The reader gave up on a source that does not reconnect by itself"""
+        if self.reader is None or self.sender() is not self.reader:
+            return
+        self.reportError(f'подключение: {message}')
+        self.closeReader()
+        if self.state == STREAMING or self._lost_since is not None:
+            # Most often the cable was pulled before discovery noticed
+            self.linkLost(message)
+        else:
+            self.connectFailed(message)
+
+    def connectFailed(self, message):
+        """Report the failure and try the port again after retry_interval"""
+        self._retry_at = time.monotonic() + self.retry_interval
+        self.setState(FAILED, message)
+
+    def onReaderReconnecting(self, message):
+        """The reader lost a reconnecting source and keeps reopening it itself"""
+        if self.reader is None or self.sender() is not self.reader:
+            return
+        self.reportError(f'связь потеряна: {message}')
+        self.linkLost(message)
+
+    def reportError(self, message):
+        """Count a problem and hand it to the window; the state shows only where the session is"""
+        self.errors += 1
+        self.last_error = message
+        self.errorOccurred.emit(message)
+
+    def checkTimeouts(self):
+        """Watchdog: connect and stall timeouts, port retries and the resume deadline"""
+        now = time.monotonic()
+        if self.reader is not None:
+            if self.reader.bytes_read != self._bytes_seen:
+                self._bytes_seen = self.reader.bytes_read
+                self._bytes_time = now
+            # Any byte, e.g. the acknowledgement of binary mode during calibration, is a sign of life
+            if self.state == CONNECTING and now - self._bytes_time > self.connect_timeout:
+                self.closeReader()
+                if self._lost_since is not None:
+                    self.linkLost('нет данных от устройства')
+                else:
+                    self.connectFailed('нет данных от устройства')
+            elif self.state == STREAMING and now - self._bytes_time > self.stall_timeout:
+                # Port still open but silent, e.g. the firmware hung; reopen it
+                self.closeReader()
+                self.linkLost('поток данных остановился')
+        elif self.state in (RECONNECTING, FAILED) and now >= self._retry_at:
+            if self.data_source is not None or self.port in self._ports:
+                self.openReader()
+            self._retry_at = now + self.retry_interval
+        if self._lost_since is not None and now - self._lost_since > self.resume_timeout:
+            # Too long for one recording; the next connection starts a new one
+            self._lost_since = None
+            self.stopRecording()
+            if self.reader is None and self.data_source is None:
+                self.setState(SEARCHING)
+
+    def startRecording(self):
+        """Open a new session file; samples are written by the reader thread"""
+        # Every panel starts recording at once, so the port and a counter keep the names apart
+        stem = time.strftime('session_%Y%m%d_%H%M%S_') + self.portName()
+        try:
+            os.makedirs(self.recordings_dir, exist_ok=True)
+            number = 1
+            while True:
+                filename = stem + (f'_{number}' if number > 1 else '') + '.crdg'
+                try:
+                    self.recorder = SessionWriter(os.path.join(self.recordings_dir, filename), self.sample_rate)
+                    break
+                except FileExistsError:
+                    number += 1
+        except OSError as e:
+            self.reportError(f'запись не начата: {e}')
+            self.recorder = None
+
+    def stopRecording(self):
+        """Flush and close the session file"""
+        if self.reader is not None:
+            # A reader that reconnects by itself outlives the recording; a new one starts with the stream
+            # Hold samples first, so none is dropped between the two assignments
+            self.reader.await_recorder = self.record_sessions
+            self.reader.recorder = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+
+class DeviceManager(QObject):
+    """Share one DeviceDiscovery between the sessions of every connected ESP32
+
+    Each session has its own reader thread, so devices are read and parsed
+    independently. portAdded asks the owner for a session on a new port.
+    """
+    portAdded = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sessions = []
+        self.ports = []
+        self.discovery = None
+
+    def start(self):
+        """Start watching for ESP32 ports in the background"""
+        self.discovery = DeviceDiscovery(self)
+        self.discovery.portsChanged.connect(self.onPortsChanged)
+        self.discovery.start()
+
+    def stop(self):
+        """Stop discovery; the sessions are closed by their owners"""
+        if self.discovery is not None:
+            self.discovery.stop()
+            self.discovery = None
+
+    def addSession(self, session):
+        """Feed discovered ports to session from now on"""
+        self.sessions.append(session)
+        session.onPortsChanged(self.ports)
+
+    def removeSession(self, session):
+        """Stop feeding ports to session"""
+        self.sessions.remove(session)
+
+    def onPortsChanged(self, ports):
+        """Pass the ports to every session and announce the ones nobody owns"""
+        self.ports = ports
+        for session in list(self.sessions):
+            session.onPortsChanged(ports)
+        owned = {session.bound_port for session in self.sessions}
+        for port in ports:
+            if port not in owned:
+                self.portAdded.emit(port)
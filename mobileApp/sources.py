@@ -0,0 +1,133 @@
+import select
+import socket
+import serial
+
+
+class DataSource:
+    """Where SerialReader gets its bytes from
+
+    open() returns a serial-like stream with read(size), in_waiting, write(data),
+    reset_input_buffer(), baudrate, is_open and close().
+    """
+    name = 'source'
+    negotiable = False  # True if the stream understands the baud-rate handshake
+    supports_binary = True  # False if the device never answers "mode bin" on this link
+    reconnect = False  # True to reopen with back-off when the link drops instead of failing
+
+    def open(self, timeout):
+        raise NotImplementedError
+
+
+class SerialSource(DataSource):
+    """USB serial port of a real ESP32"""
+    negotiable = True
+
+    def __init__(self, port, baudrate=9600):
+        self.port = port
+        self.baudrate = baudrate
+        self.name = port
+
+    def open(self, timeout):
+        return serial.Serial(self.port, self.baudrate, timeout=timeout)
+
+
+class SocketStream:
+    """Serial-like wrapper around a connected stream socket
+
+    The socket is non-blocking; read() waits in select() for at most timeout
+    and then drains everything the kernel has, so reads stay bulk like USB.
+    """
+    recv_size = 65536
+
+    def __init__(self, sock, timeout):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.timeout = timeout
+        self.baudrate = 0  # No line rate on a socket
+        self.is_open = True
+        self._buffer = bytearray()
+        self._closed_by_peer = False
+
+    def fill(self, wait):
+        """Move received bytes into the buffer, waiting up to wait seconds if there are none"""
+        if wait and not self._buffer and not self._closed_by_peer:
+            select.select([self.sock], [], [], wait)
+        while not self._closed_by_peer:
+            try:
+                data = self.sock.recv(self.recv_size)
+            except (BlockingIOError, InterruptedError):
+                return
+            if not data:
+                self._closed_by_peer = True
+                return
+            self._buffer += data
+            if len(data) < self.recv_size:
+                return
+
+    @property
+    def in_waiting(self):
+        self.fill(0)
+        return len(self._buffer)
+
+    def read(self, size=1):
+        """Return up to size bytes; raises ConnectionError once the peer closed and the buffer is empty"""
+        self.fill(self.timeout)
+        if not self._buffer and self._closed_by_peer:
+            raise ConnectionError('connection closed by the device')
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def write(self, data):
+        select.select([], [self.sock], [], self.timeout)
+        self.sock.sendall(data)
+        return len(data)
+
+    def reset_input_buffer(self):
+        self.fill(0)
+        self._buffer.clear()
+
+    def close(self):
+        self.is_open = False
+        self.sock.close()
+
+
+class SocketSource(DataSource):
+    """TCP stream, e.g. a network bridge or a local stand-in for the Bluetooth link in tests"""
+    reconnect = True
+
+    def __init__(self, host, port, supports_binary=False, connect_timeout=5.0):
+        self.host = host
+        self.port = port
+        self.supports_binary = supports_binary
+        self.connect_timeout = connect_timeout
+        self.name = f'{host}:{port}'
+
+    def connect(self):
+        return socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+
+    def open(self, timeout):
+        return SocketStream(self.connect(), timeout)
+
+
+class BluetoothSource(SocketSource):
+    """Bluetooth SPP (RFCOMM) link to the firmware's "Cardioreg" device
+
+    The firmware mirrors every line over Bluetooth as ASCII and only takes
+    commands over USB, so there is no binary mode or baud negotiation here.
+    """
+    def __init__(self, address, channel=1, connect_timeout=10.0):
+        super().__init__(address, channel, supports_binary=False, connect_timeout=connect_timeout)
+        self.name = f'bt:{address}'
+
+    def connect(self):
+        if not hasattr(socket, 'AF_BLUETOOTH'):
+            raise OSError('Bluetooth sockets are not supported on this platform')
+        sock = socket.socket(socket.AF_BLUETOOTH, socket.SOCK_STREAM, socket.BTPROTO_RFCOMM)
+        sock.settimeout(self.connect_timeout)
+        try:
+            sock.connect((self.host, self.port))
+        except Exception:
+            sock.close()
+            raise
+        return sock
@@ -0,0 +1,100 @@
+import builtins
+import json
+import sys
+import time
+
+# Only the standard library here: main.py imports this module first so that
+# the profile also covers the PyQt5 imports.
+
+
+class ImportTimer:
+    """Time every module imported while installed, like python -X importtime
+
+    Wraps builtins.__import__; a call counts when it adds its module to
+    sys.modules, and the time of imports nested in it is split off as
+    self time. Modules loaded through importlib.import_module are counted
+    within the import that triggered them.
+    """
+    def __init__(self):
+        self.records = []  # (name, self_seconds, cumulative_seconds, depth) in completion order
+        self._children = []  # Cumulative time of finished nested imports, one entry per open import
+        self._import = None
+
+    def install(self):
+        if self._import is None:
+            self._import = builtins.__import__
+            builtins.__import__ = self.timedImport
+
+    def uninstall(self):
+        if self._import is not None:
+            builtins.__import__ = self._import
+            self._import = None
+
+    def timedImport(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            # Already loaded (or relative, which this app does not use): nothing to time
+            return self._import(name, globals, locals, fromlist, level)
+        self._children.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            self.records.append((name, elapsed - children, elapsed, len(self._children)))
+
+    def total(self):
+        """Seconds spent in top-level imports"""
+        return sum(cumulative for _, _, cumulative, depth in self.records if depth == 0)
+
+    def slowest(self, count=15):
+        """The count records with the largest cumulative time"""
+        return sorted(self.records, key=lambda record: record[2], reverse=True)[:count]
+
+
+class StartupProfile:
+    """Cold start timings from the first line of main.py to the first painted window
+
+    Create it before the heavy imports; it times them until firstPaint().
+    """
+    def __init__(self, time_imports=True):
+        self.started = time.perf_counter()
+        self.marks = []  # (label, seconds since started)
+        self.imports = ImportTimer()
+        if time_imports:
+            self.imports.install()
+
+    def mark(self, label):
+        """Note how long start-up took up to this point"""
+        self.marks.append((label, time.perf_counter() - self.started))
+
+    def firstPaint(self):
+        """The first window was painted: stop timing imports"""
+        self.mark('first_paint')
+        self.imports.uninstall()
+
+    def stats(self):
+        """Flat {metric: milliseconds} results, in benchmark.py's naming"""
+        stats = {f'startup_{label}_ms': 1000 * seconds for label, seconds in self.marks}
+        stats['startup_imports_ms'] = 1000 * self.imports.total()
+        stats['startup_modules'] = len(self.imports.records)
+        return stats
+
+    def report(self, count=15):
+        """Marks and the slowest imports in the layout of -X importtime"""
+        lines = [f"{label}: {1000 * seconds:.0f} ms" for label, seconds in self.marks]
+        lines.append(f"imports: {1000 * self.imports.total():.0f} ms in {len(self.imports.records)} modules")
+        lines.append('import time: self [us] | cumulative | imported package')
+        for name, own, cumulative, depth in self.imports.slowest(count):
+            lines.append(f"import time: {1e6 * own:9.0f} | {1e6 * cumulative:10.0f} | {'  ' * depth}{name}")
+        return '\n'.join(lines)
+
+    def write(self, path):
+        """Print the report to stderr, or save stats() as JSON when path is not '-'"""
+        if path == '-':
+            print(self.report(), file=sys.stderr)
+            return
+        with open(path, 'w') as f:
+            json.dump(self.stats(), f, indent=2)
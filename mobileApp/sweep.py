@@ -0,0 +1,142 @@
+import math
+import numpy as np
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QPainter, QRegion
+from graphics import drawPolyline, mapToScreen, polygonFromArrays
+
+DISPLAY_MODES = ('scroll', 'sweep')
+
+
+def sweepSpans(first, last, capacity, width):
+    """Pixel column spans (x0, x1) of samples first..last-1 on a sweep of capacity samples
+
+    Sample k sits at column (k % capacity) * width / capacity, so a run
+    that passes the right edge gives two spans.
+    """
+    last = min(last, first + capacity)
+    spans = []
+    while first < last:
+        slot = first % capacity
+        end = slot + min(last - first, capacity - slot)
+        spans.append((int(slot * width / capacity), min(int(math.ceil(end * width / capacity)), width)))
+        first += end - slot
+    return spans
+
+
+class SweepLane:
+    """Cursor and Y range of one lane on the sweep image"""
+    def __init__(self, trace):
+        self.trace = trace
+        self.data = trace.data  # setWindowSeconds replaces the buffer, which restarts the lane
+        self.drawn = None  # data.total_written already on the image, None redraws the whole lane
+        self.range = None  # (low, high) the lane is drawn with
+
+
+class Sweep:
+    """Bedside monitor display: a cursor runs left to right, overwriting the oldest signal
+
+    Each frame draws only the samples that arrived since the last one into
+    a persistent image of the plot area and erases a short gap ahead of the
+    cursor, so its cost follows the sample rate, not the window length.
+    advance() returns the strips that changed for a partial repaint.
+    """
+    def __init__(self, gap_seconds=0.2):
+        self.gap_seconds = gap_seconds  # Blank space ahead of the cursor
+        self.image = None  # Plot area with grid and traces
+        self.grid = None  # Plot area of the background, used to erase
+        self.background = None  # The GraphView background pixmap both were cut from
+        self.lanes = []
+
+    def invalidate(self):
+        """Redraw every lane from its buffer on the next advance"""
+        self.image = None
+
+    def laneRange(self, index):
+        """(low, high) lane index is drawn with, None before it has data"""
+        return self.lanes[index].range if index < len(self.lanes) else None
+
+    def advance(self, view):
+        """Draw the new samples of every lane of view
+
+        Returns the QRegion of view that changed, or None if all of it did.
+        """
+        left, top, width, height = view.graphRect()
+        if width < 2 or height < 2:
+            return None
+        background = view.backgroundPixmap()
+        full = self.image is None or self.background is not background or len(self.lanes) != len(view.traces)
+        if full:
+            self.grid = background.copy(left, top, width, height).toImage()
+            self.image = self.grid.copy()
+            self.background = background
+            self.lanes = [SweepLane(trace) for trace in view.traces]
+        region = QRegion()
+        painter = QPainter(self.image)
+        for index, trace in enumerate(view.traces):
+            lane = self.lanes[index]
+            if lane.trace is not trace or lane.data is not trace.data or trace.data.total_written < (lane.drawn or 0):
+                lane = self.lanes[index] = SweepLane(trace)
+            lane_top, lane_height = view.laneRect(index)
+            shown_range = lane.range
+            spans = self.drawLane(painter, lane, lane_top - top, width, lane_height)
+            for x0, x1 in spans:
+                # Widened by the pen so the stroke around the span edges is repainted too
+                region += QRect(left + x0 - 2, lane_top, x1 - x0 + 4, lane_height)
+            if lane.range != shown_range:
+                # A new range also changes the Y labels left of the plot
+                region += QRect(0, lane_top, left, lane_height)
+        painter.end()
+        return None if full else region
+
+    def drawLane(self, painter, lane, top, width, height):
+        """Erase ahead of the cursor and draw the lane's new samples; returns the changed spans"""
+        trace = lane.trace
+        data = trace.data
+        autoscale = trace.autoscale
+        if autoscale.update() is not None and autoscale.target != lane.range:
+            # Data left the range: start the lane over instead of mixing two scales
+            lane.range = autoscale.target
+            lane.drawn = None
+        if lane.range is None:
+            return []
+        capacity = data.capacity
+        total = data.total_written
+        gap = min(max(int(self.gap_seconds * trace.sample_rate), 1), capacity // 2)
+        # The oldest samples of a full buffer fall in the gap ahead of the cursor
+        oldest = max(total - len(data), total - capacity + gap)
+        if lane.drawn is None or lane.drawn < oldest:
+            first = oldest
+            erased = spans = [(0, width)]
+        elif lane.drawn == total:
+            return []
+        else:
+            # The columns of the new samples were cleared as the gap; it moves on by as many
+            erased = sweepSpans(lane.drawn + gap, total + gap, capacity, width)
+            # Start at the last sample drawn so the new segment joins the old one
+            first = max(lane.drawn - 1, total - len(data))
+            spans = sweepSpans(first, total, capacity, width) + erased
+        lane.drawn = total
+        for x0, x1 in erased:
+            painter.drawImage(QRect(x0, top, x1 - x0, height), self.grid, QRect(x0, top, x1 - x0, height))
+        self.drawSamples(painter, lane, first, top, width, height)
+        return spans
+
+    def drawSamples(self, painter, lane, first, top, width, height):
+        """Draw samples first..newest of a lane at their sweep columns, broken where they wrap"""
+        data = lane.trace.data
+        capacity = data.capacity
+        count = data.total_written - first
+        if count < 2:
+            return
+        slots = np.arange(first, data.total_written) % capacity
+        # count=capacity + 1 spaces slots width / capacity apart, as in sweepSpans
+        xs, ys = mapToScreen(data.last(count), 0, top, width, height, lane.range[0], lane.range[1],
+                             positions=slots, count=capacity + 1)
+        painter.setPen(lane.trace.pen)
+        painter.setClipRect(0, top, width, height)
+        # Several samples per pixel column gain nothing from antialiasing
+        painter.setRenderHint(QPainter.Antialiasing, capacity <= width)
+        for piece in np.split(np.arange(count), np.flatnonzero(np.diff(slots) < 0) + 1):
+            if len(piece) > 1:
+                drawPolyline(painter, polygonFromArrays(xs[piece], ys[piece]))
+        painter.setClipping(False)
@@ -0,0 +1,77 @@
+import time
+import unittest
+from concurrent.futures import Future
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+from analysis import AnalysisPool, SharedRing, windowOf
+from replay import SyntheticECG
+
+class TestSharedRing(unittest.TestCase):
+    def test_windows_are_contiguous(self):
+        """Test that any window up to capacity comes back in order across wraps"""
+        ring = SharedRing(10)
+        ring.extend(np.arange(7))
+        ring.extend(np.arange(7, 16))
+        self.assertEqual(ring.total_written, 16)
+        self.assertEqual(windowOf(ring._data, 10, 16, 10).tolist(), list(range(6, 16)))
+        self.assertEqual(windowOf(ring._data, 10, 12, 4).tolist(), list(range(8, 12)))
+        ring.close()
+
+    def test_total_published_after_samples(self):
+        """Test that total_written only moves once the samples it announces are in both copies"""
+        ring = SharedRing(10)
+        ring.extend(np.arange(8))
+        data = ring._data
+        seen = []
+
+        class WatchedArray:
+            def __setitem__(self, key, value):
+                seen.append(ring.total_written)
+                data[key] = value
+
+        ring._data = WatchedArray()
+        ring.extend(np.arange(8, 14))
+        ring._data = data
+        self.assertEqual(seen, [8, 8, 8, 8])
+        self.assertEqual(ring.total_written, 14)
+        self.assertEqual(windowOf(data, 10, 14, 10).tolist(), list(range(4, 14)))
+        ring.close()
+
+class TestAnalysisPool(unittest.TestCase):
+    def test_result_posted_back(self):
+        """Test that a worker process analyses the shared window and the result reaches the GUI thread"""
+        app = QApplication.instance() or QApplication([])
+        ring = SharedRing(100 * 90)
+        samples, _ = SyntheticECG(seed=0).read(100 * 70)
+        ring.extend(samples)
+        pool = AnalysisPool()
+        results = []
+        pool.resultReady.connect(lambda key, metrics: results.append((key, metrics)))
+        self.assertTrue(pool.submit('device', ring, 100, 100 * 60))
+        self.assertFalse(pool.submit('device', ring, 100, 100 * 60))  # One analysis per key in flight
+        deadline = time.monotonic() + 30
+        while not results and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        pool.shutdown()
+        ring.close()
+        key, metrics = results[0]
+        self.assertEqual(key, 'device')
+        self.assertEqual(metrics['total'], 100 * 70)
+        self.assertAlmostEqual(metrics['mean_hr'], 72, delta=1)
+
+    def test_failure_reported(self):
+        """Test that a failed analysis is counted and signalled for its key"""
+        pool = AnalysisPool()
+        failures = []
+        pool.failed.connect(lambda key, message: failures.append((key, message)))
+        future = Future()
+        future.set_exception(ValueError('окно пустое'))
+        pool.busy.add('device')
+        pool.onDone('device', future)
+        self.assertEqual(failures, [('device', 'окно пустое')])
+        self.assertEqual(pool.failures, 1)
+        self.assertFalse(pool.busy)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,21 @@
+import os
+import subprocess
 import unittest
 import sys
 from PyQt5.QtWidgets import QApplication, QLabel, QPushButton
 from PyQt5.QtTest import QTest
 from PyQt5.QtCore import Qt
 from main import SignalRegistrationApp
+from images import loadPixmap
+from startup import StartupProfile
 
 class TestSignalRegistrationApp(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Qt allows only one QApplication per process
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+    
     def setUp(self):
-        self.app = QApplication(sys.argv)
         self.window = SignalRegistrationApp()
     
     def test_window_title(self):
@@ -18,22 +26,63 @@ class TestSignalRegistrationApp(unittest.TestCase):
         """Test that the instruction label exists and has correct text"""
         # Find the label with the instruction text
         labels = self.window.findChildren(QLabel)
-        instruction_labels = [label for label in labels if label.text() == 'выберите, какой сигнал регистрировать:']
+        instruction_labels = [label for label in labels if label.text() == 'выберите, какие сигналы регистрировать:']
         self.assertEqual(len(instruction_labels), 1)
     
     def test_buttons_exist(self):
-        """Test that all four buttons exist"""
+        """Test that the signal buttons, their info buttons and continue exist"""
         buttons = self.window.findChildren(QPushButton)
         button_texts = [button.text() for button in buttons]
         
         self.assertIn('ЭКГ', button_texts)
-        self.assertIn('ЭМГ', button_texts)
-        self.assertIn('ФПГ', button_texts)
         self.assertIn('Дыхание', button_texts)
-        self.assertEqual(len(buttons), 4)
+        self.assertEqual(button_texts.count('ⓘ'), 2)
+        self.assertIn('Продолжить', button_texts)
+        self.assertEqual(len(buttons), 5)
+    
+    def test_continue_needs_a_signal(self):
+        """Test that continue is enabled only while a signal is selected"""
+        self.assertFalse(self.window.continue_button.isEnabled())
+        QTest.mouseClick(self.window.buttons['ЭКГ'], Qt.LeftButton)
+        self.assertEqual(self.window.selected_signals, {'ЭКГ'})
+        self.assertTrue(self.window.continue_button.isEnabled())
+        QTest.mouseClick(self.window.buttons['ЭКГ'], Qt.LeftButton)
+        self.assertFalse(self.window.continue_button.isEnabled())
+    
+    def test_logo_pixmap_cached(self):
+        """Test that a scaled image is decoded once and shared"""
+        pixmap = loadPixmap('imgs/EKG.PNG', width=400)
+        self.assertEqual(pixmap.width(), 400)
+        self.assertIs(loadPixmap('imgs/EKG.PNG', width=400), pixmap)
+        self.assertIsNone(loadPixmap('imgs/missing.png'))
     
     def tearDown(self):
         self.window.close()
 
+class TestStartup(unittest.TestCase):
+    def test_lazy_imports(self):
+        """Test that the first window does not load the serial and signal processing stack"""
+        code = "import sys, main; print(sorted({'usb', 'serial', 'scipy'} & set(sys.modules)))"
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        self.assertEqual(output.strip(), '[]')
+    
+    def test_import_timer(self):
+        """Test that new imports are timed with nested ones split off, and cached ones skipped"""
+        profile = StartupProfile()
+        try:
+            sys.modules.pop('wave', None)
+            sys.modules.pop('chunk', None)
+            import wave, json
+        finally:
+            profile.firstPaint()
+        names = [record[0] for record in profile.imports.records]
+        self.assertIn('wave', names)
+        self.assertNotIn('json', names)
+        name, own, cumulative, depth = profile.imports.records[names.index('wave')]
+        self.assertEqual(depth, 0)
+        self.assertLessEqual(own, cumulative)
+        self.assertIn('startup_first_paint_ms', profile.stats())
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
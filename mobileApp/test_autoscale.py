@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+from autoscale import AutoScaler, WindowedExtremes
+
+class TestWindowedExtremes(unittest.TestCase):
+    def test_matches_rescan(self):
+        """Test that running extremes cover the window plus at most one block"""
+        values = np.random.default_rng(0).normal(0, 100, 5000)
+        extremes = WindowedExtremes(500, block=10)
+        position = 0
+        for size in [3, 17, 40, 1, 250] * 16:
+            extremes.extend(values[position:position + size])
+            position += size
+            window = values[max(position - 500, 0):position]
+            older = values[max(position - 509, 0):position]
+            self.assertTrue(older.min() <= extremes.min() <= window.min())
+            self.assertTrue(window.max() <= extremes.max() <= older.max())
+
+    def test_old_spike_expires(self):
+        """Test that a spike is forgotten once it leaves the window"""
+        extremes = WindowedExtremes(100, block=10)
+        extremes.extend([5000])
+        extremes.extend(np.zeros(120))
+        self.assertEqual(extremes.max(), 0)
+
+class TestAutoScaler(unittest.TestCase):
+    def test_hysteresis(self):
+        """Test that small amplitude changes do not move the range"""
+        scaler = AutoScaler(500)
+        scaler.extend(np.sin(np.arange(500) / 10) * 1000)
+        first = scaler.update(now=0.0)
+        scaler.extend(np.sin(np.arange(500) / 10) * 900)
+        self.assertEqual(scaler.update(now=1.0), first)
+
+    def test_smooth_transition(self):
+        """Test that the range eases towards a larger signal instead of jumping"""
+        scaler = AutoScaler(500, smoothing=0.2)
+        scaler.extend(np.full(10, -100.0))
+        scaler.extend(np.full(10, 100.0))
+        low, high = scaler.update(now=0.0)
+        scaler.extend([1000.0])
+        _, eased = scaler.update(now=0.05)
+        self.assertTrue(high < eased < scaler.target[1])
+        self.assertFalse(scaler.settled())
+        _, settled = scaler.update(now=5.0)
+        self.assertAlmostEqual(settled, scaler.target[1])
+        self.assertTrue(scaler.settled())
+
+    def test_fixed_mode(self):
+        """Test that fixed mode shows a constant span in millivolts"""
+        scaler = AutoScaler(500, mode='fixed', fixed_mv=2.0, counts_per_mv=1000, smoothing=0)
+        scaler.extend(np.linspace(1800, 2200, 100))
+        self.assertEqual(scaler.update(now=0.0), (1000.0, 3000.0))
+        scaler.extend(np.full(100, 2100.0))
+        self.assertEqual(scaler.update(now=1.0), (1000.0, 3000.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+from benchmark import compare, tolerance
+
+class TestCompare(unittest.TestCase):
+    def test_per_metric_tolerances(self):
+        """Test that only stable metrics are gated, each with its own tolerance"""
+        baseline = {'render_5s_1280x720_ms': 5.0, 'render_sweep_5s_1280x720_ms': 0.2,
+                    'parse_lines_speedup': 2.0, 'add_data_samples_per_s': 1000.0}
+        results = {'render_5s_1280x720_ms': 9.0, 'render_sweep_5s_1280x720_ms': 0.5,
+                   'parse_lines_speedup': 1.4, 'add_data_samples_per_s': 400.0,
+                   'render_5s_1280x720_p95_ms': 100.0}
+        self.assertEqual(compare(results, baseline),
+                         [('parse_lines_speedup', 2.0, 1.4), ('add_data_samples_per_s', 1000.0, 400.0)])
+        self.assertEqual(compare(results, baseline, scale=2.0), [])
+        self.assertIsNone(tolerance('render_5s_1280x720_p95_ms'))
+        self.assertIsNone(tolerance('parse_binary_10000_cpu_percent'))
+        self.assertIsNone(tolerance('parse_legacy_ns_per_line'))
+        self.assertEqual(compare({'parse_legacy_ns_per_line': 900.0}, {'parse_legacy_ns_per_line': 300.0}), [])
+        # The parser's own cost guards the speedup even though its reference is not gated
+        self.assertEqual(compare({'parse_lines_ns_per_line': 200.0}, {'parse_lines_ns_per_line': 100.0}),
+                         [('parse_lines_ns_per_line', 100.0, 200.0)])
+        self.assertEqual(compare({'parse_lines_ns_per_line': 160.0}, {'parse_lines_ns_per_line': 100.0}), [])
+
+if __name__ == '__main__':
+    unittest.main()
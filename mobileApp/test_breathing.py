@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from breathing import BreathDetector
+
+def humidity(seconds, breaths_per_minute, amplitude=3.0, seed=0):
+    """1 Hz humidity of a subject breathing on the sensor, with drift and whole-percent steps"""
+    t = np.arange(seconds)
+    random = np.random.default_rng(seed)
+    wave = amplitude * np.sin(2 * np.pi * breaths_per_minute / 60 * t) if breaths_per_minute else 0
+    return np.round(60 + 0.05 * t + wave + random.normal(0, 0.3, seconds))
+
+class TestBreathDetector(unittest.TestCase):
+    def test_rate_and_apnea(self):
+        """Test the rolling rate while breathing and apnea within seconds after it stops"""
+        detector = BreathDetector()
+        self.assertIsNone(detector.status())
+        for second, value in enumerate(humidity(90, 12)):
+            detector.process([value])
+        self.assertEqual(detector.status(), 1)
+        self.assertAlmostEqual(detector.rate, 12, delta=1)
+        held = humidity(30, 0, seed=1) + 4.5
+        for second, value in enumerate(held):
+            detector.process([value])
+            if detector.status() == 0:
+                break
+        self.assertLessEqual(second, 14)
+        self.assertIsNone(detector.rate)
+
+    def test_noise_is_not_breathing(self):
+        """Test that a still sensor never reports breaths"""
+        detector = BreathDetector()
+        self.assertEqual(detector.process(humidity(60, 0)), [])
+        self.assertEqual(detector.status(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
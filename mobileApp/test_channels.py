@@ -0,0 +1,43 @@
+import unittest
+from channels import Channel, ChannelRegistry, STATUS, WAVEFORM, defaultChannels
+from protocol import CHANNEL_ECG, CHANNEL_PPG
+from reader import SerialReader
+
+class TestChannelRegistry(unittest.TestCase):
+    def test_dispatch_to_enabled_channels(self):
+        """Test that batches reach the consumers of enabled channels only"""
+        registry = defaultChannels(100)
+        registry.enable({'ЭКГ', 'Дыхание'})
+        received = []
+        for channel in registry:
+            channel.subscribe(lambda channel, values: received.append((channel.id, list(values))))
+        self.assertTrue(registry.dispatch(CHANNEL_ECG, [1, 2]))
+        self.assertFalse(registry.dispatch(CHANNEL_PPG, [3]))
+        self.assertFalse(registry.dispatch(99, [4]))
+        self.assertEqual(received, [(CHANNEL_ECG, [1, 2])])
+        self.assertEqual(list(registry.get(CHANNEL_ECG).buffer.view()), [1, 2])
+        self.assertEqual([channel.label for channel in registry.enabledChannels(WAVEFORM)], ['ЭКГ', 'Влажность'])
+        self.assertEqual([channel.label for channel in registry.enabledChannels(STATUS)], ['Дыхание'])
+
+    def test_duplicate_id(self):
+        """Test that two channels cannot share a wire number"""
+        registry = ChannelRegistry([Channel(5, 'a', 10)])
+        with self.assertRaises(ValueError):
+            registry.register(Channel(5, 'b', 10))
+
+class TestLineDispatch(unittest.TestCase):
+    def test_parse_lines_by_channel(self):
+        """Test that ASCII lines are split into channels and events"""
+        reader = SerialReader('/dev/null')
+        pulses = []
+        reader.pulseReceived.connect(pulses.append)
+        lines = [b'2048\r', b'3:512\r', b'bpm72\r', b'2050\r', b'3:514', b'breath', b'x1', b'']
+        samples = reader.parseLines(lines)
+        self.assertEqual({channel: values.tolist() for channel, values in samples.items()},
+                         {CHANNEL_ECG: [2048.0, 2050.0], CHANNEL_PPG: [512.0, 514.0]})
+        self.assertEqual(pulses, [72])
+        self.assertEqual(reader.bad_lines, 1)
+        self.assertEqual(reader.samples_read, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import numpy as np
+from decimate import minMaxEnvelope
+
+class TestMinMaxEnvelope(unittest.TestCase):
+    def test_short_input_is_untouched(self):
+        """Test that data already narrower than the bins is returned as is"""
+        values = np.arange(10.0)
+        positions, samples = minMaxEnvelope(values, 8)
+        np.testing.assert_array_equal(positions, np.arange(10))
+        np.testing.assert_array_equal(samples, values)
+    
+    def test_spikes_survive(self):
+        """Test that single-sample QRS-like spikes are kept"""
+        values = np.zeros(6000)
+        values[1234] = 100
+        values[4321] = -50
+        positions, samples = minMaxEnvelope(values, 300)
+        self.assertLessEqual(len(samples), 2 * 300 + 2)
+        self.assertEqual(samples.max(), 100)
+        self.assertEqual(samples.min(), -50)
+        self.assertIn(1234, positions)
+        self.assertIn(4321, positions)
+    
+    def test_positions_are_ordered(self):
+        """Test that the envelope keeps samples in time order"""
+        values = np.random.default_rng(0).normal(size=5000)
+        positions, samples = minMaxEnvelope(values, 200, first_index=37)
+        self.assertTrue(np.all(np.diff(positions) >= 0))
+        np.testing.assert_array_equal(samples, values[positions.astype(int)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+from filters import FilterChain
+from replay import SyntheticECG
+
+class TestFilterChain(unittest.TestCase):
+    def setUp(self):
+        samples, _ = SyntheticECG(noise=10, seed=1).read(3000)
+        # Add slow electrode drift the high-pass should remove
+        self.samples = samples + 400 * np.sin(2 * np.pi * 0.05 * np.arange(3000) / 100)
+
+    def test_chunked_matches_offline(self):
+        """Test that batch-by-batch filtering equals filtering everything at once"""
+        chain = FilterChain(100)
+        offline = chain.filterOffline(self.samples)
+        chunked = []
+        for start in range(0, 3000, 7):
+            chunked.append(chain.process(self.samples[start:start + 7]))
+        np.testing.assert_array_equal(np.concatenate(chunked), offline)
+
+    def test_removes_baseline(self):
+        """Test that the baseline no longer drifts after filtering"""
+        filtered = FilterChain(100).filterOffline(self.samples)
+        # Median over each second follows the baseline, not the QRS spikes
+        medians = np.median(filtered[500:].reshape(-1, 100), axis=1)
+        self.assertLess(np.ptp(medians), 60)
+        self.assertGreater(np.ptp(np.median(self.samples[500:].reshape(-1, 100), axis=1)), 500)
+
+    def test_sections_above_nyquist(self):
+        """Test that a 50 Hz notch is left out at 100 samples/s but used at 500"""
+        self.assertEqual(len(FilterChain(100).sos), 2)
+        self.assertEqual(len(FilterChain(500).sos), 3)
+        self.assertEqual(len(FilterChain(100, highpass=None, notch=None, lowpass=None).sos), 1)
+
+    def test_latency_stats(self):
+        """Test that per-batch timing is tracked against the budget"""
+        chain = FilterChain(100, latency_budget=0)
+        chain.process(self.samples[:100])
+        chain.process(self.samples[100:200])
+        stats = chain.stats()
+        self.assertEqual(stats['filter_batches'], 2)
+        self.assertEqual(stats['filter_over_budget'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
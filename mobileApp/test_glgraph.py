@@ -0,0 +1,126 @@
+import os
+import sys
+import unittest
+import numpy as np
+from PyQt5.QtGui import QImage
+from PyQt5.QtTest import QTest
+from PyQt5.QtWidgets import QApplication
+from glgraph import GLGraphWidget, drawRange, mirroredWrites, openglAvailable
+from graph import GraphWidget, createGraphWidget
+from ringbuffer import RingBuffer
+from usb import DevicePanel
+
+# Mesa's llvmpipe where there is no GPU (opengl32sw on Windows), so pixels match on every machine
+os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+os.environ.setdefault('QT_OPENGL', 'software')
+
+def traceRows(image, x, top, height, color):
+    """Rows of column x within top..top+height whose pixel is close to color"""
+    image = image.convertToFormat(QImage.Format_RGB32)
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(bits, np.uint8).reshape(image.height(), image.bytesPerLine() // 4, 4)
+    column = pixels[top:top + height, x, 2::-1].astype(int)  # BGRA in memory
+    distance = np.abs(column - [color.red(), color.green(), color.blue()]).sum(axis=1)
+    return top + np.flatnonzero(distance < 90)
+
+class TestMirroredUpload(unittest.TestCase):
+    def test_partial_uploads_match_ring_buffer(self):
+        """Test that uploading only new samples keeps the same layout as RingBuffer's mirror"""
+        capacity = 7
+        ring = RingBuffer(capacity)
+        mirror = np.zeros(2 * capacity)
+        total = 0
+        for batch in (3, 5, 1, 9, 6):
+            values = np.arange(total, total + batch, dtype=np.float64)
+            ring.extend(values)
+            total += batch
+            new = values[-capacity:]
+            for slot, first, last in mirroredWrites(total, len(new), capacity):
+                mirror[slot:slot + last - first] = new[first:last]
+            start, count = drawRange(total, len(ring), capacity)
+            self.assertEqual(mirror[start:start + count].tolist(), ring.view().tolist())
+
+class TestRendererSelection(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+
+    def test_fallback_without_opengl(self):
+        """Test that asking for OpenGL where it cannot work gives the software renderer"""
+        graph = createGraphWidget('opengl', sample_rate=100, window_seconds=5)
+        self.assertEqual(graph.renderer, 'opengl' if openglAvailable() else 'software')
+        self.assertIsInstance(createGraphWidget('software'), GraphWidget)
+        with self.assertRaises(ValueError):
+            createGraphWidget('vulkan')
+
+    def test_switch_keeps_lanes(self):
+        """Test that a runtime renderer switch carries the lanes, data and pulse over"""
+        panel = DevicePanel(selected_signals={'ЭКГ'})
+        panel.graph_widget.addSamples([1.0, 2.0, 3.0])
+        panel.graph_widget.setPulse(70)
+        self.assertEqual(panel.setRenderer('opengl'), 'opengl' if openglAvailable() else 'software')
+        self.assertEqual(panel.graph_widget.data.view().tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(panel.graph_widget.pulse_value, 70)
+        graph = GraphWidget()
+        graph.takeGraph(panel.graph_widget)
+        self.assertIs(graph.traces, panel.graph_widget.traces)
+        self.assertEqual(graph.pulse_value, 70)
+        panel.stop()
+
+class TestOpenGLRendering(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+
+    def setUp(self):
+        if not openglAvailable():
+            self.skipTest('no OpenGL context on this platform')
+
+    def assertTraceAt(self, image, graph, values, ranges):
+        """Check that each segment of a step trace is drawn at its own height
+
+        values is [(value, samples)] oldest first and fills the window.
+        """
+        ratio = image.width() / graph.width()
+        left, top, width, height = graph.graphRect()
+        min_val, max_val = ranges[-1]
+        count = sum(samples for _, samples in values)
+        first = 0
+        for value, samples in values:
+            index = first + samples // 2
+            first += samples
+            x = left + index * width / (count - 1)
+            y = top + height - (value - min_val) * height / (max_val - min_val)
+            rows = traceRows(image, int(x * ratio), int(top * ratio), int(height * ratio), graph.traces[0].pen.color())
+            self.assertTrue(len(rows), f'no trace at sample {index}')
+            self.assertLessEqual(abs(rows.min() / ratio - y), 4)
+            self.assertLessEqual(abs(rows.max() / ratio - y), 4)
+
+    def test_trace_pixels(self):
+        """Test that the uploaded buffers and the scroll uniform put every sample where QPainter would"""
+        graph = GLGraphWidget(sample_rate=100, window_seconds=5)
+        graph.resize(400, 300)
+        ranges = []
+        draw = graph.drawSamples
+
+        def recordRange(painter, trace, left, top, width, height, min_val, max_val):
+            ranges.append((min_val, max_val))
+            draw(painter, trace, left, top, width, height, min_val, max_val)
+
+        graph.drawSamples = recordRange
+        graph.show()
+        self.assertTrue(QTest.qWaitForWindowExposed(graph))
+        graph.addSamples([200.0] * 250 + [800.0] * 250)
+        image = graph.grabFramebuffer()
+        self.assertIsNone(graph.failed)
+        self.assertIsNotNone(graph.gl)
+        self.assertTraceAt(image, graph, [(200.0, 250), (800.0, 250)], ranges)
+        # Only these samples are uploaded, wrapping the mirrored buffer; the window scrolls by start
+        graph.addSamples([500.0] * 150)
+        image = graph.grabFramebuffer()
+        self.assertTraceAt(image, graph, [(200.0, 100), (800.0, 250), (500.0, 150)], ranges)
+        graph.close()
+
+if __name__ == '__main__':
+    unittest.main()
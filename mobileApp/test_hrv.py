@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from hrv import analyzeSamples, breathRate, frequencyDomain, timeDomain
+from replay import SyntheticECG
+
+class TestHRV(unittest.TestCase):
+    def test_time_domain(self):
+        """Test SDNN and RMSSD against their definitions, ignoring impossible intervals"""
+        rr = [0.8, 0.9, 0.8, 1.0, 5.0]
+        metrics = timeDomain(rr)
+        self.assertAlmostEqual(metrics['sdnn_ms'], 1000 * np.std([0.8, 0.9, 0.8, 1.0], ddof=1))
+        self.assertAlmostEqual(metrics['rmssd_ms'], 1000 * np.sqrt(np.mean([0.01, 0.01, 0.04])))
+        self.assertEqual(timeDomain([1.0, 1.0]), {})
+
+    def test_respiratory_arrhythmia_is_high_frequency(self):
+        """Test that RR modulated at a breathing rate of 0.25 Hz gives LF/HF well below 1"""
+        rr, elapsed = [], 0.0
+        while elapsed < 300:
+            interval = 0.9 + 0.05 * np.sin(2 * np.pi * 0.25 * elapsed)
+            rr.append(interval)
+            elapsed += interval
+        metrics = frequencyDomain(rr)
+        self.assertLess(metrics['lf_hf'], 0.2)
+        self.assertEqual(frequencyDomain(rr[:20]), {})
+
+    def test_breath_rate_from_baseline(self):
+        """Test that baseline wander at 15 breaths/min is found in the ECG"""
+        samples, _ = SyntheticECG(seed=0).read(100 * 120)
+        seconds = np.arange(len(samples)) / 100
+        breathing = samples + 60 * np.sin(2 * np.pi * 0.25 * seconds)
+        self.assertAlmostEqual(breathRate(breathing, 100), 15, delta=1)
+        metrics = analyzeSamples(breathing, 100)
+        self.assertAlmostEqual(metrics['mean_hr'], 72, delta=1)
+
+if __name__ == '__main__':
+    unittest.main()
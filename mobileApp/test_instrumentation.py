@@ -0,0 +1,73 @@
+import threading
+import time
+import unittest
+from instrumentation import Histogram, PipelineMetrics, StackSampler
+from reader import SerialReader
+from usb import aggregateStats
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        """Test that percentiles land on the bucket bound and never exceed the maximum"""
+        histogram = Histogram(bounds=(0.001, 0.01, 0.1))
+        for seconds in [0.0005] * 90 + [0.005] * 9 + [0.5]:
+            histogram.record(seconds)
+        self.assertEqual(histogram.percentile(50), 0.001)
+        self.assertEqual(histogram.percentile(95), 0.01)
+        self.assertEqual(histogram.percentile(100), 0.5)
+        summary = histogram.summary('queue')
+        self.assertAlmostEqual(summary['queue_ms_max'], 500)
+        self.assertEqual(Histogram().percentile(95), 0.0)
+
+class TestPipelineMetrics(unittest.TestCase):
+    def test_reader_stages(self):
+        """Test that the reader times parsing and delivery and the GUI side queueing"""
+        reader = SerialReader('/dev/null')
+        reader.metrics = PipelineMetrics()
+        delivered = []
+        reader.samplesReady.connect(delivered.append)
+        reader.handleLines([b'1\r', b'2\r', b'bpm60\r'], time.monotonic())
+        reader.batchDelivered(delivered[0])
+        stats = reader.metrics.stats()
+        self.assertEqual((reader.metrics.parse.count, reader.metrics.deliver.count, reader.metrics.queue.count),
+                         (1, 1, 1))
+        self.assertEqual(reader.metrics.parsed_lines, 3)
+        self.assertGreater(stats['parse_us_per_line_mean'], 0)
+        self.assertEqual(stats['queue_depth_max'], 1)
+
+    def test_percentiles_aggregate_as_worst_device(self):
+        """Test that per-device percentiles combine to the maximum, not the sum"""
+        combined = aggregateStats([{'queue_ms_p95': 4.0, 'bytes_read': 10}, {'queue_ms_p95': 9.0, 'bytes_read': 5}])
+        self.assertEqual(combined, {'queue_ms_p95': 9.0, 'bytes_read': 15})
+
+    def test_means_skip_devices_without_data(self):
+        """Test that a device with nothing counted yet does not pull the mean towards 0"""
+        combined = aggregateStats([{'delivery_ms_mean': 12.0, 'samples_read': 500},
+                                   {'delivery_ms_mean': 0.0, 'samples_read': 0},
+                                   {'session_state': 'reconnecting', 'session_errors': 1},
+                                   {'delivery_ms_mean': 20.0, 'samples_read': 300}])
+        self.assertEqual(combined, {'delivery_ms_mean': 16.0, 'samples_read': 800, 'session_errors': 1})
+        self.assertEqual(aggregateStats([{'delivery_ms_mean': 0.0}]), {'delivery_ms_mean': 0})
+
+class TestStackSampler(unittest.TestCase):
+    def test_folded_stacks(self):
+        """Test that a busy thread shows up under its name in the folded stacks"""
+        stop = threading.Event()
+
+        def spin():
+            while not stop.is_set():
+                pass
+
+        worker = threading.Thread(target=spin, name='busy worker')
+        sampler = StackSampler(interval=0.001)
+        worker.start()
+        sampler.start()
+        time.sleep(0.1)
+        sampler.stop()
+        stop.set()
+        worker.join()
+        self.assertGreater(sampler.samples, 0)
+        self.assertTrue(any(stack.startswith('busy worker;') and 'spin (test_instrumentation.py:' in stack
+                            for stack in sampler.stacks))
+
+if __name__ == '__main__':
+    unittest.main()
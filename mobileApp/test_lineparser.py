@@ -0,0 +1,32 @@
+import unittest
+from lineparser import LineParser
+from protocol import CHANNEL_ECG, TAG_BPM, TAG_BREATH, TAG_ERROR, TAG_HUMIDITY
+
+class TestLineParser(unittest.TestCase):
+    def test_numeric_chunk(self):
+        """Test that a chunk of plain samples comes back as one float array"""
+        parser = LineParser()
+        samples, records = parser.parse([b'2048\r', b'2049\r', b'-3\r'])
+        self.assertEqual(samples[CHANNEL_ECG].dtype.kind, 'f')
+        self.assertEqual(samples[CHANNEL_ECG].tolist(), [2048.0, 2049.0, -3.0])
+        self.assertEqual(records, [])
+        self.assertEqual(parser.lines, 3)
+
+    def test_records_between_samples(self):
+        """Test that records are dispatched and samples around them kept in order"""
+        parser = LineParser()
+        lines = [b'1\r', b'bpm66\r', b'noBreath\r', b'hum612\r', b'', b'\r', 'Ошибка датчика\r'.encode(), b'2\r', b'bpmX']
+        samples, records = parser.parse(lines)
+        self.assertEqual(samples[CHANNEL_ECG].tolist(), [1.0, 2.0])
+        self.assertEqual(records, [(TAG_BPM, 66), (TAG_BREATH, 0), (TAG_HUMIDITY, 612), (TAG_ERROR, 0)])
+        self.assertEqual(parser.bad_lines, 1)
+
+    def test_corrupt_lines(self):
+        """Test that garbage and invalid UTF-8 are counted, not raised"""
+        parser = LineParser()
+        samples, _ = parser.parse([b'20\xff48', b'12', b'4:', b'1\x002'])
+        self.assertEqual(samples[CHANNEL_ECG].tolist(), [12.0])
+        self.assertEqual(parser.bad_lines, 3)
+
+if __name__ == '__main__':
+    unittest.main()
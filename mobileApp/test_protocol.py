@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+from protocol import CHANNEL_ECG, CHANNEL_PPG, FrameDecoder, TAG_BPM, TAG_BREATH, encodeFrame
+
+class TestFrameDecoder(unittest.TestCase):
+    def test_round_trip(self):
+        """Test that samples and records survive encoding and decoding"""
+        decoder = FrameDecoder()
+        frame = encodeFrame(7, [1, -2, 4095], [(TAG_BPM, 72), (TAG_BREATH, 1)])
+        samples, records = decoder.feed(frame)
+        np.testing.assert_array_equal(samples, [1, -2, 4095])
+        self.assertEqual(records, [(TAG_BPM, 72), (TAG_BREATH, 1)])
+        self.assertEqual(decoder.pending(), 0)
+    
+    def test_split_chunks_and_leading_text(self):
+        """Test that frames split across reads and leftover ASCII are handled"""
+        decoder = FrameDecoder()
+        stream = b'2048\r\nok mode bin\r\n' + b''.join(encodeFrame(i, range(i * 10, i * 10 + 10)) for i in range(5))
+        collected = []
+        for start in range(0, len(stream), 7):
+            samples, _ = decoder.feed(stream[start:start + 7])
+            collected.extend(samples.tolist())
+        self.assertEqual(collected, list(range(50)))
+        self.assertEqual(decoder.frames, 5)
+        self.assertEqual(decoder.lost_frames, 0)
+    
+    def test_corrupt_frame_is_rejected(self):
+        """Test that a CRC mismatch drops the frame and the stream resynchronises"""
+        decoder = FrameDecoder()
+        bad = bytearray(encodeFrame(0, [1, 2, 3]))
+        bad[7] ^= 0xFF
+        samples, _ = decoder.feed(bytes(bad) + encodeFrame(1, [4, 5]))
+        self.assertEqual(samples.tolist(), [4, 5])
+        self.assertEqual(decoder.crc_errors, 1)
+    
+    def test_sequence_gap_counts_lost_samples(self):
+        """Test that missing sequence numbers are reported as lost samples"""
+        decoder = FrameDecoder()
+        decoder.feed(encodeFrame(65534, [0] * 10))
+        decoder.feed(encodeFrame(2, [0] * 10))  # 65535, 0 and 1 are missing
+        self.assertEqual(decoder.lost_frames, 3)
+        self.assertEqual(decoder.lost_samples, 30)
+    
+    def test_channel_frames(self):
+        """Test that frames of other channels are split out by channel number"""
+        decoder = FrameDecoder()
+        stream = (encodeFrame(0, [1, 2]) + encodeFrame(1, [500, 501, 502], channel=CHANNEL_PPG)
+                  + encodeFrame(2, [3], [(TAG_BPM, 60)]))
+        channels, records = decoder.feedChannels(stream[:9])
+        self.assertEqual(channels, {})
+        channels, records = decoder.feedChannels(stream[9:])
+        self.assertEqual(sorted(channels), [CHANNEL_ECG, CHANNEL_PPG])
+        self.assertEqual(channels[CHANNEL_ECG].tolist(), [1, 2, 3])
+        self.assertEqual(channels[CHANNEL_PPG].tolist(), [500, 501, 502])
+        self.assertEqual(records, [(TAG_BPM, 60)])
+        self.assertEqual(decoder.lost_frames, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+from qrs import QRSDetector
+from replay import SyntheticECG
+
+class TestQRSDetector(unittest.TestCase):
+    def detect(self, heart_rate, batch=25, seconds=30, wander=0.0):
+        """Run the detector over a synthetic ECG in small batches"""
+        samples, _ = SyntheticECG(heart_rate=heart_rate, noise=15, seed=3).read(seconds * 100)
+        samples = samples + wander * np.sin(2 * np.pi * 0.3 * np.arange(len(samples)) / 100)
+        detector = QRSDetector(100)
+        beats = []
+        for start in range(0, len(samples), batch):
+            beats.extend(detector.process(samples[start:start + batch]))
+        return detector, beats
+    
+    def test_heart_rate(self):
+        """Test that the rolling heart rate matches the synthetic rate"""
+        for heart_rate in (50, 72, 150):
+            detector, beats = self.detect(heart_rate)
+            self.assertAlmostEqual(detector.heart_rate, heart_rate, delta=3)
+            # Every beat after the 2 s learning phase is found
+            self.assertGreaterEqual(len(beats), int((30 - 3) * heart_rate / 60))
+    
+    def test_rr_intervals(self):
+        """Test that RR intervals are reported beat to beat"""
+        _, beats = self.detect(60, batch=7, wander=300)
+        intervals = [beat.rr for beat in beats if beat.rr is not None]
+        self.assertTrue(intervals)
+        for rr in intervals:
+            self.assertAlmostEqual(rr, 1.0, delta=0.05)
+
+if __name__ == '__main__':
+    unittest.main()
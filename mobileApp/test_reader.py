@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+from reader import SampleBatch, SerialReader
+
+class TestBackpressure(unittest.TestCase):
+    def test_batches_held_back_while_gui_is_behind(self):
+        """Test that batches are merged instead of dropped and only the oldest overflow is lost"""
+        reader = SerialReader('/dev/null')
+        reader.max_pending_batches = 1
+        reader.max_backlog_samples = 5
+        delivered = []
+        reader.samplesReady.connect(delivered.append)
+        for start in range(0, 12, 3):
+            reader.deliverSamples(SampleBatch(np.arange(start, start + 3), 1.0))
+        self.assertEqual([batch.samples.tolist() for batch in delivered], [[0, 1, 2]])
+        reader.batchDelivered(delivered[0])
+        reader.deliverSamples(SampleBatch(np.arange(12, 14), 2.0))
+        self.assertEqual(delivered[1].samples.tolist(), [9, 10, 11, 12, 13])
+        self.assertEqual(delivered[1].read_time, 1.0)
+        self.assertEqual(reader.dropped_samples, 6)
+
+class StoppingRecorder:
+    """Recorder whose recording is stopped from the GUI thread during its first write"""
+    def __init__(self, reader):
+        self.reader = reader
+        self.batches = []
+
+    def writeSamples(self, samples, timestamp=None):
+        self.batches.append(list(samples))
+        self.reader.recorder = None
+
+class TestRecorderHandover(unittest.TestCase):
+    def test_recorder_detached_mid_batch(self):
+        """Test that a recorder cleared while a batch is being recorded still gets that batch"""
+        reader = SerialReader('/dev/null')
+        reader.await_recorder = True
+        reader.deliverSamples(SampleBatch(np.arange(3), 1.0))
+        recorder = reader.recorder = StoppingRecorder(reader)
+        reader.deliverSamples(SampleBatch(np.arange(3, 5), 2.0))
+        self.assertEqual(recorder.batches, [[0, 1, 2], [3, 4]])
+        self.assertIsNone(reader.recorder)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from recording import BLOCK_BPM, BLOCK_SAMPLES, SessionReader, SessionWriter
+
+class TestSessionRecording(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'session.crdg')
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def test_round_trip(self):
+        """Test that samples and events written are read back in order"""
+        writer = SessionWriter(self.path, 100)
+        values = np.arange(3 * BLOCK_SAMPLES + 17) % 4096
+        for start in range(0, len(values), 10):
+            writer.writeSamples(values[start:start + 10])
+            if start == 500:
+                writer.writeEvent(BLOCK_BPM, 72)
+        writer.close()
+        
+        with SessionReader(self.path) as reader:
+            self.assertEqual(reader.sample_rate, 100)
+            self.assertEqual(len(reader), len(values))
+            np.testing.assert_array_equal(reader.samples(), values)
+            np.testing.assert_array_equal(reader.samples(1000, 2100), values[1000:2100])
+            self.assertEqual(len(reader.events), 1)
+            kind, sample_number, _, value = reader.events[0]
+            self.assertEqual((kind, sample_number, value), (BLOCK_BPM, 510, 72))
+    
+    def test_truncated_block_is_ignored(self):
+        """Test that a block cut short by a crash does not break reading"""
+        writer = SessionWriter(self.path, 100)
+        writer.writeSamples(np.arange(100))
+        writer.close()
+        with open(self.path, 'ab') as f:
+            f.write(b'\x01\x00\x00\x00\xff\x00\x00\x00')
+        with SessionReader(self.path) as reader:
+            self.assertEqual(len(reader), 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+from ringbuffer import RingBuffer
+
+class TestRingBuffer(unittest.TestCase):
+    def test_append_keeps_newest_values(self):
+        """Test that appending past capacity drops the oldest values"""
+        buffer = RingBuffer(4)
+        for value in range(10):
+            buffer.append(value)
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(list(buffer.view()), [6, 7, 8, 9])
+        self.assertEqual(buffer.total_written, 10)
+    
+    def test_extend_matches_append(self):
+        """Test that bulk appends wrap exactly like single appends"""
+        single = RingBuffer(7)
+        bulk = RingBuffer(7)
+        values = np.arange(40, dtype=float)
+        for start, stop in [(0, 3), (3, 9), (9, 10), (10, 30), (30, 40)]:
+            bulk.extend(values[start:stop])
+            for value in values[start:stop]:
+                single.append(value)
+            np.testing.assert_array_equal(bulk.view(), single.view())
+    
+    def test_view_is_zero_copy_and_read_only(self):
+        """Test that views share memory with the buffer and cannot be written"""
+        buffer = RingBuffer(5)
+        buffer.extend([1, 2, 3, 4, 5, 6, 7])
+        view = buffer.view()
+        self.assertTrue(np.shares_memory(view, buffer._data))
+        with self.assertRaises(ValueError):
+            view[0] = 0
+        self.assertEqual(list(buffer.last(2)), [6, 7])
+    
+    def test_running_min_max(self):
+        """Test that min/max follow values entering and leaving the window"""
+        buffer = RingBuffer(3)
+        buffer.extend([5, 1, 9])
+        self.assertEqual((buffer.min(), buffer.max()), (1, 9))
+        buffer.append(4)  # 5 leaves
+        self.assertEqual((buffer.min(), buffer.max()), (1, 9))
+        buffer.append(4)  # 1 leaves
+        self.assertEqual((buffer.min(), buffer.max()), (4, 9))
+        buffer.append(2)  # 9 leaves
+        self.assertEqual((buffer.min(), buffer.max()), (2, 4))
+    
+    def test_extend_keeps_extremes_in_window(self):
+        """Test that batches evicting only non-extreme values never trigger a rescan"""
+        buffer = RingBuffer(10)
+        rescans = []
+        rescan = buffer._rescan
+        buffer._rescan = lambda: rescans.append(rescan())
+        buffer.extend([5, 5, 5, 0, 5, 5, 9, 5, 5, 5])
+        self.assertEqual((buffer.min(), buffer.max()), (0, 9))
+        self.assertEqual(rescans, [])
+        buffer.extend([5, 5])  # Full; two 5s leave
+        buffer.extend([6])
+        self.assertEqual((buffer.min(), buffer.max()), (0, 9))
+        self.assertEqual(rescans, [])
+        buffer.extend([7])  # 0 leaves
+        self.assertEqual((buffer.min(), buffer.max()), (5, 9))
+        self.assertEqual(len(rescans), 1)
+        buffer.extend([5, 5, 5])  # 9 leaves with the 5s around it
+        self.assertEqual((buffer.min(), buffer.max()), (5, 7))
+        self.assertEqual(len(rescans), 2)
+
+    def test_clear(self):
+        """Test that clear empties the buffer"""
+        buffer = RingBuffer(3)
+        buffer.extend([1, 2])
+        buffer.clear()
+        self.assertEqual(len(buffer), 0)
+        with self.assertRaises(ValueError):
+            buffer.min()
+
+if __name__ == '__main__':
+    unittest.main()
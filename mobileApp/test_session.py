@@ -0,0 +1,198 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from PyQt5.QtWidgets import QApplication
+from recording import SessionReader
+from replay import PtyBridge, ReplayStream, SyntheticECG
+from session import CONNECTING, FAILED, RECONNECTING, SEARCHING, STREAMING, DeviceManager, DeviceSession
+from sources import SocketSource
+
+class TestDeviceSession(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def waitFor(self, condition, timeout=5.0):
+        """Run the event loop until condition() holds"""
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_replug_resumes_recording(self):
+        """Test that unplugging and replugging continues the same session file"""
+        bridge = PtyBridge(ReplayStream(SyntheticECG(seed=0), speed=2.0, timeout=0.01))
+        directory = tempfile.TemporaryDirectory()
+        session = DeviceSession()
+        session.baud_candidates = ()  # A pty has no line rate to negotiate
+        session.serial_protocol = 'ascii'
+        session.recordings_dir = directory.name
+        states = []
+        session.stateChanged.connect(lambda state, message: states.append(state))
+        session.start()
+        # Play discovery: the port appears, vanishes and comes back
+        session.onPortsChanged([bridge.port])
+        self.waitFor(lambda: session.state == STREAMING)
+        recorder = session.recorder
+        session.onPortsChanged([])
+        self.assertEqual(session.state, RECONNECTING)
+        self.assertIsNone(session.reader)
+        session.onPortsChanged([bridge.port])
+        self.waitFor(lambda: session.state == STREAMING)
+        self.assertIs(session.recorder, recorder)
+        self.assertEqual(session.resumes, 1)
+        session.close()
+        bridge.close()
+        self.assertEqual(states, [SEARCHING, CONNECTING, STREAMING, RECONNECTING, CONNECTING, STREAMING, 'closed'])
+        files = os.listdir(directory.name)
+        self.assertEqual(len(files), 1)
+        with SessionReader(os.path.join(directory.name, files[0])) as reader:
+            self.assertEqual(len(reader), recorder.samples_written)
+            self.assertGreater(len(reader), 0)
+        directory.cleanup()
+
+    def test_silent_device_is_retried(self):
+        """Test that a link that never sends samples fails and is then opened again"""
+        server = socket.create_server(('127.0.0.1', 0))  # Accepts via the backlog, never sends
+        session = DeviceSession(data_source=SocketSource('127.0.0.1', server.getsockname()[1]))
+        # The firmware calibrates for 15 s after power-up before the first sample
+        self.assertGreater(session.connect_timeout, 15)
+        session.record_sessions = False
+        session.connect_timeout = 0.3
+        session.retry_interval = 0.1
+        session.start()
+        self.assertEqual(session.state, CONNECTING)
+        self.waitFor(lambda: session.state == FAILED)
+        self.assertIsNone(session.reader)
+        self.waitFor(lambda: session.state == CONNECTING)
+        self.assertEqual(session.readers_started, 2)
+        session.close()
+        server.close()
+
+    def test_new_recording_after_resume_deadline(self):
+        """Test that a reader outliving its recording writes into a new one once data flows again"""
+        server = socket.create_server(('127.0.0.1', 0))
+        resume = threading.Event()
+
+        def serve():
+            connection, _ = server.accept()
+            connection.sendall(b''.join(b'%d\r\n' % value for value in range(50)))
+            connection.close()
+            # The reader reconnects at once; the backlog holds it until resume
+            resume.wait()
+            connection, _ = server.accept()
+            connection.sendall(b''.join(b'%d\r\n' % value for value in range(50, 100)))
+            resume.clear()
+            resume.wait()
+            connection.close()
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        directory = tempfile.TemporaryDirectory()
+        session = DeviceSession(data_source=SocketSource('127.0.0.1', server.getsockname()[1]))
+        session.recordings_dir = directory.name
+        session.resume_timeout = 0.3
+        states = []
+        session.stateChanged.connect(lambda state, message: states.append(state))
+        session.start()
+        first = session.recorder
+        self.waitFor(lambda: RECONNECTING in states)
+        self.waitFor(lambda: session.recorder is None)
+        self.assertIsNotNone(session.reader)
+        self.assertIsNone(session.reader.recorder)
+        self.assertTrue(first.closed)
+        resume.set()
+        self.waitFor(lambda: session.state == STREAMING)
+        second = session.recorder
+        self.assertIsNotNone(second)
+        self.assertIs(session.reader.recorder, second)
+        session.close()  # Writes whatever the reader still held for the new recording
+        resume.set()
+        thread.join(timeout=5)
+        server.close()
+        self.assertEqual(states[:3], [CONNECTING, STREAMING, RECONNECTING])
+        self.assertEqual(first.samples_written, 50)
+        self.assertEqual(second.samples_written, 50)
+        directory.cleanup()
+
+    def test_sessions_started_together_record_apart(self):
+        """Test that sessions starting in the same second never share or overwrite a file"""
+        directory = tempfile.TemporaryDirectory()
+        sessions = [DeviceSession(port=port) for port in ('/dev/ttyUSB0', '/dev/ttyUSB1', None, None)]
+        for count, session in enumerate(sessions, 1):
+            session.recordings_dir = directory.name
+            session.startRecording()
+            session.recorder.writeSamples(range(count))
+        for session in sessions:
+            session.stopRecording()
+        paths = sorted(os.path.join(directory.name, name) for name in os.listdir(directory.name))
+        self.assertEqual(len(paths), 4)
+        self.assertTrue(any('ttyUSB1' in path for path in paths))
+        lengths = []
+        for path in paths:
+            with SessionReader(path) as reader:
+                lengths.append(len(reader))
+        self.assertEqual(sorted(lengths), [1, 2, 3, 4])
+        directory.cleanup()
+
+    def test_recording_error_is_reported(self):
+        """Test that a recording that cannot be opened reaches the window instead of stdout"""
+        directory = tempfile.TemporaryDirectory()
+        session = DeviceSession(port='/dev/ttyUSB0')
+        session.recordings_dir = os.path.join(directory.name, 'file')
+        open(session.recordings_dir, 'w').close()  # A file where the directory should be
+        errors = []
+        session.errorOccurred.connect(errors.append)
+        session.startRecording()
+        self.assertIsNone(session.recorder)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith('запись не начата'))
+        self.assertEqual((session.errors, session.last_error), (1, errors[0]))
+        directory.cleanup()
+
+class TestDeviceManager(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_one_session_per_port(self):
+        """Test that every ESP32 port gets its own session and reader thread"""
+        bridges = [PtyBridge(ReplayStream(SyntheticECG(seed=seed), speed=2.0, timeout=0.01)) for seed in range(2)]
+        manager = DeviceManager()
+        sessions = {}
+
+        def addSession(port):
+            session = DeviceSession(port=port)
+            session.baud_candidates = ()
+            session.serial_protocol = 'ascii'
+            session.record_sessions = False
+            session.start()
+            sessions[port] = session
+            manager.addSession(session)
+
+        manager.portAdded.connect(addSession)
+        ports = [bridge.port for bridge in bridges]
+        manager.onPortsChanged(ports)
+        manager.onPortsChanged(ports)  # Known ports are not announced again
+        self.assertEqual(sorted(sessions), sorted(ports))
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and any(s.state != STREAMING for s in sessions.values()):
+            self.app.processEvents()
+            time.sleep(0.01)
+        self.assertEqual({s.state for s in sessions.values()}, {STREAMING})
+        self.assertIsNot(sessions[ports[0]].reader, sessions[ports[1]].reader)
+        # Unplugging one board leaves the other streaming
+        manager.onPortsChanged(ports[1:])
+        self.assertEqual(sessions[ports[0]].state, RECONNECTING)
+        self.assertEqual(sessions[ports[1]].state, STREAMING)
+        for session in sessions.values():
+            session.close()
+        for bridge in bridges:
+            bridge.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import socket
+import threading
+import unittest
+from reader import SerialReader
+from sources import SocketSource, SocketStream
+
+class LineServer:
+    """Local TCP stand-in for the firmware's Bluetooth link
+
+    Serves one payload per accepted connection and then hangs up.
+    """
+    def __init__(self, payloads):
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.port = self.server.getsockname()[1]
+        self.payloads = list(payloads)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        for payload in self.payloads:
+            connection, _ = self.server.accept()
+            connection.sendall(payload)
+            connection.close()
+
+    def close(self):
+        self.thread.join(timeout=5)
+        self.server.close()
+
+class HangUpServer:
+    """Accepts every connection and closes it at once, like a bridge whose device is missing"""
+    def __init__(self):
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.server.settimeout(0.1)
+        self.port = self.server.getsockname()[1]
+        self.accepted = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            try:
+                connection, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            self.accepted += 1
+            connection.close()
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=5)
+        self.server.close()
+
+class TestSocketStream(unittest.TestCase):
+    def test_read_then_closed(self):
+        """Test that buffered bytes are read in bulk before the hang-up is reported"""
+        left, right = socket.socketpair()
+        stream = SocketStream(left, timeout=0.05)
+        self.assertEqual(stream.read(1), b'')  # Timeout without data
+        right.sendall(b'2048\r\n2049\r\n')
+        right.close()
+        data = stream.read(1)
+        data += stream.read(stream.in_waiting)
+        self.assertEqual(data, b'2048\r\n2049\r\n')
+        with self.assertRaises(ConnectionError):
+            stream.read(1)
+        stream.close()
+
+class TestReconnect(unittest.TestCase):
+    def test_reader_reconnects_after_hang_up(self):
+        """Test that the reader reopens a dropped socket and keeps parsing"""
+        server = LineServer([b'100\r\n101\r\nbpm60\r\n', b'102\r\n103\r\n'])
+        reader = SerialReader(source=SocketSource('127.0.0.1', server.port))
+        reader.reconnect_delay = 0.01
+        samples = []
+        def collect(batch):
+            reader.batchDelivered(batch)
+            samples.extend(batch.samples)
+            if len(samples) >= 4:
+                reader.stop()
+        reader.samplesReady.connect(collect)
+        reader.run()  # In this thread, so signals are delivered directly
+        server.close()
+        self.assertEqual(samples, [100, 101, 102, 103])
+        self.assertEqual(reader.reconnects, 1)
+        self.assertFalse(reader.binary_active)
+
+    def test_back_off_after_immediate_hang_up(self):
+        """Test that a peer that hangs up before sending anything is redialled with growing delays"""
+        server = HangUpServer()
+        reader = SerialReader(source=SocketSource('127.0.0.1', server.port))
+        reader.reconnect_delay = 0.05
+        stopper = threading.Timer(0.6, reader.stop)
+        stopper.start()
+        reader.run()  # Waits 0.05, 0.1, 0.2, 0.4 s between attempts
+        stopper.join()
+        server.close()
+        self.assertGreaterEqual(reader.reconnects, 2)
+        self.assertLessEqual(reader.reconnects, 5)
+        self.assertEqual(reader.bytes_read, 0)
+
+if __name__ == '__main__':
+    unittest.main()
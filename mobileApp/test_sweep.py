@@ -0,0 +1,53 @@
+import sys
+import unittest
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+from graph import GraphWidget
+from sweep import sweepSpans
+
+class TestSweepSpans(unittest.TestCase):
+    def test_wraps_at_right_edge(self):
+        """Test that a run past the last slot continues from the left edge"""
+        self.assertEqual(sweepSpans(2, 5, 10, 100), [(20, 50)])
+        self.assertEqual(sweepSpans(18, 23, 10, 100), [(80, 100), (0, 30)])
+        # More samples than the sweep holds cover it once
+        self.assertEqual(sweepSpans(5, 40, 10, 100), [(50, 100), (0, 50)])
+
+class TestSweepMode(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+
+    def setUp(self):
+        self.graph = GraphWidget(sample_rate=100, window_seconds=5)
+        self.graph.resize(570, 300)
+        self.graph.setDisplayMode('sweep')
+        self.signal = 1000 + 300 * np.sin(np.arange(2000) / 8)
+
+    def test_new_samples_repaint_a_strip(self):
+        """Test that after the first frame only the columns of new samples and the gap change"""
+        self.graph.addSamples(self.signal[:300])
+        self.assertIsNone(self.graph.sweep.advance(self.graph))
+        self.graph.addSamples(self.signal[300:302])
+        region = self.graph.sweep.advance(self.graph).boundingRect()
+        left, top, width, height = self.graph.graphRect()
+        self.assertLess(region.width(), width // 10)
+        self.assertEqual((region.top(), region.height()), (top, height))
+        self.assertTrue(self.graph.sweep.advance(self.graph).isEmpty())
+
+    def test_clear_and_window_change_restart(self):
+        """Test that cleared or resized buffers are redrawn from scratch"""
+        self.graph.addSamples(self.signal[:600])
+        self.graph.sweep.advance(self.graph)
+        self.graph.clearData()
+        self.graph.addSamples(self.signal[:3])
+        self.graph.sweep.advance(self.graph)
+        self.assertEqual(self.graph.sweep.lanes[0].drawn, 3)
+        self.graph.setWindowSeconds(10)
+        self.graph.sweep.advance(self.graph)
+        self.assertIs(self.graph.sweep.lanes[0].data, self.graph.data)
+        with self.assertRaises(ValueError):
+            self.graph.setDisplayMode('strip')
+
+if __name__ == '__main__':
+    unittest.main()
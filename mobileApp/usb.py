@@ -1,22 +1,47 @@
+import math
+import os
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel
+import time
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QGridLayout, QLabel, QShortcut
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPainter, QPen, QColor, QFont
-import serial
-import serial.tools.list_ports
+from PyQt5.QtGui import QKeySequence
+from session import CONNECTING, FAILED, RECONNECTING, SEARCHING, STREAMING, DeviceManager, DeviceSession
+from channels import WAVEFORM, defaultChannels
+from analysis import AnalysisPool, SharedRing
+from breathing import BreathDetector
+from instrumentation import Instrumentation, MetricsLog, PipelineMetrics, StackSampler
+from link import RateMeter
+from ringbuffer import RingBuffer
+from graph import GraphWidget, Trace, createGraphWidget  # GraphWidget and Trace are also used from here
+from protocol import CHANNEL_BREATH, CHANNEL_ECG, CHANNEL_HUMIDITY
+
+# Breath channel value -> (label text, colour)
+BREATH_LABELS = {
+    1: ('Есть дыхание', 'green'),
+    0: ('Нет дыхания', 'red'),
+    None: ('Ожидание данных о дыхании...', '#666'),
+}
 
 class USBConnectionWindow(QMainWindow):
-    def __init__(self, main_window=None, choose_connect_window=None, selected_signals=None):
+    def __init__(self, main_window=None, choose_connect_window=None, selected_signals=None, data_source=None,
+                 instrumentation=None, renderer='software', display_mode='scroll'):
         super().__init__()
         self.main_window = main_window
         self.choose_connect_window = choose_connect_window
         self.selected_signals = selected_signals or set()  # Store selected signals
-        self.esp32_connected = False
-        self.serial_connection = None
-        self.data_buffer = []
-        self.pulse_value = 0  # Store the current pulse value
-        self.last_breath_status = None  # Track breath status
+        self.data_source = data_source  # DataSource to use instead of detected ESP32s (replay, tests)
+        self.instrumentation = instrumentation or Instrumentation()  # Pipeline metrics, overlay, log, profiling
+        self.renderer = renderer  # Graph renderer of new panels: 'software', 'opengl' or 'auto'
+        self.display_mode = display_mode  # 'scroll', or 'sweep' like a bedside monitor
+        self.manager = None  # DeviceManager that reports every connected ESP32
+        self.panels = []  # One DevicePanel per device, in grid order
+        self.analysis = AnalysisPool(self)  # Worker processes shared by every panel
+        self.rate_meter = RateMeter()
+        self.overlay_visible = self.instrumentation.overlay
+        self.metrics_log = None
+        self.stack_sampler = None
         self.initUI()
+        self.startInstrumentation()
         self.startConnectionDetection()
     
     def initUI(self):
@@ -35,300 +60,582 @@ class USBConnectionWindow(QMainWindow):
         main_layout.setContentsMargins(30, 30, 30, 30)
         central_widget.setLayout(main_layout)
         
-        # Create status label
+        # Create status label, shown while no device is connected
         self.status_label = QLabel('Подключите устройство')
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setStyleSheet("font-size: 18px; color: #666;")
         main_layout.addWidget(self.status_label)
         
+        # Grid of device panels, one per cardiograph
+        self.grid_layout = QGridLayout()
+        self.grid_layout.setSpacing(20)
+        main_layout.addLayout(self.grid_layout, 1)
+        
+        # Create summary label (devices, total throughput and delivery latency)
+        self.summary_label = QLabel('')
+        self.summary_label.setAlignment(Qt.AlignRight)
+        self.summary_label.setStyleSheet("font-size: 11px; color: #999;")
+        main_layout.addWidget(self.summary_label)
+        self.summary_timer = QTimer(self)
+        self.summary_timer.timeout.connect(self.updateSummary)
+        self.summary_timer.start(1000)
+        
+        # F3 shows or hides the pipeline statistics on every graph
+        self.overlay_shortcut = QShortcut(QKeySequence('F3'), self)
+        self.overlay_shortcut.activated.connect(lambda: self.setOverlayVisible(not self.overlay_visible))
+        # F4 switches the graphs between the software and the OpenGL renderer
+        self.renderer_shortcut = QShortcut(QKeySequence('F4'), self)
+        self.renderer_shortcut.activated.connect(
+            lambda: self.setRenderer('software' if self.renderer in ('opengl', 'auto') else 'opengl'))
+        # F5 switches the graphs between scrolling and a sweeping cursor
+        self.sweep_shortcut = QShortcut(QKeySequence('F5'), self)
+        self.sweep_shortcut.activated.connect(
+            lambda: self.setDisplayMode('scroll' if self.display_mode == 'sweep' else 'sweep'))
+    
+    def startInstrumentation(self):
+        """Start the metrics log and the stack sampler asked for by instrumentation"""
+        if self.instrumentation.log_path is not None:
+            self.metrics_log = MetricsLog(self.instrumentation.log_path, self.metricsSnapshot)
+            self.metrics_log_timer = QTimer(self)
+            self.metrics_log_timer.timeout.connect(self.metrics_log.write)
+            self.metrics_log_timer.start(int(self.instrumentation.log_interval * 1000))
+        if self.instrumentation.profile_dir is not None:
+            os.makedirs(self.instrumentation.profile_dir, exist_ok=True)
+            self.stack_sampler = StackSampler()
+            self.stack_sampler.start()
+    
+    def startConnectionDetection(self):
+        """Show data_source right away, or start watching for ESP32 boards"""
+        if self.data_source is not None:
+            self.addPanel(self.data_source.name, self.data_source)
+            return
+        self.manager = DeviceManager(self)
+        self.manager.portAdded.connect(self.addPanel)
+        self.manager.start()
+    
+    def addPanel(self, port, data_source=None):
+        """Add a tile for a newly found device and start its session"""
+        panel = DevicePanel(self, port, self.selected_signals, data_source, self.analysis, self.renderer)
+        panel.graph_widget.setDisplayMode(self.display_mode)
+        panel.session.profile_dir = self.instrumentation.profile_dir
+        if self.instrumentation.enabled:
+            panel.enableMetrics()
+        panel.setOverlayVisible(self.overlay_visible)
+        panel.session.stateChanged.connect(lambda state, message, panel=panel: self.onPanelState(panel, state))
+        self.panels.append(panel)
+        self.layoutPanels()
+        panel.start()
+        if self.manager is not None:
+            self.manager.addSession(panel.session)
+        return panel
+    
+    def removePanel(self, panel):
+        """Remove the tile of a device that is gone and close its session"""
+        self.panels.remove(panel)
+        if self.manager is not None:
+            self.manager.removeSession(panel.session)
+        panel.stop()
+        self.grid_layout.removeWidget(panel)
+        panel.deleteLater()
+        self.layoutPanels()
+    
+    def onPanelState(self, panel, state):
+        """Drop a discovered device once it did not come back within its resume timeout"""
+        if state == SEARCHING and self.manager is not None and panel.port not in self.manager.ports:
+            self.removePanel(panel)
+    
+    def layoutPanels(self):
+        """Arrange the panels in a near-square grid"""
+        for panel in self.panels:
+            self.grid_layout.removeWidget(panel)
+        columns = max(1, math.ceil(math.sqrt(len(self.panels))))
+        for index, panel in enumerate(self.panels):
+            self.grid_layout.addWidget(panel, index // columns, index % columns)
+        setWidgetVisible(self.status_label, not self.panels)
+    
+    def setRenderer(self, renderer):
+        """Draw every graph with renderer from now on"""
+        self.renderer = renderer
+        for panel in self.panels:
+            panel.setRenderer(renderer)
+    
+    def setDisplayMode(self, mode):
+        """Scroll or sweep every graph from now on"""
+        self.display_mode = mode
+        for panel in self.panels:
+            panel.graph_widget.setDisplayMode(mode)
+    
+    def setOverlayVisible(self, visible):
+        """Show or hide the statistics overlay of every graph"""
+        self.overlay_visible = visible
+        for panel in self.panels:
+            panel.setOverlayVisible(visible)
+    
+    def metricsSnapshot(self):
+        """Totals and per-device statistics for the metrics log"""
+        return {
+            'total': self.readerStats(),
+            'devices': {panel.port: panel.readerStats() for panel in self.panels},
+        }
+    
+    def readerStats(self):
+        """Return ingestion counters summed over every device"""
+        stats = aggregateStats([panel.readerStats() for panel in self.panels])
+        stats['devices'] = len(self.panels)
+        return stats
+    
+    def updateSummary(self):
+        """Show device count, total samples/s and delivery latency"""
+        if not self.panels:
+            self.summary_label.setText('')
+            return
+        stats = self.readerStats()
+        rates = self.rate_meter.update(samples=stats.get('samples_read', 0))
+        if not rates:
+            return
+        self.summary_label.setText(f"Устройств: {len(self.panels)}, {max(rates['samples'], 0):.0f} отсч/с, "
+                                   f"задержка {stats.get('delivery_ms_mean', 0):.0f} мс "
+                                   f"(макс {stats.get('delivery_ms_max', 0):.0f} мс)")
+    
+    def closeEvent(self, event):
+        """Stop background work before the window goes away"""
+        self.summary_timer.stop()
+        if self.metrics_log is not None:
+            self.metrics_log_timer.stop()
+            self.metrics_log.write()
+        if self.stack_sampler is not None:
+            self.stack_sampler.stop()
+            self.stack_sampler.write(os.path.join(self.instrumentation.profile_dir, 'stacks.folded'))
+        if self.manager is not None:
+            self.manager.stop()
+        for panel in self.panels:
+            panel.stop()
+        self.analysis.shutdown()
+        super().closeEvent(event)
+
+class DevicePanel(QWidget):
+    """Status, breath label, graph and link statistics of one device"""
+    def __init__(self, parent=None, port=None, selected_signals=None, data_source=None, analysis=None,
+                 renderer='software'):
+        super().__init__(parent)
+        self.port = port
+        self.renderer = renderer  # Requested graph renderer, see graph.RENDERERS
+        self.selected_signals = selected_signals or set()
+        self.sample_rate = 100  # Firmware sends one ECG sample every 10 ms
+        self.history_seconds = 600  # Keep the last 10 minutes in data_buffer
+        self.display_seconds = 5  # Length of the visible ECG window (30-60 s works too)
+        self.rate_meter = RateMeter()
+        # Every signal the app knows about; selected_signals picks the enabled ones
+        self.channels = defaultChannels(self.sample_rate, self.history_seconds)
+        self.channels.enable(self.selected_signals)
+        # Recent ECG history; bounded so memory stays flat on long recordings
+        self.data_buffer = self.channels.get(CHANNEL_ECG).buffer
+        # Device connection, reader thread and recording; protocol, recording and
+        # filter settings live there
+        self.session = DeviceSession(self, self.channels, data_source, self.sample_rate,
+                                     port=None if data_source is not None else port)
+        # HRV and breathing rate run in the AnalysisPool's processes on a shared copy of the raw ECG
+        self.analysis = analysis
+        self.analysis_seconds = 300  # Window of every analysis; 5 min is the standard short-term HRV length
+        self.min_analysis_seconds = 60  # LF power needs at least this much signal
+        self.analysis_interval = 10  # Seconds between analyses
+        self.analysis_ring = None
+        if analysis is not None:
+            # The margin covers samples that arrive while a worker still reads its window
+            self.analysis_ring = SharedRing((self.analysis_seconds + 60) * self.sample_rate)
+            self.session.analysis_buffer = self.analysis_ring
+        self.metrics = {}  # Latest analysis result
+        self.pipeline_metrics = None  # PipelineMetrics, created by enableMetrics()
+        self.pulse_value = 0  # Store the current pulse value
+        self.heart_rate = None  # Rolling heart rate from the host-side QRS detector
+        self.beat_times = RingBuffer(1000)  # Seconds since connection of recent R peaks
+        self.rr_intervals = RingBuffer(1000)  # Recent RR intervals in seconds
+        self.last_breath_status = None  # Latest breath channel value, None until one arrives
+        # Breaths found in the humidity stream; once it has a verdict the firmware's 15 s one is ignored
+        self.breath_detector = BreathDetector(self.channels.get(CHANNEL_HUMIDITY).sample_rate)
+        self.breath_label_state = None  # (text, colour) currently shown in breath_label
+        self.initUI()
+        self.connectChannels()
+        self.connectSession()
+    
+    def initUI(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        # Create status label
+        self.status_label = QLabel('Подключение...')
+        self.status_label.setAlignment(Qt.AlignCenter)
+        self.status_label.setStyleSheet("font-size: 18px; color: #666;")
+        layout.addWidget(self.status_label)
+        
         # Create breath status label (initially hidden)
         self.breath_label = QLabel('Ожидание данных о дыхании...')
         self.breath_label.setAlignment(Qt.AlignCenter)
         self.breath_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #666;")
         self.breath_label.setVisible(False)
-        main_layout.addWidget(self.breath_label)
+        layout.addWidget(self.breath_label)
         
         # Create graph display area
-        self.graph_widget = GraphWidget(self)
+        self.graph_widget = createGraphWidget(self.renderer, self, self.sample_rate, self.display_seconds)
         self.graph_widget.setVisible(False)  # Hidden by default
-        main_layout.addWidget(self.graph_widget)
-    
-    def startConnectionDetection(self):
-        """Start periodic checking for ESP32 connection"""
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.checkForESP32)
-        self.timer.start(2000)  # Check every 2 seconds
-        self.checkForESP32()  # Initial check
-    
-    def checkForESP32(self):
-        """Check for connected ESP32 devices"""
-        esp32_found = self.detectESP32()
+        layout.addWidget(self.graph_widget, 1)
+        self.watchGraph()
+        
+        # Create HRV/breathing rate label (hidden until the first analysis)
+        self.analysis_label = QLabel('')
+        self.analysis_label.setAlignment(Qt.AlignCenter)
+        self.analysis_label.setStyleSheet("font-size: 14px; color: #333;")
+        self.analysis_label.setVisible(False)
+        layout.addWidget(self.analysis_label)
         
-        if esp32_found and not self.esp32_connected:
-            # ESP32 just got connected
-            self.esp32_connected = True
-            self.status_label.setVisible(False)  # Hide the status label
-            # Show graph display area only if ECG is selected
-            if 'ЭКГ' in self.selected_signals:
-                self.graph_widget.setVisible(True)
-            # Start reading data
-            self.startDataReading()
-        elif not esp32_found and self.esp32_connected:
-            # ESP32 was disconnected
-            self.esp32_connected = False
+        # Create error label (latest problem of this device, hidden until there is one)
+        self.error_label = QLabel('')
+        self.error_label.setAlignment(Qt.AlignCenter)
+        self.error_label.setStyleSheet("font-size: 11px; color: #c00;")
+        self.error_label.setVisible(False)
+        layout.addWidget(self.error_label)
+        
+        # Create link statistics label (speed and throughput of the serial link)
+        self.link_label = QLabel('')
+        self.link_label.setAlignment(Qt.AlignRight)
+        self.link_label.setStyleSheet("font-size: 11px; color: #999;")
+        layout.addWidget(self.link_label)
+    
+    def connectChannels(self):
+        """Route every enabled channel to the widgets that show it"""
+        waveforms = self.channels.enabledChannels(WAVEFORM)
+        self.graph_widget.setChannels(waveforms)
+        for channel in waveforms:
+            channel.subscribe(self.onWaveform)
+        self.channels.get(CHANNEL_BREATH).subscribe(self.onBreathStatus)
+        self.channels.get(CHANNEL_HUMIDITY).subscribe(self.onHumidity)
+    
+    def onWaveform(self, channel, values):
+        """Waveform channel consumer: forward to whichever graph widget is current"""
+        self.graph_widget.onChannelData(channel, values)
+    
+    def setRenderer(self, renderer):
+        """Switch the graph to another renderer at runtime, keeping its lanes and readings
+
+        Returns the renderer in use, which is 'software' when OpenGL does not work here.
+        """
+        self.renderer = renderer
+        old = self.graph_widget
+        graph = createGraphWidget(renderer, self, self.sample_rate, self.display_seconds)
+        if graph.renderer == old.renderer:
+            graph.deleteLater()
+            return old.renderer
+        graph.takeGraph(old)
+        graph.setVisible(not old.isHidden())
+        self.layout().replaceWidget(old, graph)
+        self.graph_widget = graph
+        old.deleteLater()
+        self.watchGraph()
+        return graph.renderer
+    
+    def watchGraph(self):
+        """Fall back to the software renderer if OpenGL fails after all"""
+        if self.graph_widget.renderer == 'opengl':
+            self.graph_widget.renderFailed.connect(self.onRenderFailed)
+    
+    def onRenderFailed(self, message):
+        self.session.reportError(f'OpenGL: {message}; включена программная отрисовка')
+        self.setRenderer('software')
+    
+    def connectSession(self):
+        """Route session state and data to the panel"""
+        self.session.stateChanged.connect(self.onSessionState)
+        self.session.samplesReady.connect(self.onSamplesReady)
+        self.session.pulseReceived.connect(self.onPulseReceived)
+        self.session.breathReceived.connect(self.onBreathReceived)
+        self.session.beatsDetected.connect(self.onBeatsDetected)
+        self.session.errorOccurred.connect(self.onSessionError)
+        # Report link throughput once per second
+        self.link_timer = QTimer(self)
+        self.link_timer.timeout.connect(self.updateLinkStats)
+        self.link_timer.start(1000)
+        if self.analysis is not None:
+            self.analysis.resultReady.connect(self.onAnalysisResult)
+            self.analysis.failed.connect(self.onAnalysisFailed)
+            self.analysis_timer = QTimer(self)
+            self.analysis_timer.timeout.connect(self.requestAnalysis)
+            self.analysis_timer.start(self.analysis_interval * 1000)
+    
+    def start(self):
+        """Start the device session once the event loop runs, so callers can still adjust its settings"""
+        QTimer.singleShot(0, self.session.start)
+    
+    def onSessionState(self, state, message):
+        """Follow the device session: status text, graph visibility and cleared readings"""
+        if state == SEARCHING:
             self.status_label.setVisible(True)  # Show the status label
             self.status_label.setText('Подключите кардиограф')
             self.status_label.setStyleSheet("font-size: 18px; color: #666;")
             # Hide graph display area
             self.graph_widget.setVisible(False)
-            # Stop reading data
-            self.stopDataReading()
-    
-    def detectESP32(self):
-        """Detect if an ESP32 device is connected via USB"""
-        try:
-            # Get list of all available ports
-            ports = serial.tools.list_ports.comports()
-            
-            for port in ports:
-                # Check if the port description or hardware ID contains ESP32 identifiers
-                if any(keyword in port.description.upper() for keyword in ['ESP32', 'CP210', 'CH340', 'FTDI']):
-                    # Try to open the port to confirm it's responsive
-                    try:
-                        ser = serial.Serial(port.device, 9600, timeout=1)
-                        ser.close()
-                        # Store the port for data reading
-                        self.esp32_port = port.device
-                        return True
-                    except (OSError, serial.SerialException):
-                        # Port is busy or not accessible, but it might still be an ESP32
-                        # We'll consider it as found since the description matches
-                        self.esp32_port = port.device
-                        return True
-                
-                # Some ESP32 boards might not have descriptive names
-                # Check common VID/PID combinations for ESP32 boards
-                if any(esp32_id in port.hwid for esp32_id in [
-                    'VID:10C4',  # CP210x USB to UART Bridge
-                    'VID:1A86',  # CH340 USB to Serial
-                    'VID:0403',  # FTDI
-                ]):
-                    self.esp32_port = port.device
-                    return True
-            
-            return False
-        except Exception as e:
-            print(f"Error detecting ESP32: {e}")
-            return False
-    
-    def startDataReading(self):
-        """Start reading data from ESP32"""
-        try:
-            # Open serial connection
-            self.serial_connection = serial.Serial(self.esp32_port, 9600, timeout=1)
-            # Start timer to read data
-            self.data_timer = QTimer(self)
-            self.data_timer.timeout.connect(self.readData)
-            self.data_timer.start(50)  # Read data every 50ms for smoother graph
-        except Exception as e:
-            print(f"Error opening serial connection: {e}")
+            self.clearReadings()
+        elif state == CONNECTING:
+            self.rate_meter = RateMeter()
+            if not self.session.resuming:
+                self.status_label.setVisible(False)  # Hide the status label
+            self.updateSignalVisibility()
+        elif state == STREAMING:
+            self.status_label.setVisible(False)
+            self.updateSignalVisibility()
+        elif state == RECONNECTING:
+            # The graph and the recording stay; the session resumes both
+            self.status_label.setVisible(True)
+            self.status_label.setText('Связь потеряна, переподключение...')
+            self.status_label.setStyleSheet("font-size: 18px; color: #c80;")
+            self.link_label.setText('')
+        elif state == FAILED:
             self.status_label.setVisible(True)  # Show the status label
             self.status_label.setText('Ошибка подключения к устройству')
             self.status_label.setStyleSheet("font-size: 18px; color: red;")
+            self.link_label.setText('')
+    
+    def onSessionError(self, message):
+        """Show the latest problem of the device with the time it happened"""
+        self.error_label.setText(f"{time.strftime('%H:%M:%S')} {message}")
+        setWidgetVisible(self.error_label, True)
     
-    def stopDataReading(self):
-        """Stop reading data from ESP32"""
-        if hasattr(self, 'data_timer') and self.data_timer.isActive():
-            self.data_timer.stop()
-        if self.serial_connection and self.serial_connection.is_open:
-            self.serial_connection.close()
-        self.data_buffer = []
+    def clearReadings(self):
+        """Forget the signal and heart rate of the previous device"""
+        self.link_label.setText('')
+        setWidgetVisible(self.error_label, False)
+        self.data_buffer.clear()
+        self.heart_rate = None
+        self.beat_times.clear()
+        self.rr_intervals.clear()
+        self.metrics = {}
+        self.analysis_label.setVisible(False)
+        self.breath_detector.reset()
+        if self.pipeline_metrics is not None:
+            self.pipeline_metrics.reset()
         # Clear the graph
-        self.graph_widget.data = []
-        self.graph_widget.update()
-    
-    def readData(self):
-        """Read data from ESP32 and display it"""
-        try:
-            if self.serial_connection and self.serial_connection.is_open:
-                # Read all available data
-                while self.serial_connection.in_waiting > 0:
-                    data = self.serial_connection.readline().decode('utf-8').strip()
-                    if data:
-                        if data.split('bpm')[0] == '' and data != '':
-                            # Extract BPM value from data
-                            bpm_part = data.split('bpm')[1]
-                            try:
-                                self.pulse_value = int(bpm_part)
-                                # Update the graph widget with the new pulse value
-                                self.graph_widget.pulse_value = self.pulse_value
-                                self.graph_widget.update()  # Trigger repaint to show updated pulse value
-                            except ValueError:
-                                pass
-                        elif data.split('Ошибка')[0] == '' and data != '':
-                            pass 
-                        elif data == 'breath':
-                            # Update breath status
-                            self.last_breath_status = 'breath'
-                            if 'Дыхание' in self.selected_signals:
-                                self.breath_label.setText('Есть дыхание')
-                                self.breath_label.setStyleSheet("font-size: 18px; font-weight: bold; color: green;")
-                                self.breath_label.setVisible(True)
-                        elif data == 'noBreath':
-                            # Update breath status
-                            self.last_breath_status = 'noBreath'
-                            if 'Дыхание' in self.selected_signals:
-                                self.breath_label.setText('Нет дыхания')
-                                self.breath_label.setStyleSheet("font-size: 18px; font-weight: bold; color: red;")
-                                self.breath_label.setVisible(True)
-                        else: 
-                            # Try to convert to number if possible
-                            try:
-                                num_value = float(data)
-                                # Only add to buffer and graph if ECG is selected
-                                if 'ЭКГ' in self.selected_signals:
-                                    self.data_buffer.append(num_value)
-                                    # Update graph with new data
-                                    self.graph_widget.addData(num_value)
-                            except ValueError:
-                                # If not a number, ignore for graph
-                                pass
-                        
-                        # Control visibility of graph based on selected signals
-                        if 'ЭКГ' in self.selected_signals:
-                            self.graph_widget.setVisible(True)
-                        else:
-                            self.graph_widget.setVisible(False)
-                            
-                        # Control visibility of breath label based on selected signals
-                        # Only show breath label if breathing is selected and we've received breath data
-                        if 'Дыхание' in self.selected_signals and self.last_breath_status is not None:
-                            self.breath_label.setVisible(True)
-                        elif 'Дыхание' in self.selected_signals and self.last_breath_status is None:
-                            # Show placeholder text when breathing is selected but no data received yet
-                            self.breath_label.setText('Ожидание данных о дыхании...')
-                            self.breath_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #666;")
-                            self.breath_label.setVisible(True)
-                        else:
-                            self.breath_label.setVisible(False)
-        except Exception as e:
-            print(f"Error reading data: {e}")
-
-class GraphWidget(QWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.data = []
-        self.pulse_value = 0  # Store the current pulse value
-        self.max_data_points = 500  # Show last 500 data points
-        self.setStyleSheet("background-color: white; border: 1px solid #ccc;")
-    
-    def addData(self, value):
-        """Add a new data point to the graph"""
-        self.data.append(value)
-        # Limit the number of data points
-        if len(self.data) > self.max_data_points:
-            self.data = self.data[-self.max_data_points:]
-        # Trigger a repaint
-        self.update()
-    
-    def paintEvent(self, event):
-        """Draw the graph"""
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # Get widget dimensions
-        width = self.width()
-        height = self.height()
-        
-        # Define margins for axis labels
-        margin_left = 50
-        margin_bottom = 30
-        margin_top = 20
-        margin_right = 20
-        
-        # Calculate graph area
-        graph_width = width - margin_left - margin_right
-        graph_height = height - margin_top - margin_bottom
-        
-        # Draw background
-        painter.fillRect(0, 0, width, height, QColor(255, 255, 255))
-        
-        # Draw grid
-        painter.setPen(QPen(QColor(220, 220, 220), 1))
-        # Horizontal grid lines (5 lines)
-        for i in range(6):
-            y = margin_top + (graph_height * i // 5)
-            painter.drawLine(margin_left, y, margin_left + graph_width, y)
-        # Vertical grid lines (10 lines)
-        for i in range(11):
-            x = margin_left + (graph_width * i // 10)
-            painter.drawLine(x, margin_top, x, margin_top + graph_height)
-        
-        # Draw axis labels
-        painter.setPen(QPen(QColor(0, 0, 0), 1))
-        font = QFont()
-        font.setPointSize(8)
-        painter.setFont(font)
-        
-        # Draw Y-axis labels
-        if len(self.data) > 1:
-            min_val = min(self.data)
-            max_val = max(self.data)
-            range_val = max_val - min_val if max_val != min_val else 1
-            
-            # Draw min, middle, and max values
-            painter.drawText(5, margin_top + graph_height, f"{min_val:.1f}")
-            painter.drawText(5, margin_top + graph_height // 2, f"{(min_val + max_val) / 2:.1f}")
-            painter.drawText(5, margin_top + 15, f"{max_val:.1f}")
-            
-            # Draw Y-axis label
-            painter.drawText(10, 15, "Амплитуда")
-        
-        # Draw X-axis label
-        painter.drawText(margin_left + graph_width // 2 - 30, height - 5, "Время")
-        
-        # Draw pulse value in top-right corner
-        if self.pulse_value > 0:
-            pulse_font = QFont()
-            pulse_font.setPointSize(14)
-            pulse_font.setBold(True)
-            painter.setFont(pulse_font)
-            
-            # Determine if pulse is normal (60-100 BPM is considered normal)
-            is_normal = 60 <= self.pulse_value <= 100
+        self.graph_widget.clearData()
+    
+    def onSamplesReady(self, batch):
+        """Hand a batch parsed by the reader thread to its channel"""
+        # Channels that are not selected simply ignore their batches
+        if self.pipeline_metrics is None:
+            self.channels.dispatch(batch.channel, batch.samples)
+            return
+        started = time.perf_counter()
+        self.channels.dispatch(batch.channel, batch.samples)
+        self.pipeline_metrics.dispatch.record(time.perf_counter() - started)
+    
+    def onPulseReceived(self, bpm):
+        """Show the pulse value reported by the firmware"""
+        self.pulse_value = bpm
+        # The firmware value is coarse (6 bpm steps every 15 s); only show it
+        # until the host-side detector has a heart rate
+        if self.heart_rate is None:
+            self.graph_widget.setPulse(self.pulse_value)
+    
+    def onBeatsDetected(self, beats):
+        """Update the heart rate on every beat found by the QRS detector"""
+        for beat in beats:
+            self.beat_times.append(beat.time)
+            if beat.rr is not None:
+                self.rr_intervals.append(beat.rr)
+        if beats[-1].heart_rate is not None:
+            self.heart_rate = beats[-1].heart_rate
+            self.graph_widget.setPulse(int(round(self.heart_rate)))
+    
+    def onBreathReceived(self, status):
+        """Forward the breath status reported by the firmware to the breath channel"""
+        if self.breath_detector.status() is not None:
+            return  # The humidity stream gives a faster verdict
+        self.channels.dispatch(CHANNEL_BREATH, [status])
+    
+    def onHumidity(self, channel, values):
+        """Humidity channel consumer: detect breaths and keep the status and rate current"""
+        self.breath_detector.process(values)
+        status = self.breath_detector.status()
+        if status is not None and status != self.last_breath_status:
+            self.channels.dispatch(CHANNEL_BREATH, [status])
+        else:
+            self.updateBreathLabel()
+    
+    def onBreathStatus(self, channel, values):
+        """Breath channel consumer: update the label when the status changes"""
+        status = int(values[-1])
+        if status == self.last_breath_status:
+            return
+        self.last_breath_status = status
+        self.updateSignalVisibility()
+    
+    def updateSignalVisibility(self):
+        """Show the graph and breath label according to the enabled channels"""
+        # The graph shows every enabled waveform channel
+        setWidgetVisible(self.graph_widget, bool(self.channels.enabledChannels(WAVEFORM)))
             
-            # Set color: black for normal, red for abnormal
-            if is_normal:
-                painter.setPen(QPen(QColor(0, 0, 0)))  # Black color for normal pulse
+        setWidgetVisible(self.breath_label, self.channels.get(CHANNEL_BREATH).enabled)
+        self.updateBreathLabel()
+    
+    def updateBreathLabel(self):
+        """Show the breath status, with the rate once the humidity stream gives one"""
+        # Placeholder text is shown while breathing is selected but no data received yet
+        if not self.channels.get(CHANNEL_BREATH).enabled:
+            return
+        text, color = BREATH_LABELS[self.last_breath_status]
+        if self.last_breath_status == 1 and self.breath_detector.rate is not None:
+            text = f"{text}, {self.breath_detector.rate:.0f} в мин"
+        self.setBreathLabel(text, color)
+    
+    def setBreathLabel(self, text, color):
+        """Update breath label text and colour, skipping the stylesheet when nothing changed"""
+        # setStyleSheet re-polishes the widget, so only call it on real changes
+        if self.breath_label_state == (text, color):
+            return
+        self.breath_label_state = (text, color)
+        self.breath_label.setText(text)
+        self.breath_label.setStyleSheet(f"font-size: 18px; font-weight: bold; color: {color};")
+    
+    def updateLinkStats(self):
+        """Show baud rate and effective bytes/s and samples/s of the link"""
+        reader = self.session.reader
+        if reader is None or self.session.state != STREAMING:
+            return
+        rates = self.rate_meter.update(bytes=reader.bytes_read, lines=reader.lines_read,
+                                       samples=reader.samples_read)
+        if not rates:
+            return
+        mode = 'bin' if reader.binary_active else 'ascii'
+        self.link_label.setText(f"{self.port}, {reader.baudrate} бод, {mode}: "
+                                f"{rates['bytes']:.0f} байт/с, {rates['samples']:.0f} отсч/с")
+        if self.graph_widget.overlay_lines is not None:
+            self.graph_widget.setOverlay(self.overlayLines(rates))
+    
+    def enableMetrics(self):
+        """Start timing every stage of the pipeline; costs a few clock reads per batch"""
+        if self.pipeline_metrics is None:
+            self.pipeline_metrics = PipelineMetrics()
+            self.session.setMetrics(self.pipeline_metrics)
+            self.graph_widget.metrics = self.pipeline_metrics
+    
+    def setOverlayVisible(self, visible):
+        """Show or hide the statistics overlay; showing it starts the metrics"""
+        if visible:
+            self.enableMetrics()
+            self.graph_widget.setOverlay(self.graph_widget.overlay_lines or ['Сбор статистики...'])
+        else:
+            self.graph_widget.setOverlay(None)
+    
+    def overlayLines(self, rates):
+        """Overlay text: throughput, stage latencies and losses"""
+        stats = self.readerStats()
+        frames = self.graph_widget.frame_scheduler.stats()
+        lines = [
+            f"{rates['bytes'] / 1000:.1f} кБ/с  {rates['lines']:.0f} строк/с  {rates['samples']:.0f} отсч/с",
+            f"разбор p95 {stats['parse_ms_p95']:.2f} мс"
+            + (f" ({stats['parse_us_per_line_mean']:.1f} мкс/строка)" if rates['lines'] > 0 else ''),
+            f"очередь p95 {stats['queue_ms_p95']:.0f} мс, глубина {stats['pending_batches']}"
+            f" (макс {stats['queue_depth_max']})",
+            f"кадр p95 {stats['frame_ms_p95']:.1f} мс, {frames['fps']:.0f} кадр/с",
+            f"потеряно {stats['dropped_samples']}, опоздало {stats['late_samples']}, ошибок {stats['errors']}",
+        ]
+        return lines
+    
+    def readerStats(self):
+        """Return the session's state and errors, and ingestion counters from the reader thread"""
+        reader = self.session.reader
+        stats = {
+            'session_state': self.session.state,
+            'session_resumes': self.session.resumes,
+            'session_errors': self.session.errors,
+            'last_error': self.session.last_error,
+        }
+        if reader is None:
+            return stats
+        stats.update({
+            'bytes_read': reader.bytes_read,
+            'samples_read': reader.samples_read,
+            'dropped_samples': reader.dropped_samples,
+            'late_samples': reader.late_samples,
+            'lines_read': reader.lines_read,
+            'bad_lines': reader.bad_lines,
+            'errors': reader.errors,
+            'pending_batches': reader.pendingBatches(),
+            'delivery_ms_mean': 1000 * reader.delivery_seconds / max(reader.delivered_batches, 1),
+            'delivery_ms_max': 1000 * reader.max_delivery_seconds,
+        })
+        ecg = self.channels.get(CHANNEL_ECG)
+        if ecg.decoder is not None:
+            stats.update(ecg.decoder.stats())
+        if self.pipeline_metrics is not None:
+            stats.update(self.pipeline_metrics.stats())
+        return stats
+    
+    def requestAnalysis(self):
+        """Send the newest analysis window to the pool once there is enough signal"""
+        count = min(self.analysis_ring.total_written, self.analysis_seconds * self.sample_rate)
+        if count >= self.min_analysis_seconds * self.sample_rate:
+            self.analysis.submit(self, self.analysis_ring, self.sample_rate, count)
+    
+    def onAnalysisResult(self, key, metrics):
+        """Show the HRV and breathing rate computed by a worker"""
+        if key is not self:
+            return
+        self.metrics = metrics
+        parts = []
+        if 'sdnn_ms' in metrics:
+            parts.append(f"SDNN {metrics['sdnn_ms']:.0f} мс, RMSSD {metrics['rmssd_ms']:.0f} мс")
+        if metrics.get('lf_hf') is not None:
+            parts.append(f"LF/HF {metrics['lf_hf']:.2f}")
+        if metrics.get('breath_rate') is not None:
+            parts.append(f"дыхание {metrics['breath_rate']:.0f} в мин")
+        self.analysis_label.setText('ВСР: ' + ', '.join(parts) if parts else '')
+        setWidgetVisible(self.analysis_label, bool(parts))
+    
+    def onAnalysisFailed(self, key, message):
+        """A worker could not analyse this device's window; the next one is tried as usual"""
+        if key is self:
+            self.session.reportError(f'анализ ВСР: {message}')
+    
+    def stop(self):
+        """Stop the timers, close the session and release the analysis ring"""
+        self.link_timer.stop()
+        if self.analysis is not None:
+            self.analysis_timer.stop()
+        self.session.close()
+        if self.analysis_ring is not None:
+            self.analysis_ring.close()
+            self.analysis_ring = None
+
+def aggregateStats(device_stats):
+    """Combine per-device stats: sum counters, max of *_max and percentiles, mean of *_mean
+
+    A device that has counted nothing yet reports a mean of 0 (timings never
+    are), e.g. right after connecting or while reconnecting; it is left out
+    of the mean instead of pulling it towards 0.
+    """
+    combined = {}
+    averaged = {}  # Devices behind each *_mean
+    for stats in device_stats:
+        for name, value in stats.items():
+            if isinstance(value, str):
+                continue
+            if name.endswith('_mean'):
+                if value:
+                    combined[name] = combined.get(name, 0) + value
+                    averaged[name] = averaged.get(name, 0) + 1
+                else:
+                    combined.setdefault(name, 0)
+            elif name.endswith(('_max', '_p50', '_p95', '_p99')):
+                combined[name] = max(combined.get(name, value), value)
             else:
-                painter.setPen(QPen(QColor(200, 0, 0)))  # Red color for abnormal pulse
-            
-            # Display pulse in Russian
-            pulse_text = f"Пульс: {self.pulse_value} уд/мин"
-            # Position in top-right corner with some padding
-            text_width = painter.fontMetrics().width(pulse_text)
-            painter.drawText(width - text_width - 10, 30, pulse_text)
-        
-        # Draw graph only if we have data
-        if len(self.data) > 1:
-            # Set up pen for graph line
-            painter.setPen(QPen(QColor(0, 150, 200), 2))
-            
-            # Draw the graph line
-            points = []
-            for i, value in enumerate(self.data):
-                # X coordinate: spread data points across the width
-                x = margin_left + int(i * graph_width / max(len(self.data) - 1, 1))
-                # Y coordinate: map value to height (invert because Y=0 is top)
-                y = margin_top + int(graph_height - ((value - min_val) / range_val) * graph_height)
-                # Ensure coordinates are within bounds
-                x = max(margin_left, min(margin_left + graph_width, x))
-                y = max(margin_top, min(margin_top + graph_height, y))
-                points.append((x, y))
-            
-            # Draw connected lines between points
-            for i in range(1, len(points)):
-                painter.drawLine(points[i-1][0], points[i-1][1], points[i][0], points[i][1])
+                combined[name] = combined.get(name, 0) + value
+    for name, count in averaged.items():
+        combined[name] /= count
+    return combined
+
+def setWidgetVisible(widget, visible):
+    """Change widget visibility only when it actually differs"""
+    if widget.isHidden() == visible:
+        widget.setVisible(visible)
 
 def main():
     app = QApplication(sys.argv)